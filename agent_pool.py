@@ -0,0 +1,65 @@
+"""
+Warm, shared pool of initialized agents for ASAL-Guardian.
+
+Building an agent creates a new `genai.GenerativeModel`. Doing that for all
+three agents on every `/api/run` call adds setup cost to each request. The
+pool builds each (role, model) agent once and shares it across all request
+threads.
+"""
+import threading
+
+
+class AgentPool:
+    """
+    Registry of ready-to-use agents keyed by (role, model_name).
+
+    Agents hold no per-request state (think_and_act only reads the model and
+    instructions), so one instance can safely serve all gunicorn threads.
+
+    Design Decision: Key by Model
+    - When model resolution changes, the new model name gives a new key.
+      Old entries are dropped through clear(), which main.py registers as
+      a ModelRegistry listener.
+    - Construction happens under the lock, so concurrent first requests
+      build an agent once instead of racing.
+    """
+    def __init__(self):
+        self._agents = {}
+        self._lock = threading.Lock()
+        self.builds = 0
+        self.hits = 0
+
+    def get(self, role, model_name, factory):
+        """
+        Returns the pooled agent for (role, model_name), building it on first use.
+
+        Args:
+            role (str): Agent role, e.g. "sentinel"
+            model_name (str): Resolved Gemini model identifier
+            factory (callable): factory(model_name) -> agent, called at most once per key
+        """
+        key = (role, model_name)
+        agent = self._agents.get(key)
+        if agent is not None:
+            with self._lock:
+                self.hits += 1
+            return agent
+        with self._lock:
+            agent = self._agents.get(key)
+            if agent is None:
+                agent = factory(model_name)
+                # Do not pool agents whose model failed to initialize; retry next time
+                if getattr(agent, "model", True) is not None:
+                    self._agents[key] = agent
+                self.builds += 1
+            else:
+                self.hits += 1
+            return agent
+
+    def clear(self, *_):
+        """Drops every pooled agent. Accepts and ignores listener arguments."""
+        with self._lock:
+            self._agents.clear()
+
+    def __len__(self):
+        return len(self._agents)
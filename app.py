@@ -2,16 +2,75 @@
 ASAL-Guardian Flask Web Application
 Deployable to Google Cloud Run for the "Agents for Good" hackathon submission.
 """
-from flask import Flask, jsonify, render_template_string
+from flask import Flask, Response, jsonify, render_template_string, request, stream_with_context, url_for
+import json
 import os
+import queue
+import threading
+import time
 from dotenv import load_dotenv
-from main import run_agent_workflow
+from main import (run_agent_workflow, available_counties, DEFAULT_COUNTY, WORKFLOW_STAGES, indicator_store,
+                  shared_state, get_latest, bulletin_library, responder_templates)
+from guardian_rules import METRIC_KEYS
+from jobs import JobManager, QueueFullError
+from http_cache import CachedBody, LatestResults
+import telemetry
 
 # Load environment variables from .env file if it exists
 load_dotenv()
 
 app = Flask(__name__)
 
+# Bulletins are ingested in the background at startup, so the first request's
+# county lookup does not pay for the PDF parse (ASAL_WARM_BULLETINS=0 to skip)
+if os.environ.get("ASAL_WARM_BULLETINS", "1") != "0":
+    bulletin_library.warm()
+
+# Responder templates are warmed in the background at startup too, so the first
+# runs of each drought phase x economic status are filled in locally rather than
+# waiting on the model (ASAL_WARM_TEMPLATES=0 to skip)
+if responder_templates is not None and os.environ.get("ASAL_WARM_TEMPLATES", "1") != "0":
+    responder_templates.warm_async()
+
+# Workflows run here, off the request threads, so /health and the index page
+# stay responsive while many runs are in flight. Job snapshots go to the shared
+# state, so any worker process can answer a poll.
+job_manager = JobManager(
+    max_workers=int(os.environ.get("ASAL_JOB_WORKERS", "4")),
+    max_pending=int(os.environ.get("ASAL_JOB_MAX_PENDING", "32")),
+    retention_seconds=int(os.environ.get("ASAL_JOB_RETENTION_SECONDS", "3600")),
+    max_retained=int(os.environ.get("ASAL_JOB_MAX_RETAINED", "200")),
+    shared=shared_state
+)
+
+# /api/latest serves each county's last result from memory, precompressed and
+# with an ETag; the stored result is checked again every ASAL_LATEST_REFRESH_SECONDS.
+# Clients may reuse a response for ASAL_LATEST_MAX_AGE seconds.
+latest_results = LatestResults(get_latest,
+                               refresh_seconds=float(os.environ.get("ASAL_LATEST_REFRESH_SECONDS", "1")))
+LATEST_CACHE_CONTROL = f"public, max-age={int(os.environ.get('ASAL_LATEST_MAX_AGE', '5'))}"
+INDEX_CACHE_CONTROL = f"public, max-age={int(os.environ.get('ASAL_INDEX_MAX_AGE', '300'))}"
+
+# /api/stream and /api/run hold a request thread while a workflow runs. At most
+# ASAL_MAX_WAITING_REQUESTS of them wait at once (the rest get 429 and should
+# use /api/jobs), so the gunicorn threads stay free for polls and /health.
+# A stream ends after ASAL_STREAM_MAX_SECONDS and /api/run answers 202 after
+# ASAL_RUN_WAIT_SECONDS; the job keeps running and its status_url can be polled.
+MAX_WAITING_REQUESTS = int(os.environ.get("ASAL_MAX_WAITING_REQUESTS", "4"))
+STREAM_MAX_SECONDS = float(os.environ.get("ASAL_STREAM_MAX_SECONDS", "120"))
+RUN_WAIT_SECONDS = float(os.environ.get("ASAL_RUN_WAIT_SECONDS", "120"))
+_waiting_slots = threading.BoundedSemaphore(MAX_WAITING_REQUESTS)
+
+telemetry.registry.register_collector(lambda: [
+    ("asal_jobs_active", "gauge", "Workflow jobs queued or running in this process",
+     [({}, job_manager.stats()["active"])]),
+    ("asal_jobs_retained", "gauge", "Workflow jobs kept for polling in this process",
+     [({}, job_manager.stats()["retained"])]),
+    ("asal_latest_requests_total", "counter", "/api/latest lookups by how they were answered",
+     [({"source": "memory"}, latest_results.stats()["hits"]),
+      ({"source": "store"}, latest_results.stats()["loads"])]),
+])
+
 # HTML template for the web interface
 HTML_TEMPLATE = """
 <!DOCTYPE html>
@@ -125,73 +184,325 @@ HTML_TEMPLATE = """
     </div>
     
     <script>
-        async function runWorkflow() {
+        const STAGES = [
+            ['sentinel', '📡 Sentinel Agent Output'],
+            ['guardian', '🛡️ Guardian Agent Analysis'],
+            ['responder', '📢 Responder Agent Actions']
+        ];
+        
+        function runWorkflow() {
             const loading = document.getElementById('loading');
             const results = document.getElementById('results');
             const output = document.getElementById('output');
             const button = event.target;
             
             loading.style.display = 'block';
-            results.style.display = 'none';
+            results.style.display = 'block';
             button.disabled = true;
             button.textContent = '⏳ Processing...';
             
-            try {
-                const response = await fetch('/api/run');
-                const data = await response.json();
-                
-                loading.style.display = 'none';
-                results.style.display = 'block';
-                
-                output.innerHTML = `
-                    <div class="agent-box">
-                        <h3>📡 Sentinel Agent Output</h3>
-                        <pre style="white-space: pre-wrap; font-family: monospace;">${data.sentinel_output || 'No data'}</pre>
-                    </div>
-                    <div class="agent-box">
-                        <h3>🛡️ Guardian Agent Analysis</h3>
-                        <pre style="white-space: pre-wrap; font-family: monospace;">${data.guardian_output || 'No data'}</pre>
-                    </div>
-                    <div class="agent-box">
-                        <h3>📢 Responder Agent Actions</h3>
-                        <pre style="white-space: pre-wrap; font-family: monospace;">${data.responder_output || 'No data'}</pre>
-                    </div>
-                `;
-            } catch (error) {
+            // One box per stage, filled in as soon as that stage streams or finishes
+            output.innerHTML = STAGES.map(([stage, title]) => `
+                <div class="agent-box">
+                    <h3>${title} <small id="${stage}-timing" style="color: #999; font-weight: normal;"></small></h3>
+                    <pre id="${stage}-output" style="white-space: pre-wrap; font-family: monospace;">Waiting...</pre>
+                </div>
+            `).join('');
+            const streamed = {};
+            let finished = false;
+            let statusUrl = null;
+            
+            const source = new EventSource('/api/stream');
+            const finish = (message) => {
+                finished = true;
+                source.close();
                 loading.style.display = 'none';
-                output.innerHTML = `<p style="color: red;">Error: ${error.message}</p>`;
-                results.style.display = 'block';
-            } finally {
+                if (message) {
+                    output.insertAdjacentHTML('afterbegin', '<p style="color: red;"></p>');
+                    output.firstElementChild.textContent = `Error: ${message}`;
+                }
                 button.disabled = false;
                 button.textContent = '🚀 Run Agent Workflow';
-            }
+            };
+            
+            source.addEventListener('token', (e) => {
+                const data = JSON.parse(e.data);
+                const pre = document.getElementById(`${data.stage}-output`);
+                if (!streamed[data.stage]) {
+                    streamed[data.stage] = true;
+                    pre.textContent = '';
+                }
+                pre.textContent += data.text;
+            });
+            source.addEventListener('stage', (e) => {
+                const data = JSON.parse(e.data);
+                const pre = document.getElementById(`${data.stage}-output`);
+                const timing = document.getElementById(`${data.stage}-timing`);
+                if (data.status === 'running') {
+                    pre.textContent = 'Working...';
+                    timing.textContent = `started at ${data.t_ms} ms`;
+                } else {
+                    pre.textContent = data.output || 'No data';
+                    timing.textContent = `${data.status === 'reused' ? 'reused last result' : 'done'} at ${data.t_ms} ms`;
+                }
+            });
+            source.addEventListener('job', (e) => { statusUrl = JSON.parse(e.data).status_url; });
+            source.addEventListener('complete', () => finish());
+            source.addEventListener('failed', (e) => finish(JSON.parse(e.data).message));
+            
+            // Without a stream (server busy, stream ended early, connection
+            // dropped) the run is followed by polling its job instead
+            const poll = (url) => {
+                fetch(url).then((r) => r.json()).then((job) => {
+                    for (const [stage] of STAGES) {
+                        const entry = (job.stages || {})[stage];
+                        if (!entry || entry.status === 'pending' || (entry.status === 'running' && streamed[stage])) {
+                            continue;
+                        }
+                        document.getElementById(`${stage}-output`).textContent =
+                            entry.status === 'running' ? 'Working...' : (entry.output || 'No data');
+                    }
+                    if (job.status === 'succeeded') {
+                        finish();
+                    } else if (job.status === 'failed') {
+                        finish(job.error || 'Workflow failed');
+                    } else {
+                        setTimeout(() => poll(url), 2000);
+                    }
+                }).catch(() => finish('Connection to the server was lost'));
+            };
+            const fallBack = () => {
+                source.close();
+                if (statusUrl) {
+                    poll(statusUrl);
+                    return;
+                }
+                fetch('/api/jobs', {method: 'POST'}).then((r) => r.json().then((body) =>
+                    r.ok ? poll(body.status_url) : finish(body.message)
+                )).catch(() => finish('Connection to the server was lost'));
+            };
+            source.addEventListener('detached', fallBack);
+            source.onerror = () => {
+                if (!finished) {
+                    fallBack();
+                }
+            };
         }
     </script>
 </body>
 </html>
 """
 
+# The page has no per-request content, so it is rendered and compressed once
+with app.app_context():
+    INDEX_PAGE = CachedBody(render_template_string(HTML_TEMPLATE), "text/html")
+
 @app.route('/')
 def index():
     """Main web interface."""
-    return render_template_string(HTML_TEMPLATE)
+    return INDEX_PAGE.respond(request, INDEX_CACHE_CONTROL)
+
+def _requested_county():
+    """County from ?county= or a JSON body, defaulting to DEFAULT_COUNTY; None if unknown."""
+    body = request.get_json(silent=True) or {}
+    county = request.args.get("county") or body.get("county") or DEFAULT_COUNTY
+    return county if county in available_counties() else None
+
+def _unknown_county():
+    return jsonify({"status": "error", "message": "Unknown county",
+                    "counties": available_counties()}), 400
+
+def _busy():
+    response = jsonify({"status": "error", "retry_url": url_for("api_submit_job"),
+                        "message": f"Too many requests waiting on workflows (limit {MAX_WAITING_REQUESTS}); "
+                                   "submit to /api/jobs and poll instead"})
+    response.status_code = 429
+    response.headers["Retry-After"] = "5"
+    return response
+
+def _job_response(job):
+    body = job.to_dict()
+    body["status_url"] = url_for("api_job", job_id=job.id)
+    return body
+
+@app.route('/api/jobs', methods=['POST'])
+def api_submit_job():
+    """Starts a workflow run in the background and returns its job id at once."""
+    county = _requested_county()
+    if county is None:
+        return _unknown_county()
+    try:
+        job = job_manager.submit(run_agent_workflow, stages=WORKFLOW_STAGES, county=county)
+    except QueueFullError as e:
+        return jsonify({"status": "error", "message": f"Too many workflows in flight: {e}"}), 503
+    return jsonify(_job_response(job)), 202
+
+@app.route('/api/jobs/<job_id>', methods=['GET'])
+def api_job(job_id):
+    """Per-stage status of a workflow run, with the result once it has finished."""
+    job = job_manager.get(job_id)
+    if job is None:
+        return jsonify({"status": "error", "message": "Unknown or expired job"}), 404
+    return jsonify(_job_response(job))
 
 @app.route('/api/run', methods=['GET', 'POST'])
 def api_run():
-    """API endpoint to trigger the agent workflow."""
+    """
+    Synchronous API endpoint to trigger the agent workflow.
+
+    Kept for existing clients; the run itself still goes through the bounded
+    job executor. New clients should use /api/jobs and poll. A run still going
+    after RUN_WAIT_SECONDS is answered with 202 and its job, as /api/jobs would.
+    """
+    county = _requested_county()
+    if county is None:
+        return _unknown_county()
+    if not _waiting_slots.acquire(blocking=False):
+        return _busy()
     try:
-        result = run_agent_workflow()
-        return jsonify({
-            "status": "success",
-            "sentinel_output": result.get("sentinel_output", ""),
-            "guardian_output": result.get("guardian_output", ""),
-            "responder_output": result.get("responder_output", "")
-        })
-    except Exception as e:
+        try:
+            job = job_manager.submit(run_agent_workflow, stages=WORKFLOW_STAGES, county=county)
+        except QueueFullError as e:
+            return jsonify({"status": "error", "message": f"Too many workflows in flight: {e}"}), 503
+        if not job.done.wait(RUN_WAIT_SECONDS):
+            return jsonify(_job_response(job)), 202
+    finally:
+        _waiting_slots.release()
+    if job.error is not None:
         return jsonify({
             "status": "error",
-            "message": str(e)
+            "message": job.error
         }), 500
+    result = job.result
+    return jsonify({
+        "status": "success",
+        "sentinel_output": result.get("sentinel_output", ""),
+        "guardian_output": result.get("guardian_output", ""),
+        "responder_output": result.get("responder_output", "")
+    })
+
+def _sse(event, data):
+    return f"event: {event}\ndata: {json.dumps(data)}\n\n"
+
+@app.route('/api/stream', methods=['GET'])
+def api_stream():
+    """
+    Server-sent events for one workflow run (?county=, default Garissa).
+
+    Events (all carry 't_ms', milliseconds since the request arrived):
+        job      - {job_id, status_url}, sent first
+        stage    - {stage, status, output}, when a stage starts and finishes
+        token    - {stage, text}, every chunk a stage's model streams
+        complete - {result, timings}, per-stage started/first-token/finished times
+        failed   - {message}
+        detached - {job_id, status_url}, when the stream reaches STREAM_MAX_SECONDS
+                   before the run ends; poll status_url for the rest
+
+    Answers 429 while MAX_WAITING_REQUESTS streams and /api/run calls are open.
+    """
+    county = _requested_county()
+    if county is None:
+        return _unknown_county()
+    if not _waiting_slots.acquire(blocking=False):
+        return _busy()
+    events = queue.Queue()
+    started = time.perf_counter()
+    timings = {stage: {} for stage in WORKFLOW_STAGES}
+
+    def elapsed_ms():
+        return round((time.perf_counter() - started) * 1000, 1)
+
+    def on_stage(stage, status, output):
+        t_ms = elapsed_ms()
+        timings.setdefault(stage, {})["started_ms" if status == "running" else "finished_ms"] = t_ms
+        events.put(("stage", {"stage": stage, "status": status, "output": output, "t_ms": t_ms}))
+
+    def on_token(stage, text):
+        t_ms = elapsed_ms()
+        timings.setdefault(stage, {}).setdefault("first_token_ms", t_ms)
+        events.put(("token", {"stage": stage, "text": text, "t_ms": t_ms}))
+
+    def streamed_run(on_stage):
+        try:
+            result = run_agent_workflow(county=county, on_stage=on_stage, on_token=on_token)
+        except Exception as e:
+            events.put(("failed", {"message": str(e), "t_ms": elapsed_ms()}))
+            raise
+        events.put(("complete", {"result": result, "timings": timings, "t_ms": elapsed_ms()}))
+        return result
+
+    try:
+        job = job_manager.submit(streamed_run, stages=WORKFLOW_STAGES, listener=on_stage)
+    except QueueFullError as e:
+        _waiting_slots.release()
+        return jsonify({"status": "error", "message": f"Too many workflows in flight: {e}"}), 503
+    status_url = url_for("api_job", job_id=job.id)
+    deadline = started + STREAM_MAX_SECONDS
+
+    def generate():
+        yield _sse("job", {"job_id": job.id, "status_url": status_url, "t_ms": elapsed_ms()})
+        while True:
+            remaining = deadline - time.perf_counter()
+            if remaining <= 0:
+                yield _sse("detached", {"job_id": job.id, "status_url": status_url, "t_ms": elapsed_ms()})
+                break
+            try:
+                event, data = events.get(timeout=min(15, remaining))
+            except queue.Empty:
+                # Comment line keeps proxies from closing an idle stream
+                yield ": keep-alive\n\n"
+                continue
+            yield _sse(event, data)
+            if event in ("complete", "failed"):
+                break
+
+    response = Response(stream_with_context(generate()), mimetype="text/event-stream",
+                        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"})
+    # Released when the server closes the response, even if the client left early
+    response.call_on_close(_waiting_slots.release)
+    return response
+
+@app.route('/api/latest/<county>', methods=['GET'])
+def api_latest(county):
+    """
+    A county's most recent workflow result, without running the workflow.
+
+    Answers If-None-Match with 304 and compresses with brotli or gzip when
+    the client accepts it.
+    """
+    latest = latest_results.get(county)
+    if latest is None:
+        if county not in available_counties():
+            return _unknown_county()
+        return jsonify({"status": "error", "message": f"No result for {county} yet"}), 404
+    return latest.respond(request, LATEST_CACHE_CONTROL)
+
+@app.route('/api/history/<county>', methods=['GET'])
+def api_history(county):
+    """A county's recorded indicators, optionally limited to ?from=YYYY-MM&to=YYYY-MM."""
+    try:
+        history = indicator_store.history(county, request.args.get("from"), request.args.get("to"))
+    except ValueError:
+        return jsonify({"status": "error", "message": "Months must be YYYY-MM"}), 400
+    return jsonify(history)
+
+@app.route('/api/trends', methods=['GET'])
+def api_trends():
+    """Trailing per-county trend of one metric (?metric=vci&months=3&end=YYYY-MM)."""
+    metric = request.args.get("metric", "vci")
+    if metric not in METRIC_KEYS:
+        return jsonify({"status": "error", "message": f"metric must be one of {', '.join(METRIC_KEYS)}"}), 400
+    try:
+        months = int(request.args.get("months", 3))
+        trends = indicator_store.trend(metric, months, request.args.get("end"))
+    except ValueError:
+        return jsonify({"status": "error", "message": "months must be an integer and end YYYY-MM"}), 400
+    return jsonify({"metric": metric, "months": months, "counties": trends})
+
+@app.route('/metrics', methods=['GET'])
+def metrics():
+    """Prometheus scrape endpoint; values are those of the worker process that answers."""
+    return Response(telemetry.render(), mimetype="text/plain; version=0.0.4")
 
 @app.route('/health', methods=['GET'])
 def health():
@@ -0,0 +1,199 @@
+"""
+Batched prompting: many small model requests packed into one call.
+
+Each Sentinel or Guardian fallback request is small next to the system
+instruction that every call repeats. The Batcher collects requests arriving
+from different workflow threads and sends up to `max_items` of them as one
+schema-constrained request. Batching stops early once the oldest request has
+waited `max_wait` seconds.
+
+The reply is a JSON array of items tagged with the ids they answer. Ids are
+positions within the call, so the same requests batched together again make
+a byte-identical prompt. Items missing from the reply are re-queued, up to `max_attempts` times, before
+their callers see a BatchError. Batch size, fill ratio and per-item cost are
+tracked so the window can be tuned. A batched call runs at the most urgent
+request_priority() among its items, since it runs on the batcher's threads.
+"""
+import concurrent.futures
+import threading
+import time
+
+from gemini_client import current_priority, request_priority
+from schemas import PayloadError, parse_json
+from telemetry import span
+
+
+class BatchError(Exception):
+    """An item never came back, or the batch call itself failed."""
+
+
+def batch_schema(item_schema):
+    """Wraps an item schema as {"items": [{"id": ..., **item}]} for one batched reply."""
+    properties = dict(item_schema.get("properties", {}))
+    properties["id"] = {"type": "string"}
+    item = {"type": "object", "properties": properties,
+            "required": ["id"] + list(item_schema.get("required", []))}
+    return {"type": "object", "properties": {"items": {"type": "array", "items": item}},
+            "required": ["items"]}
+
+
+def batch_prompt(task, payloads):
+    """One prompt listing every payload under its id."""
+    lines = [f"{task} Answer every request below with one entry in 'items', "
+             "copying its id exactly."]
+    for item_id, payload in payloads:
+        lines.append(f"\n### id={item_id}\n{payload}")
+    return "\n".join(lines)
+
+
+def split_reply(text):
+    """Batched reply text -> {id: item dict without 'id'}. Raises PayloadError."""
+    with span("parse", "batch"):
+        items = parse_json(text).get("items")
+    if not isinstance(items, list):
+        raise PayloadError("Batched reply lacks an 'items' list")
+    results = {}
+    for item in items:
+        if isinstance(item, dict) and item.get("id") is not None:
+            results[str(item["id"])] = {k: v for k, v in item.items() if k != "id"}
+    return results
+
+
+class _Pending:
+    __slots__ = ("payload", "priority", "future", "attempts", "queued_at")
+
+    def __init__(self, payload, priority):
+        self.payload = payload
+        self.priority = priority
+        self.future = concurrent.futures.Future()
+        self.attempts = 0
+        self.queued_at = time.monotonic()
+
+
+class Batcher:
+    """
+    Packs concurrent requests into batched calls.
+
+    Args:
+        send (callable): send([(id, payload), ...]) -> {id: result}; ids left
+            out of the result are re-queued
+        max_items (int): Most requests per call
+        max_wait (float): Seconds the oldest queued request may wait for the batch to fill
+        max_attempts (int): Calls an item may be sent in before it fails
+        max_concurrent (int): Batched calls in flight at once
+        overhead_chars (int): Fixed prompt size per call (the system
+            instruction), for the per-item cost metric
+    """
+    def __init__(self, send, max_items=8, max_wait=0.05, max_attempts=3, max_concurrent=4,
+                 overhead_chars=0):
+        self.send = send
+        self.max_items = max(1, max_items)
+        self.max_wait = max_wait
+        self.max_attempts = max_attempts
+        self.overhead_chars = overhead_chars
+        self._queue = []
+        self._cond = threading.Condition()
+        self._executor = concurrent.futures.ThreadPoolExecutor(max_workers=max_concurrent,
+                                                               thread_name_prefix="batch")
+        self._dispatcher = None
+        self.batches = 0
+        self.items_sent = 0
+        self.items_done = 0
+        self.requeued = 0
+        self.failed = 0
+        self.payload_chars = 0
+
+    def submit(self, payload, timeout=None):
+        """
+        Queues one request and waits for its result.
+
+        Args:
+            payload (str): The request text for this item
+
+        Raises:
+            BatchError: If the item was missing from every attempt or the call failed
+        """
+        with self._cond:
+            pending = _Pending(payload, current_priority())
+            self._queue.append(pending)
+            if self._dispatcher is None:
+                self._dispatcher = threading.Thread(target=self._dispatch, name="batcher", daemon=True)
+                self._dispatcher.start()
+            self._cond.notify()
+        return pending.future.result(timeout)
+
+    def _dispatch(self):
+        while True:
+            with self._cond:
+                while not self._queue:
+                    self._cond.wait()
+                # Fill until full or until the oldest item has waited max_wait
+                while len(self._queue) < self.max_items:
+                    remaining = self._queue[0].queued_at + self.max_wait - time.monotonic()
+                    if remaining <= 0:
+                        break
+                    self._cond.wait(remaining)
+                batch = self._queue[:self.max_items]
+                del self._queue[:self.max_items]
+            self._executor.submit(self._run, batch)
+
+    def _run(self, batch):
+        for pending in batch:
+            pending.attempts += 1
+        with self._cond:
+            self.batches += 1
+            self.items_sent += len(batch)
+            self.payload_chars += sum(len(p.payload) for p in batch)
+        try:
+            with request_priority(min(p.priority for p in batch)):
+                results = self.send([(str(i), p.payload) for i, p in enumerate(batch)])
+        except Exception as e:
+            with self._cond:
+                self.failed += len(batch)
+            for pending in batch:
+                pending.future.set_exception(BatchError(f"Batched call failed: {e}"))
+            return
+
+        missing, done, failed = [], 0, 0
+        for i, pending in enumerate(batch):
+            if str(i) in results:
+                pending.future.set_result(results[str(i)])
+                done += 1
+            elif pending.attempts < self.max_attempts:
+                missing.append(pending)
+            else:
+                pending.future.set_exception(
+                    BatchError(f"Item missing from {pending.attempts} batched replies"))
+                failed += 1
+        with self._cond:
+            self.items_done += done
+            self.failed += failed
+            if missing:
+                # Back to the front, so re-queued items are not starved
+                self.requeued += len(missing)
+                for pending in missing:
+                    pending.queued_at = time.monotonic() - self.max_wait
+                self._queue[:0] = missing
+                self._cond.notify()
+
+    def stats(self):
+        """
+        Returns:
+            dict: Counters plus 'mean_batch_size', 'fill_ratio' (mean size /
+                max_items), 'calls_per_item' and 'prompt_chars_per_item'
+        """
+        with self._cond:
+            batches, sent = self.batches, self.items_sent
+            return {
+                "batches": batches,
+                "items_sent": sent,
+                "items_done": self.items_done,
+                "requeued": self.requeued,
+                "failed": self.failed,
+                "queued": len(self._queue),
+                "mean_batch_size": sent / batches if batches else 0.0,
+                "fill_ratio": sent / (batches * self.max_items) if batches else 0.0,
+                "calls_per_item": batches / sent if sent else 0.0,
+                "prompt_chars_per_item": ((batches * self.overhead_chars + self.payload_chars) / sent
+                                          if sent else 0.0),
+            }
@@ -0,0 +1,1187 @@
+"""
+ASAL-Guardian performance benchmarks.
+
+Usage:
+    python benchmark.py [--output results.jsonl] <benchmark> [options]
+
+    python benchmark.py agent-setup [--iterations 200] [--threads 8]
+    python benchmark.py guardian-rules [--records 100000]
+    python benchmark.py bulletin-ingest [--workers 4] [PDF ...]
+    python benchmark.py indicator-store [--counties 2000] [--months 1000]
+    python benchmark.py workflow [--concurrency 1,4,16] [--requests 32] [--latency lognormal:0.8,0.5]
+                                 [--error-rate 0.02] [--cold]
+    python benchmark.py http     (same options, through the Flask /api/run endpoint)
+    python benchmark.py batching [--requests 64] [--threads 16] [--latency lognormal:0.8,0.5]
+    python benchmark.py dashboard [--requests 2000] [--threads 1] [--counties 23]
+    python benchmark.py monitor [--interval 40] [--workers 4] [--cycles 2] [--downtime 5] [--rpm 120]
+    python benchmark.py cold-start [--runs 5] [--top 15]
+    python benchmark.py subscribers [--records 10000000] [--alarm-counties 5]
+    python benchmark.py vci-raster [--rows 3000] [--cols 3000] [--years 10] [--workers 1,2,4]
+    python benchmark.py sms-dispatch [--recipients 300000] [--gateways 2] [--concurrency 8] [--batch 500]
+    python benchmark.py workers [--workers 1,2,4,8] [--compare] [--concurrency 16] [--requests 64]
+
+The workflow and http benchmarks run against fake_gemini, so they need no
+API key or network. With --output, each run appends one JSON line
+(benchmark, parameters, git commit, results) for tracking regressions.
+"""
+import argparse
+import contextlib
+import datetime
+import io
+import itertools
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+
+# Model construction does not touch the network; a placeholder key keeps
+# main.py from warning about a missing one.
+os.environ.setdefault("GOOGLE_API_KEY", "benchmark-placeholder-key")
+# Logs are written by a background thread, which redirect_stdout does not
+# silence; benchmarks only show warnings unless ASAL_LOG_LEVEL says otherwise.
+os.environ.setdefault("ASAL_LOG_LEVEL", "WARNING")
+
+
+def percentiles(samples):
+    """Returns p50/p95/p99 of a list of seconds, in milliseconds."""
+    ordered = sorted(samples)
+    def pick(q):
+        return ordered[min(len(ordered) - 1, int(q * len(ordered)))] * 1000
+    return {"p50_ms": pick(0.50), "p95_ms": pick(0.95), "p99_ms": pick(0.99),
+            "mean_ms": statistics.mean(ordered) * 1000}
+
+
+def run_concurrently(fn, iterations, threads):
+    """Calls fn() `iterations` times spread over `threads` threads; returns per-call latencies."""
+    latencies = []
+    lock = threading.Lock()
+    per_thread = max(1, iterations // threads)
+
+    def worker():
+        local = []
+        for _ in range(per_thread):
+            start = time.perf_counter()
+            fn()
+            local.append(time.perf_counter() - start)
+        with lock:
+            latencies.extend(local)
+
+    pool = [threading.Thread(target=worker) for _ in range(threads)]
+    for t in pool:
+        t.start()
+    for t in pool:
+        t.join()
+    return latencies
+
+
+def bench_agent_setup(iterations, threads):
+    """
+    Per-request agent setup: fresh construction (old behaviour) vs the warm pool.
+    The one-time Gemini SDK import is timed on its own line, before either.
+    """
+    import main
+
+    start = time.perf_counter()
+    main.get_genai()
+    sdk_import = time.perf_counter() - start
+
+    # Serve a fixed model list so the benchmark measures setup, not the network
+    listed = [name for prefs in main.MODEL_PREFERENCES.values() for name in prefs]
+    main.model_registry._list_models = lambda: listed
+    main.model_registry.invalidate()
+    main.resolve_agent_models()
+
+    def fresh():
+        for role, model_name in main.resolve_agent_models().items():
+            agent_class, name, instructions, schema = main.AGENT_SPECS[role]
+            agent_class(name, model_name, instructions, schema)
+
+    def pooled():
+        main.get_agents()
+
+    results = {"sdk_import_ms": sdk_import * 1000}
+    for label, fn in (("per_request", fresh), ("pooled", pooled)):
+        results[label] = percentiles(run_concurrently(fn, iterations, threads))
+
+    print(f"\n📊 Agent setup cost per request ({iterations} requests, {threads} threads)")
+    print(f"   SDK import (once per process, not in the samples): {sdk_import * 1000:.1f}ms")
+    for label in ("per_request", "pooled"):
+        stats = results[label]
+        print(f"   {label:<12} p50={stats['p50_ms']:.3f}ms  p95={stats['p95_ms']:.3f}ms  "
+              f"p99={stats['p99_ms']:.3f}ms")
+    saved = results["per_request"]["mean_ms"] - results["pooled"]["mean_ms"]
+    print(f"   Removed per request: {saved:.3f}ms (mean)")
+    return results
+
+
+def bench_guardian_rules(records):
+    """Vectorized NDMA classification throughput for many county-month records."""
+    import numpy as np
+    import guardian_rules
+
+    rng = np.random.default_rng(7)
+    vci = rng.uniform(0, 60, records)
+    water = rng.uniform(0, 20, records)
+    goat = rng.uniform(1500, 6000, records)
+    maize = rng.uniform(40, 120, records)
+
+    start = time.perf_counter()
+    guardian_rules.classify_arrays(vci, water, goat, maize)
+    batch = time.perf_counter() - start
+
+    single = run_concurrently(
+        lambda: guardian_rules.classify({"vci": 18.5, "water_distance_km": 12,
+                                         "goat_price_kes": 2500, "maize_price_kes": 100}),
+        1000, 1)
+    stats = percentiles(single)
+    print("\n📊 Guardian rule engine")
+    print(f"   {records} records in one pass: {batch * 1000:.2f}ms "
+          f"({batch / records * 1e9:.1f}ns per record)")
+    print(f"   single record: p50={stats['p50_ms'] * 1000:.1f}µs  p99={stats['p99_ms'] * 1000:.1f}µs")
+    return {"batch_s": batch, "records": records, "single": stats}
+
+
+def bench_bulletin_ingest(paths, workers):
+    """Cold PDF extraction vs the content-addressed disk cache vs the in-memory check."""
+    from bulletin_ingest import BulletinLibrary
+
+    here = os.path.dirname(os.path.abspath(__file__))
+    paths = paths or [os.path.join(here, "report_oct2025.pdf"), os.path.join(here, "report_june2024.pdf.pdf")]
+    with tempfile.TemporaryDirectory() as cache_dir:
+        start = time.perf_counter()
+        BulletinLibrary(paths, cache_dir, workers).bulletins()
+        cold = time.perf_counter() - start
+
+        library = BulletinLibrary(paths, cache_dir, workers)
+        start = time.perf_counter()
+        bulletins = library.bulletins()
+        cached = time.perf_counter() - start
+
+        warm = percentiles(run_concurrently(library.bulletins, 200, 1))
+    pages = sum(b["page_count"] for b in bulletins)
+    print("\n📊 Bulletin ingestion")
+    print(f"   {len(bulletins)} bulletins, {pages} pages")
+    print(f"   cold extraction:   {cold * 1000:.1f}ms")
+    print(f"   disk cache (hash): {cached * 1000:.1f}ms")
+    print(f"   unchanged files:   p50={warm['p50_ms']:.3f}ms")
+    return {"cold_s": cold, "cached_s": cached, "warm": warm}
+
+
+def bench_indicator_store(counties, months):
+    """Bulk load, reload from disk and range/trend queries on the columnar history."""
+    import numpy as np
+    from indicator_store import IndicatorStore, month_index, month_label
+
+    rows = counties * months
+    rng = np.random.default_rng(7)
+    names = np.repeat(np.array([f"County-{i:05d}" for i in range(counties)]), months)
+    first = month_index("1950-01")
+    month = np.tile(np.arange(first, first + months, dtype=np.int32), counties)
+    metrics = {
+        "vci": rng.uniform(0, 60, rows).astype(np.float32),
+        "water_distance_km": rng.uniform(0, 20, rows).astype(np.float32),
+        "goat_price_kes": rng.uniform(1500, 6000, rows).astype(np.float32),
+        "maize_price_kes": rng.uniform(40, 120, rows).astype(np.float32),
+    }
+    # Rows arrive month by month, interleaved across counties
+    order = np.argsort(month, kind="stable")
+    names, month = names[order], month[order]
+    metrics = {key: values[order] for key, values in metrics.items()}
+
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "indicators.bin")
+        store = IndicatorStore(path)
+        start = time.perf_counter()
+        batch = counties * 12
+        for offset in range(0, rows, batch):
+            window = slice(offset, offset + batch)
+            store.append_many(names[window], month[window],
+                              {key: values[window] for key, values in metrics.items()})
+        load = time.perf_counter() - start
+
+        start = time.perf_counter()
+        reopened = IndicatorStore(path)
+        reload = time.perf_counter() - start
+        assert reopened.stats()["keys"] == rows
+
+        last = month_label(first + months - 1)
+        single = percentiles(run_concurrently(lambda: store.append("County-00000", last, {"vci": 21.0}), 100, 1))
+        history = percentiles(run_concurrently(
+            lambda: store.history("County-00042", month_label(first + months - 36), last), 200, 1))
+        trend = percentiles(run_concurrently(lambda: store.trend("vci", 3), 20, 1))
+
+    print("\n📊 Indicator store")
+    print(f"   {rows} rows ({counties} counties x {months} months)")
+    print(f"   bulk append (yearly batches): {load:.2f}s ({rows / load / 1e6:.2f}M rows/s)")
+    print(f"   reload from disk:             {reload * 1000:.0f}ms")
+    print(f"   single append:   p50={single['p50_ms']:.2f}ms  p99={single['p99_ms']:.2f}ms")
+    print(f"   36-month history: p50={history['p50_ms']:.3f}ms  p99={history['p99_ms']:.3f}ms")
+    print(f"   3-month VCI trend, all counties: p50={trend['p50_ms']:.2f}ms  p99={trend['p99_ms']:.2f}ms")
+    return {"rows": rows, "load_s": load, "reload_s": reload, "single": single,
+            "history": history, "trend": trend}
+
+
+def _fake_env(args):
+    """
+    Points main.py's caches, history and templates at a temporary directory
+    (unless ASAL_CACHE_DIR / ASAL_DATA_DIR are already set) and turns off
+    the presentation pauses. --cold turns off the reuse layers (response
+    cache, lingering coalesced results, incremental runs, templates), so each
+    workflow makes its full set of model calls.
+    """
+    scratch = tempfile.mkdtemp(prefix="asal-bench-")
+    os.environ.setdefault("ASAL_CACHE_DIR", os.path.join(scratch, "cache"))
+    os.environ.setdefault("ASAL_DATA_DIR", os.path.join(scratch, "data"))
+    os.environ.update({
+        "ASAL_THINKING_PAUSE_SECONDS": "0",
+        "ASAL_FIELD_REPORT_DELAY_SECONDS": "0",
+    })
+    os.environ["ASAL_MODEL_RPM"] = str(args.rpm)
+    # Load generators hold /api/run open on every client thread
+    os.environ.setdefault("ASAL_MAX_WAITING_REQUESTS", "1000")
+    if args.cold:
+        os.environ.update({"ASAL_RESPONSE_CACHE": "0", "ASAL_COALESCE_SECONDS": "0",
+                           "ASAL_INCREMENTAL": "0", "ASAL_RESPONDER_TEMPLATES": "0"})
+
+
+def _install_fake(args):
+    """
+    Imports main against a fake Gemini backend. Each benchmarked county gets
+    a synthetic field report.
+
+    Returns:
+        tuple: (main module, FakeGenAI)
+    """
+    import random
+    import main
+    import fake_gemini
+    from bulletin_ingest import ASAL_COUNTIES
+
+    # Synthetic field reports, so concurrent runs cover distinct counties
+    rng = random.Random(7)
+    for county in ASAL_COUNTIES[:args.counties]:
+        main.FIELD_REPORTS.setdefault(county, (
+            f"Field Report - {county} County\n"
+            f"Vegetation Index (3-month) is currently at {rng.uniform(10, 50):.1f}.\n"
+            f"Pastoralists reporting trekking {rng.uniform(2, 20):.1f}km to water sources.\n"
+            f"Goat prices are at {rng.randrange(1500, 6000)} KES at the local market.\n"
+            f"Maize prices are at {rng.randrange(40, 120)} KES per kg.\n"
+        ))
+
+    fake = fake_gemini.install(
+        main, seed=7,
+        latency=fake_gemini.latency_distribution(args.latency),
+        quota_error_rate=args.error_rate / 2, server_error_rate=args.error_rate / 2
+    )
+    # Warm start: agents built, Responder templates generated
+    main.get_agents()
+    if main.responder_templates is not None:
+        main.responder_templates.warm()
+    return main, fake
+
+
+def _fake_backend(args):
+    """Imports main against a fake Gemini backend, with caches in a temporary directory."""
+    _fake_env(args)
+    return _install_fake(args)
+
+
+def _drive(label, run_once, counties, levels, requests, main, fake):
+    """
+    Runs run_once(county) at each concurrency level, cycling through counties.
+    Workflow logging is silenced while measuring.
+
+    Returns:
+        list: Per-level latency percentiles, throughput and API calls per workflow
+    """
+    results = []
+    print(f"\n📊 {label}")
+    for threads in levels:
+        failures = []
+        turn = itertools.count()
+
+        def call():
+            try:
+                run_once(counties[next(turn) % len(counties)])
+            except Exception as e:
+                failures.append(e)
+
+        before = fake.stats()["calls"]
+        retries_before = main.gemini_client.stats()["retries"]
+        total = max(requests, threads)
+        start = time.perf_counter()
+        with contextlib.redirect_stdout(io.StringIO()):
+            latencies = run_concurrently(call, total, threads)
+        wall = time.perf_counter() - start
+        stats = percentiles(latencies)
+        level = {
+            "concurrency": threads,
+            "workflows": len(latencies),
+            "failures": len(failures),
+            "throughput_per_s": len(latencies) / wall,
+            "api_calls_per_workflow": (fake.stats()["calls"] - before) / len(latencies),
+            "retries": main.gemini_client.stats()["retries"] - retries_before,
+            **stats,
+        }
+        results.append(level)
+        print(f"   c={threads:<3} p50={stats['p50_ms']:.0f}ms  p95={stats['p95_ms']:.0f}ms  "
+              f"p99={stats['p99_ms']:.0f}ms  {level['throughput_per_s']:.1f}/s  "
+              f"{level['api_calls_per_workflow']:.2f} calls/workflow  {len(failures)} failed")
+    return results
+
+
+def _cache_mode(args):
+    if args.cold:
+        return "cold: caches, coalescing and templates off"
+    return ("warm: caches and pre-generated templates answer most runs, so calls/workflow "
+            "is near 0; pass --cold for the full model-call cost")
+
+
+def bench_workflow(args):
+    """run_agent_workflow end to end against the fake backend, at rising concurrency."""
+    main, fake = _fake_backend(args)
+    return _drive(f"Workflow (run_agent_workflow, fake Gemini)\n   {_cache_mode(args)}",
+                  lambda county: main.run_agent_workflow(county),
+                  main.available_counties(), args.concurrency, args.requests, main, fake)
+
+
+def bench_http(args):
+    """The Flask /api/run endpoint against the fake backend, at rising concurrency."""
+    main, fake = _fake_backend(args)
+    import app
+
+    def post(county):
+        response = app.app.test_client().post("/api/run", json={"county": county})
+        if response.status_code != 200:
+            raise RuntimeError(f"/api/run returned {response.status_code}")
+
+    return _drive(f"HTTP (POST /api/run, fake Gemini)\n   {_cache_mode(args)}", post, main.available_counties(),
+                  args.concurrency, args.requests, main, fake)
+
+
+def bench_dashboard(args):
+    """
+    Dashboard reads after one run per county: /api/run against /api/latest
+    (plain, gzip and revalidated with If-None-Match), and the index page
+    rendered per request against the page rendered once at startup.
+    """
+    main, fake = _fake_backend(args)
+    import app
+    from flask import render_template_string
+
+    # The index as it was served before: render_template_string on every request
+    app.app.add_url_rule("/bench-index-uncached", "bench_index_uncached",
+                         lambda: render_template_string(app.HTML_TEMPLATE))
+    counties = main.available_counties()[:args.counties]
+    with contextlib.redirect_stdout(io.StringIO()):
+        for county in counties:
+            main.run_agent_workflow(county)
+    client = app.app.test_client()
+    etags = {county: client.get(f"/api/latest/{county}").headers["ETag"] for county in counties}
+
+    cases = [
+        ("POST /api/run", lambda county: client.post("/api/run", json={"county": county}), 200),
+        ("GET /api/latest", lambda county: client.get(f"/api/latest/{county}"), 200),
+        ("GET /api/latest gzip", lambda county: client.get(f"/api/latest/{county}",
+                                                           headers={"Accept-Encoding": "gzip, br"}), 200),
+        ("GET /api/latest If-None-Match", lambda county: client.get(
+            f"/api/latest/{county}", headers={"If-None-Match": etags[county]}), 304),
+        ("GET / (rendered per request)", lambda county: client.get("/bench-index-uncached"), 200),
+        ("GET / (rendered once)", lambda county: client.get("/", headers={"Accept-Encoding": "gzip"}), 200),
+    ]
+    results = []
+    print(f"\n📊 Dashboard reads ({len(counties)} counties, {args.requests} requests each, "
+          f"{args.threads} thread(s))")
+    for label, request_once, expected in cases:
+        turn = itertools.count()
+        sizes = []
+
+        def call():
+            response = request_once(counties[next(turn) % len(counties)])
+            if response.status_code != expected:
+                raise RuntimeError(f"{label} returned {response.status_code}")
+            sizes.append(len(response.get_data()))
+
+        calls_before = fake.stats()["calls"]
+        cpu_before = time.process_time()
+        with contextlib.redirect_stdout(io.StringIO()):
+            latencies = run_concurrently(call, args.requests, args.threads)
+        cpu = time.process_time() - cpu_before
+        stats = percentiles(latencies)
+        result = {"case": label, "requests": len(latencies), "cpu_us_per_request": cpu / len(latencies) * 1e6,
+                  "bytes": statistics.mean(sizes), "model_calls": fake.stats()["calls"] - calls_before, **stats}
+        results.append(result)
+        print(f"   {label:<32} p50={stats['p50_ms'] * 1000:.0f}µs  p95={stats['p95_ms'] * 1000:.0f}µs  "
+              f"cpu={result['cpu_us_per_request']:.0f}µs/req  {result['bytes']:.0f} B  "
+              f"{result['model_calls']} model calls")
+    return results
+
+
+def bench_monitor(args):
+    """
+    The monitoring daemon over every county with a compressed interval.
+    First --cycles steady cycles, then a restart after --downtime missed
+    intervals, with catch-up spread over a quarter interval and with no
+    spread at all.
+    """
+    from monitor import Monitor, run_county
+
+    main, fake = _fake_backend(args)
+    counties = main.available_counties()
+    state_path = os.path.join(os.environ["ASAL_DATA_DIR"], "monitor.json")
+    starts, in_flight, peak = [], [0], [0]
+    lock = threading.Lock()
+
+    def run(county):
+        with lock:
+            starts.append(time.time())
+            in_flight[0] += 1
+            peak[0] = max(peak[0], in_flight[0])
+        try:
+            run_county(county)
+        finally:
+            with lock:
+                in_flight[0] -= 1
+
+    def observe(label, catch_up_window, cycles):
+        del starts[:]
+        peak[0] = 0
+        calls_before = fake.stats()["calls"]
+        monitor = Monitor(run, counties, interval=args.interval, max_workers=args.workers,
+                          saturation=main.gemini_client.saturation, max_saturation=0.9,
+                          backpressure_wait=0.25, catch_up_window=catch_up_window,
+                          state_path=state_path, seed=7)
+        start = time.time()
+        with contextlib.redirect_stdout(io.StringIO()):
+            monitor.start()
+            while len(monitor.stats()["cycles"]) < cycles and time.time() - start < args.interval * (cycles + 2):
+                time.sleep(0.2)
+            monitor.stop()
+        stats = monitor.stats()
+        first = sorted(starts)[:len(counties)]
+        herd = max(sum(1 for t in first if s <= t < s + 1.0) for s in first) if first else 0
+        result = {
+            "runs": stats["runs"], "failures": stats["failures"], "overruns": stats["overruns"],
+            "missed": stats["missed"], "caught_up": stats["caught_up"], "lag": stats["lag"],
+            "backpressure_waits": stats["backpressure_waits"],
+            "backpressure_seconds": stats["backpressure_seconds"],
+            "cycles": [{"seconds": c["seconds"], "runs_per_minute": c["runs_per_minute"],
+                        "failures": c["failures"]} for c in stats["cycles"]],
+            "max_starts_in_1s": herd, "peak_in_flight": peak[0],
+            "model_calls": fake.stats()["calls"] - calls_before,
+        }
+        lag = stats["lag"]
+        print(f"   {label}: {stats['runs']} runs  lag p50={lag['p50_s'] or 0:.2f}s p95={lag['p95_s'] or 0:.2f}s  "
+              f"held back {stats['backpressure_seconds']:.1f}s ({stats['backpressure_waits']}x)  "
+              f"overruns={stats['overruns']}  missed={stats['missed']}  "
+              f"peak {peak[0]}/{args.workers} in flight  max {herd} starts/s")
+        for c in result["cycles"]:
+            print(f"      cycle: {c['seconds']:.1f}s  {c['runs_per_minute']:.1f} runs/min  {c['failures']} failed")
+        return result
+
+    def rewind(intervals):
+        # Pretend the daemon was down: every finish time moves back
+        with open(state_path, encoding="utf-8") as f:
+            state = json.load(f)
+        with open(state_path, "w", encoding="utf-8") as f:
+            json.dump({county: finished - intervals * args.interval for county, finished in state.items()}, f)
+
+    print(f"\n📊 Monitor ({len(counties)} counties, interval {args.interval:.0f}s, {args.workers} workers, "
+          f"{args.rpm} rpm per model)")
+    results = {"counties": len(counties), "interval": args.interval, "workers": args.workers}
+    results["steady"] = observe("steady", args.interval / 4, args.cycles)
+    rewind(args.downtime)
+    results["catch_up"] = observe(f"after {args.downtime} missed intervals", args.interval / 4, 1)
+    rewind(args.downtime)
+    results["catch_up_no_spread"] = observe("same, no catch-up spread", 0.0, 1)
+    return results
+
+
+def bench_batching(args):
+    """
+    Sentinel model fallbacks from many concurrent runs: one call per report
+    vs packed batches. The reports lack VCI, so every one needs the model.
+    """
+    main, fake = _fake_backend(args)
+    sentinel = main.get_agents()["sentinel"]
+    reports = [f"Field Report - Site {i}\nGoat prices are at {1500 + i} KES at the local market.\n"
+               for i in range(args.requests)]
+    batcher = main.sentinel_batcher
+    results = {}
+    for label, active in (("unbatched", None), ("batched", batcher)):
+        main.sentinel_batcher = active
+        before = fake.stats()["calls"]
+        turn = itertools.count()
+        start = time.perf_counter()
+        with contextlib.redirect_stdout(io.StringIO()):
+            latencies = run_concurrently(lambda: sentinel.structure_report(reports[next(turn) % len(reports)]),
+                                         args.requests, args.threads)
+        wall = time.perf_counter() - start
+        results[label] = {"throughput_per_s": len(latencies) / wall,
+                          "api_calls_per_report": (fake.stats()["calls"] - before) / len(latencies),
+                          **percentiles(latencies)}
+    main.sentinel_batcher = batcher
+    results["batcher"] = batcher.stats() if batcher is not None else None
+
+    print(f"\n📊 Sentinel fallback batching ({args.requests} reports, {args.threads} threads)")
+    for label in ("unbatched", "batched"):
+        r = results[label]
+        print(f"   {label:<10} p50={r['p50_ms']:.0f}ms  p99={r['p99_ms']:.0f}ms  "
+              f"{r['throughput_per_s']:.1f}/s  {r['api_calls_per_report']:.2f} calls/report")
+    if batcher is not None:
+        b = results["batcher"]
+        print(f"   mean batch {b['mean_batch_size']:.1f} items, fill {b['fill_ratio']:.0%}, "
+              f"{b['prompt_chars_per_item']:.0f} prompt chars/item, {b['requeued']} re-queued")
+    return results
+
+
+# Run in a fresh interpreter per sample: times `import app`, the first /health
+# and the first index page, and reports which heavy modules got imported
+_COLD_START_PROBE = """
+import json, sys, time
+start = time.perf_counter()
+import app
+imported = time.perf_counter()
+client = app.app.test_client()
+health = client.get("/health")
+first_request = time.perf_counter()
+index = client.get("/")
+index_done = time.perf_counter()
+print(json.dumps({
+    "import_s": imported - start,
+    "first_request_s": first_request - start,
+    "index_s": index_done - first_request,
+    "status": [health.status_code, index.status_code],
+    "loaded": [m for m in ("google.generativeai", "pypdf", "numpy") if m in sys.modules],
+}))
+"""
+
+
+def _import_profile(env, top):
+    """Slowest modules by cumulative import time, from `python -X importtime -c 'import app'`."""
+    proc = subprocess.run([sys.executable, "-X", "importtime", "-c", "import app"], env=env,
+                          capture_output=True, text=True, cwd=os.path.dirname(os.path.abspath(__file__)))
+    rows = []
+    for line in proc.stderr.splitlines():
+        if not line.startswith("import time:") or "cumulative" in line:
+            continue
+        _, self_us, cumulative_us, name = (part.strip() for part in line.replace("import time:", "|", 1).split("|"))
+        rows.append({"module": name, "self_ms": int(self_us) / 1000, "cumulative_ms": int(cumulative_us) / 1000})
+    rows.sort(key=lambda row: row["cumulative_ms"], reverse=True)
+    return rows[:top]
+
+
+def bench_cold_start(runs, top):
+    """
+    Time to first request in fresh processes: the interpreter start up to the
+    first /health response. Nothing here may import the Gemini SDK.
+    """
+    env = dict(os.environ)
+    with tempfile.TemporaryDirectory(prefix="asal-cold-") as tmp:
+        env["ASAL_CACHE_DIR"] = os.path.join(tmp, "cache")
+        env["ASAL_DATA_DIR"] = os.path.join(tmp, "data")
+        samples = []
+        for _ in range(runs):
+            start = time.perf_counter()
+            proc = subprocess.run([sys.executable, "-c", _COLD_START_PROBE], env=env, capture_output=True,
+                                  text=True, cwd=os.path.dirname(os.path.abspath(__file__)))
+            if proc.returncode != 0:
+                raise RuntimeError(f"Cold start probe failed:\n{proc.stderr}")
+            sample = json.loads(proc.stdout.strip().splitlines()[-1])
+            sample["process_s"] = time.perf_counter() - start
+            samples.append(sample)
+        profile = _import_profile(env, top)
+        touched = sorted(os.listdir(tmp))
+
+    results = {
+        "import": percentiles([s["import_s"] for s in samples]),
+        "first_request": percentiles([s["first_request_s"] for s in samples]),
+        "index": percentiles([s["index_s"] for s in samples]),
+        "process": percentiles([s["process_s"] for s in samples]),
+        "loaded_modules": sorted({m for s in samples for m in s["loaded"]}),
+        "statuses": sorted({tuple(s["status"]) for s in samples}),
+        "created_paths": touched,
+        "import_profile": profile,
+    }
+
+    print(f"\n📊 Cold start ({runs} fresh processes)")
+    for label in ("import", "first_request", "index", "process"):
+        r = results[label]
+        print(f"   {label:<14} p50={r['p50_ms']:.0f}ms  p95={r['p95_ms']:.0f}ms")
+    print(f"   heavy modules loaded: {', '.join(results['loaded_modules']) or 'none'}")
+    print(f"   files created at import: {', '.join(touched) or 'none'}")
+    print("\n   Slowest imports (cumulative):")
+    for row in profile:
+        print(f"   {row['cumulative_ms']:8.1f}ms  {row['module']}")
+    return results
+
+
+def serve(args):
+    """
+    Serves app.py under gunicorn against the fake backend. Every worker
+    installs the fake after the fork, and on exit appends its model calls,
+    listings and peak RSS as a JSON line to --stats-file.
+    """
+    import resource
+    from gunicorn.app.base import BaseApplication
+
+    _fake_env(args)
+    installed = {}
+
+    def worker_exit(server, worker):
+        if args.stats_file and "fake" in installed:
+            main = installed["main"]
+            record = {"pid": os.getpid(), **installed["fake"].stats(),
+                      "max_rss_mb": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024,
+                      "shared_state": main.shared_state.stats() if main.shared_state is not None else None}
+            with open(args.stats_file, "a", encoding="utf-8") as f:
+                f.write(json.dumps(record) + "\n")
+
+    class FakeBackedApp(BaseApplication):
+        def load_config(self):
+            for key, value in {"bind": f"127.0.0.1:{args.port}", "workers": args.workers,
+                               "threads": args.threads, "timeout": 0, "loglevel": "warning",
+                               "worker_exit": worker_exit}.items():
+                self.cfg.set(key, value)
+
+        def load(self):
+            # Runs in each worker after the fork; bulletins are ingested before serving
+            with contextlib.redirect_stdout(io.StringIO()):
+                installed["main"], installed["fake"] = _install_fake(args)
+                installed["main"].available_counties()
+                import app
+            return app.app
+
+    FakeBackedApp().run()
+
+
+def _http(method, url, body=None, timeout=60):
+    import urllib.error
+    import urllib.request
+    data = None if body is None else json.dumps(body).encode("utf-8")
+    request = urllib.request.Request(url, data=data, method=method,
+                                     headers={"Content-Type": "application/json"})
+    try:
+        with urllib.request.urlopen(request, timeout=timeout) as response:
+            return response.status, json.loads(response.read() or b"null")
+    except urllib.error.HTTPError as e:
+        return e.code, None
+
+
+def _free_port():
+    import socket
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def bench_workers(args):
+    """
+    The same load against gunicorn with 1, 2, 4 and 8 workers, with shared
+    state on and off. Each workflow is submitted to /api/jobs and polled
+    until done, so polls land on workers other than the one running the job.
+    """
+    from bulletin_ingest import ASAL_COUNTIES
+    counties = list(ASAL_COUNTIES[:args.counties]) or ["Garissa"]
+    modes = ("shared", "local") if args.compare else ("shared",)
+    script = os.path.abspath(__file__)
+    results = []
+    print(f"\n📊 gunicorn workers ({args.requests} workflows at concurrency {args.concurrency}, "
+          f"{args.threads} threads per worker)")
+    for workers in args.workers:
+        for mode in modes:
+            with tempfile.TemporaryDirectory(prefix="asal-workers-") as tmp:
+                port = _free_port()
+                stats_file = os.path.join(tmp, "workers.jsonl")
+                env = dict(os.environ, ASAL_CACHE_DIR=os.path.join(tmp, "cache"),
+                           ASAL_DATA_DIR=os.path.join(tmp, "data"),
+                           ASAL_SHARED_STATE="1" if mode == "shared" else "0")
+                command = [sys.executable, script, "serve", "--workers", str(workers),
+                           "--threads", str(args.threads), "--port", str(port),
+                           "--latency", args.latency, "--error-rate", str(args.error_rate),
+                           "--counties", str(args.counties), "--rpm", str(args.rpm),
+                           "--stats-file", stats_file] + (["--cold"] if args.cold else [])
+                server = subprocess.Popen(command, env=env, stdout=subprocess.DEVNULL,
+                                          stderr=subprocess.DEVNULL)
+                base = f"http://127.0.0.1:{port}"
+                try:
+                    deadline = time.monotonic() + 60
+                    while True:
+                        try:
+                            if _http("GET", f"{base}/health", timeout=2)[0] == 200:
+                                break
+                        except OSError:
+                            pass
+                        if time.monotonic() > deadline or server.poll() is not None:
+                            raise RuntimeError(f"gunicorn with {workers} workers did not start")
+                        time.sleep(0.05)
+
+                    turn = itertools.count()
+                    lock = threading.Lock()
+                    counters = {"failures": 0, "poll_misses": 0, "polls": 0}
+
+                    def run_job():
+                        county = counties[next(turn) % len(counties)]
+                        status, job = _http("POST", f"{base}/api/jobs", {"county": county})
+                        polls = misses = 0
+                        while job is not None and job["status"] in ("queued", "running"):
+                            time.sleep(0.02)
+                            status, polled = _http("GET", f"{base}/api/jobs/{job['job_id']}")
+                            polls += 1
+                            if status == 404:
+                                # Without shared state, only the submitting worker knows the job
+                                misses += 1
+                                if misses > 500:
+                                    break
+                                continue
+                            job = polled
+                        with lock:
+                            counters["polls"] += polls
+                            counters["poll_misses"] += misses
+                            if job is None or job.get("status") != "succeeded":
+                                counters["failures"] += 1
+
+                    start = time.perf_counter()
+                    latencies = run_concurrently(run_job, args.requests, args.concurrency)
+                    wall = time.perf_counter() - start
+                finally:
+                    server.terminate()
+                    try:
+                        server.wait(timeout=30)
+                    except subprocess.TimeoutExpired:
+                        server.kill()
+                with open(stats_file, encoding="utf-8") as f:
+                    per_worker = [json.loads(line) for line in f if line.strip()]
+
+            calls = sum(w["calls"] for w in per_worker)
+            level = {
+                "workers": workers,
+                "mode": mode,
+                "workflows": len(latencies),
+                "throughput_per_s": len(latencies) / wall,
+                "api_calls_per_workflow": calls / len(latencies),
+                "model_listings": sum(w["listings"] for w in per_worker),
+                "max_rss_mb_per_worker": max((w["max_rss_mb"] for w in per_worker), default=0.0),
+                "total_rss_mb": sum(w["max_rss_mb"] for w in per_worker),
+                **counters,
+                **percentiles(latencies),
+            }
+            results.append(level)
+            print(f"   workers={workers:<2} {mode:<6} p50={level['p50_ms']:.0f}ms  p95={level['p95_ms']:.0f}ms  "
+                  f"{level['throughput_per_s']:.1f}/s  {level['api_calls_per_workflow']:.2f} calls/workflow  "
+                  f"{level['model_listings']} listings  {level['total_rss_mb']:.0f}MB RSS  "
+                  f"{level['poll_misses']} poll 404s  {level['failures']} failed")
+    return results
+
+
+def _synthetic_subscribers_csv(path, records, seed=7):
+    """Writes `records` subscriber rows over every ASAL county, ~6 sub-counties x 5 wards each."""
+    import numpy as np
+    from bulletin_ingest import ASAL_COUNTIES
+
+    rng = np.random.default_rng(seed)
+    places = [(county, f"{county} SC{s}", f"Ward {s}-{w}")
+              for county in ASAL_COUNTIES for s in range(1, 7) for w in range(1, 6)]
+    languages = np.array(["sw", "en", "so", "tuv"])
+    with open(path, "w", encoding="utf-8") as f:
+        f.write("msisdn,county,sub_county,ward,language\n")
+        for start in range(0, records, 1_000_000):
+            n = min(1_000_000, records - start)
+            numbers = 700_000_000 + start + np.arange(n)
+            place = rng.integers(0, len(places), n)
+            language = languages[rng.choice(4, n, p=[0.6, 0.25, 0.1, 0.05])]
+            f.write("".join(f"0{number},{places[p][0]},{places[p][1]},{places[p][2]},{lang}\n"
+                            for number, p, lang in zip(numbers.tolist(), place.tolist(), language.tolist())))
+    return places
+
+
+def _rss_mb():
+    with open("/proc/self/statm") as f:
+        return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE") / 2 ** 20
+
+
+def bench_subscribers(args):
+    """
+    CSV import, memory-mapped reopen and geographic queries at millions of
+    subscribers. "ALARM wards" are every ward of the first --alarm-counties counties.
+    """
+    from subscribers import SubscriberRegistry
+
+    with tempfile.TemporaryDirectory(prefix="asal-subscribers-") as tmp:
+        csv_path = os.path.join(tmp, "subscribers.csv")
+        start = time.perf_counter()
+        places = _synthetic_subscribers_csv(csv_path, args.records)
+        generate = time.perf_counter() - start
+
+        registry = SubscriberRegistry(os.path.join(tmp, "registry"))
+        imported = registry.import_csv(csv_path)
+        del registry
+
+        rss_before = _rss_mb()
+        start = time.perf_counter()
+        registry = SubscriberRegistry(os.path.join(tmp, "registry"))
+        total = len(registry)
+        reopen = time.perf_counter() - start
+
+        alarm_counties = {county for county, _, _ in places[:30 * args.alarm_counties]}
+        alarm_wards = [place for place in places if place[0] in alarm_counties]
+        registry.select(wards=alarm_wards, languages=["sw"])  # fault the pages in once
+        timings, selected = [], 0
+        for _ in range(args.queries):
+            start = time.perf_counter()
+            selected = len(registry.select(wards=alarm_wards, languages=["sw"]))
+            timings.append(time.perf_counter() - start)
+        alarm_sw = percentiles(timings)
+        county_rows = registry.select(county=places[0][0])
+        start = time.perf_counter()
+        county_numbers = registry.numbers(county_rows)
+        to_numbers = time.perf_counter() - start
+        ward_only = percentiles(run_concurrently(
+            lambda: registry.select(wards=[places[0]], languages=["sw"]), args.queries, 1))
+        rss_after = _rss_mb()
+        stats = registry.stats()
+        disk = sum(os.path.getsize(os.path.join(root, name))
+                   for root, _, names in os.walk(os.path.join(tmp, "registry")) for name in names)
+
+    results = {
+        "records": args.records, "subscribers": total, "generate_s": generate,
+        "import": imported, "reopen_s": reopen,
+        "alarm_wards": len(alarm_wards), "alarm_sw_selected": selected, "alarm_sw": alarm_sw,
+        "single_ward_sw": ward_only, "county_numbers_s": to_numbers, "county_numbers": len(county_numbers),
+        "bytes_per_subscriber": stats["bytes_per_subscriber"], "disk_bytes_per_subscriber": disk / total,
+        "rss_mb_after_queries": rss_after - rss_before, "stats": stats,
+    }
+    print(f"\n📊 Subscriber registry ({total:,} subscribers, {len(places)} wards)")
+    print(f"   CSV import: {imported['seconds']:.1f}s ({imported['rows'] / imported['seconds'] / 1e6:.2f}M rows/s)")
+    print(f"   reopen (memory-mapped): {reopen * 1000:.1f}ms")
+    print(f"   Swahili speakers in {len(alarm_wards)} ALARM wards ({selected:,} rows): "
+          f"p50={alarm_sw['p50_ms']:.1f}ms  p99={alarm_sw['p99_ms']:.1f}ms")
+    print(f"   Swahili speakers in one ward: p50={ward_only['p50_ms']:.3f}ms")
+    print(f"   {len(county_numbers):,} county numbers as strings: {to_numbers * 1000:.0f}ms")
+    print(f"   {stats['bytes_per_subscriber']:.1f} bytes/subscriber in columns + indexes, "
+          f"{disk / total:.1f} on disk; RSS +{rss_after - rss_before:.0f}MB after reopen and queries")
+    return results
+
+
+def _synthetic_ndvi_stack(path, rows, cols, years, drought_counties, seed=11):
+    """
+    Writes a monthly NDVI stack over a grid of the ASAL wards, with clouds and
+    a drought in the last three months over the first `drought_counties` counties.
+    Returns the ward names.
+    """
+    import numpy as np
+    from bulletin_ingest import ASAL_COUNTIES
+    from vci_raster import NdviStack, NODATA, NDVI_SCALE
+
+    rng = np.random.default_rng(seed)
+    wards = [f"{county}/{county} SC{s}/Ward {s}-{w}"
+             for county in ASAL_COUNTIES for s in range(1, 7) for w in range(1, 6)]
+    grid_rows = int(np.sqrt(len(wards))) + 1
+    grid_cols = -(-len(wards) // grid_rows)
+    r = np.arange(rows)[:, None]
+    c = np.arange(cols)[None, :]
+    zones = (r * grid_rows // rows) * grid_cols + (c * grid_cols // cols) + 1
+    zones[zones > len(wards)] = 0
+    # Outside an ellipse is outside the country
+    zones[((r - rows / 2) / (rows / 2)) ** 2 + ((c - cols / 2) / (cols / 2)) ** 2 > 1] = 0
+    zones = zones.astype(np.uint16)
+
+    bands = years * 12
+    _, ndvi = NdviStack.create(path, f"{2025 - years + 1}-01", bands, zones, wards)
+    base = (0.2 + 0.4 * rng.random(len(wards) + 1, dtype=np.float32))[zones]
+    drought = np.zeros(len(wards) + 1, np.float32)
+    drought[1:30 * drought_counties + 1] = 0.2
+    for band in range(bands):
+        year_anomaly = rng.uniform(-0.08, 0.08, len(wards) + 1).astype(np.float32)
+        if band >= bands - 3:
+            year_anomaly -= drought
+        value = base + 0.15 * np.sin(2 * np.pi * (band % 12) / 12) + year_anomaly[zones]
+        value += rng.integers(-300, 300, value.shape, dtype=np.int16) / np.float32(NDVI_SCALE)
+        band_ndvi = (np.clip(value, -1, 1) * NDVI_SCALE).astype(np.int16)
+        band_ndvi[rng.random(value.shape, dtype=np.float32) < 0.03] = NODATA
+        ndvi[band] = band_ndvi
+    ndvi.flush()
+    del ndvi
+    return wards
+
+
+def bench_vci_raster(args):
+    """
+    Zonal VCI over a synthetic national NDVI stack, per process count.
+    Ward and county results must match across process counts.
+
+    The stack is written by a separate process, so this process's peak RSS
+    reflects the zonal statistics only.
+    """
+    import concurrent.futures
+    import multiprocessing
+    from vci_raster import NdviStack
+
+    with tempfile.TemporaryDirectory(prefix="asal-ndvi-") as tmp:
+        start = time.perf_counter()
+        with concurrent.futures.ProcessPoolExecutor(1, mp_context=multiprocessing.get_context("spawn")) as pool:
+            pool.submit(_synthetic_ndvi_stack, tmp, args.rows, args.cols, args.years,
+                        args.drought_counties).result()
+        generate = time.perf_counter() - start
+        stack = NdviStack(tmp)
+        stack_bytes = os.path.getsize(os.path.join(tmp, "ndvi.npy"))
+        _, month = stack.months()
+
+        runs, reference = {}, None
+        for workers in args.workers:
+            rss_before = _rss_mb()
+            result = NdviStack(tmp).zonal_stats(month, window=args.window, workers=workers,
+                                                chunk_pixels=args.chunk_pixels)
+            rss_after = _rss_mb()
+            if reference is None:
+                reference = result
+            mismatch = max(abs(result["wards"][name]["vci"] - reference["wards"][name]["vci"])
+                           for name in reference["wards"] if reference["wards"][name]["vci"] is not None)
+            runs[workers] = {"seconds": result["seconds"], "chunks": result["chunks"],
+                             "mpixels_per_s": args.rows * args.cols / result["seconds"] / 1e6,
+                             "rss_mb_delta": rss_after - rss_before, "max_vci_mismatch": mismatch}
+        with open("/proc/self/status") as f:
+            peak_rss = next(int(line.split()[1]) / 1024 for line in f if line.startswith("VmHWM"))
+
+    counties = reference["counties"]
+    alarm = sorted(name for name, stats in counties.items() if stats["vci"] is not None and stats["vci"] < 20)
+    alarm_wards = sum(1 for stats in reference["wards"].values() if stats["vci"] is not None and stats["vci"] < 20)
+    bytes_read = args.years * args.window * args.rows * args.cols * 2
+    results = {
+        "rows": args.rows, "cols": args.cols, "bands": args.years * 12, "stack_bytes": stack_bytes,
+        "generate_s": generate, "month": month, "window": args.window, "bytes_read": bytes_read,
+        "runs": runs, "peak_rss_mb": peak_rss, "wards": len(reference["wards"]),
+        "alarm_counties": alarm, "alarm_wards": alarm_wards,
+        "sample_county": {name: counties[name] for name in sorted(counties)[:2]},
+    }
+    print(f"\n📊 Raster VCI ({args.rows}x{args.cols} px, {args.years * 12} monthly bands, "
+          f"{stack_bytes / 2 ** 30:.2f} GiB stack; generated in {generate:.1f}s)")
+    print(f"   {month}, {args.window}-month VCI: reads {bytes_read / 2 ** 30:.2f} GiB "
+          f"({args.years} years x {args.window} bands) per run")
+    for workers, run in runs.items():
+        print(f"   {workers} process(es): {run['seconds']:.2f}s  {run['mpixels_per_s']:.1f} Mpx/s  "
+              f"{run['chunks']} strips  RSS +{run['rss_mb_delta']:.0f}MB  "
+              f"max ward VCI diff {run['max_vci_mismatch']:.2g}")
+    print(f"   peak RSS of this process {peak_rss:.0f}MB; {alarm_wards} of {len(reference['wards'])} wards "
+          f"below VCI 20; counties in ALARM: {', '.join(alarm) or 'none'}")
+    return results
+
+
+def bench_sms_dispatch(args):
+    """One county alert to many recipients through local stand-in gateways."""
+    import fake_gemini
+    from sms_dispatch import SmsDispatcher, LocalGateway, segments
+
+    alert = ("NDMA ALERT: Garissa – drought ALARM. Water 18.6km, goats KES 4,550. "
+             "Tahadhari: ukame – hamisha mifugo karibu na maji. Piga 0800 721 000.")
+    gateways = [LocalGateway(f"local-{i}", max_concurrent=args.concurrency, max_batch=args.batch,
+                             latency=fake_gemini.latency_distribution(args.latency),
+                             retry_rate=args.retry_rate, reject_rate=args.reject_rate,
+                             error_rate=args.error_rate, delivery_rate=0.98, seed=i)
+                for i in range(args.gateways)]
+    dispatcher = SmsDispatcher(gateways, batch_size=args.batch, base_delay=0.2, max_delay=2.0)
+    for gateway in gateways:
+        gateway.on_receipt = dispatcher.delivery_report
+    numbers = [f"07{i:08d}" for i in range(args.recipients)]
+
+    start = time.perf_counter()
+    campaign = dispatcher.dispatch(alert, numbers, label="Garissa")
+    queued = time.perf_counter() - start
+    campaign.wait()
+    sent = time.perf_counter() - start
+    time.sleep(0.5)  # let the last receipts arrive
+    stats = campaign.stats()
+    raw_encoding, raw_parts = segments(alert)
+    results = {"queue_s": queued, "all_sent_s": sent, "campaign": stats,
+               "unpacked": {"encoding": raw_encoding, "segments_per_message": len(raw_parts)},
+               "dispatcher": dispatcher.stats(), "gateways": {g.name: g.stats() for g in gateways}}
+
+    print(f"\n📊 SMS dispatch ({args.recipients} recipients, {args.gateways} gateway(s) x "
+          f"{args.concurrency} concurrent, batches of {args.batch})")
+    print(f"   alert: {stats['characters']} chars, {stats['encoding']}, {stats['segments_per_message']} segment(s) "
+          f"(unpacked: {raw_encoding}, {len(raw_parts)} segments)")
+    print(f"   queued in {queued * 1000:.0f}ms, all sent or failed in {sent:.2f}s "
+          f"({args.recipients / sent:,.0f} messages/s)")
+    print(f"   delivered={stats['delivered']} sent={stats['sent']} failed={stats['failed']}  "
+          f"{stats['requests']} gateway requests, {stats['retried']} recipients retried")
+    return results
+
+
+def _git_commit():
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True,
+                              cwd=os.path.dirname(os.path.abspath(__file__))).stdout.strip() or None
+    except OSError:
+        return None
+
+
+def write_result(path, command, params, results):
+    """Appends one JSON line describing a benchmark run."""
+    record = {
+        "benchmark": command,
+        "timestamp": datetime.datetime.now(datetime.timezone.utc).isoformat(timespec="seconds"),
+        "commit": _git_commit(),
+        "params": params,
+        "results": results,
+    }
+    with open(path, "a", encoding="utf-8") as f:
+        f.write(json.dumps(record) + "\n")
+    print(f"\n💾 Results appended to {path}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="ASAL-Guardian benchmarks")
+    parser.add_argument("--output", help="Append results as a JSON line to this file")
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    setup = sub.add_parser("agent-setup", help="Agent construction vs warm pool")
+    setup.add_argument("--iterations", type=int, default=200)
+    setup.add_argument("--threads", type=int, default=8)
+
+    rules = sub.add_parser("guardian-rules", help="Vectorized Guardian classification")
+    rules.add_argument("--records", type=int, default=100000)
+
+    ingest = sub.add_parser("bulletin-ingest", help="NDMA bulletin PDF extraction and caching")
+    ingest.add_argument("--workers", type=int, default=None)
+    ingest.add_argument("paths", nargs="*")
+
+    store = sub.add_parser("indicator-store", help="Columnar indicator history at millions of rows")
+    store.add_argument("--counties", type=int, default=2000)
+    store.add_argument("--months", type=int, default=1000)
+
+    for name, help_text in (("workflow", "End-to-end workflow runs against a fake Gemini"),
+                            ("http", "POST /api/run against a fake Gemini")):
+        load = sub.add_parser(name, help=help_text)
+        load.add_argument("--concurrency", type=lambda v: [int(x) for x in v.split(",")],
+                          default=[1, 4, 16], help="Comma-separated thread counts")
+        load.add_argument("--requests", type=int, default=32, help="Workflows per concurrency level")
+        load.add_argument("--latency", default="lognormal:0.8,0.5",
+                          help="Fake model latency, see fake_gemini.latency_distribution")
+        load.add_argument("--error-rate", type=float, default=0.02,
+                          help="Share of fake calls failing with 429/503")
+        load.add_argument("--cold", action="store_true", help="Disable caches, coalescing and templates")
+        load.add_argument("--counties", type=int, default=23, help="Counties to cycle through")
+        load.add_argument("--rpm", type=int, default=6000, help="Client-side rate limit per model")
+
+    batching = sub.add_parser("batching", help="Sentinel fallbacks, one call each vs batched")
+    batching.add_argument("--requests", type=int, default=64)
+    batching.add_argument("--threads", type=int, default=16)
+    batching.add_argument("--latency", default="lognormal:0.8,0.5")
+    batching.add_argument("--error-rate", type=float, default=0.0)
+    batching.add_argument("--rpm", type=int, default=6000)
+    batching.add_argument("--counties", type=int, default=0)
+    batching.set_defaults(cold=True)
+
+    dashboard = sub.add_parser("dashboard", help="/api/latest and the cached index page against /api/run")
+    dashboard.add_argument("--requests", type=int, default=2000, help="Requests per case")
+    dashboard.add_argument("--threads", type=int, default=1)
+    dashboard.add_argument("--counties", type=int, default=23)
+    dashboard.add_argument("--latency", default="fixed:0.05")
+    dashboard.add_argument("--error-rate", type=float, default=0.0)
+    dashboard.add_argument("--rpm", type=int, default=6000)
+    dashboard.set_defaults(cold=False)
+
+    monitor = sub.add_parser("monitor", help="Scheduled runs of every county: lag, backpressure, catch-up")
+    monitor.add_argument("--interval", type=float, default=40.0, help="Seconds between a county's runs")
+    monitor.add_argument("--workers", type=int, default=4)
+    monitor.add_argument("--cycles", type=int, default=2)
+    monitor.add_argument("--downtime", type=int, default=5, help="Intervals missed before the restart")
+    monitor.add_argument("--latency", default="lognormal:0.8,0.5")
+    monitor.add_argument("--error-rate", type=float, default=0.02)
+    monitor.add_argument("--rpm", type=int, default=120)
+    monitor.add_argument("--counties", type=int, default=23)
+    monitor.set_defaults(cold=True)
+
+    workers = sub.add_parser("workers", help="gunicorn with 1-8 workers over HTTP, shared state on/off")
+    workers.add_argument("--workers", type=lambda v: [int(x) for x in v.split(",")], default=[1, 2, 4, 8],
+                         help="Comma-separated worker counts")
+    workers.add_argument("--compare", action="store_true", help="Also run without shared state")
+
+    serve_parser = sub.add_parser("serve", help="Serve app.py under gunicorn against a fake Gemini")
+    serve_parser.add_argument("--workers", type=int, default=2)
+    serve_parser.add_argument("--port", type=int, default=8080)
+    serve_parser.add_argument("--stats-file", help="Append per-worker call counts here on exit")
+
+    for parser_ in (workers, serve_parser):
+        parser_.add_argument("--threads", type=int, default=8, help="Threads per worker")
+        parser_.add_argument("--latency", default="lognormal:0.8,0.5")
+        parser_.add_argument("--error-rate", type=float, default=0.02)
+        parser_.add_argument("--cold", action="store_true")
+        parser_.add_argument("--counties", type=int, default=23)
+        parser_.add_argument("--rpm", type=int, default=6000)
+    workers.add_argument("--concurrency", type=int, default=16, help="Client threads")
+    workers.add_argument("--requests", type=int, default=64, help="Workflows per worker count")
+
+    subs = sub.add_parser("subscribers", help="Subscriber registry import and geographic queries")
+    subs.add_argument("--records", type=int, default=10_000_000)
+    subs.add_argument("--alarm-counties", type=int, default=5, help="Counties whose wards are in ALARM")
+    subs.add_argument("--queries", type=int, default=50)
+
+    raster = sub.add_parser("vci-raster", help="Zonal VCI over a synthetic memory-mapped NDVI stack")
+    raster.add_argument("--rows", type=int, default=3000)
+    raster.add_argument("--cols", type=int, default=3000)
+    raster.add_argument("--years", type=int, default=10)
+    raster.add_argument("--window", type=int, default=3, help="Months averaged into the VCI")
+    raster.add_argument("--workers", type=lambda v: [int(x) for x in v.split(",")], default=[1, 2, 4],
+                        help="Comma-separated process counts")
+    raster.add_argument("--chunk-pixels", type=int, default=1 << 20, help="Pixels per row strip")
+    raster.add_argument("--drought-counties", type=int, default=5)
+
+    sms = sub.add_parser("sms-dispatch", help="SMS fan-out of one alert through local gateways")
+    sms.add_argument("--recipients", type=int, default=300000)
+    sms.add_argument("--gateways", type=int, default=2)
+    sms.add_argument("--concurrency", type=int, default=8, help="Concurrent requests per gateway")
+    sms.add_argument("--batch", type=int, default=500, help="Recipients per gateway request")
+    sms.add_argument("--latency", default="lognormal:0.3,0.4", help="Gateway latency per request")
+    sms.add_argument("--retry-rate", type=float, default=0.02)
+    sms.add_argument("--reject-rate", type=float, default=0.002)
+    sms.add_argument("--error-rate", type=float, default=0.01, help="Share of requests failing outright")
+
+    cold = sub.add_parser("cold-start", help="Import time and time to first request in fresh processes")
+    cold.add_argument("--runs", type=int, default=5)
+    cold.add_argument("--top", type=int, default=15, help="Modules to list in the import profile")
+
+    args = parser.parse_args()
+    if args.command == "agent-setup":
+        results = bench_agent_setup(args.iterations, args.threads)
+    elif args.command == "guardian-rules":
+        results = bench_guardian_rules(args.records)
+    elif args.command == "bulletin-ingest":
+        results = bench_bulletin_ingest(args.paths, args.workers)
+    elif args.command == "indicator-store":
+        results = bench_indicator_store(args.counties, args.months)
+    elif args.command == "workflow":
+        results = bench_workflow(args)
+    elif args.command == "http":
+        results = bench_http(args)
+    elif args.command == "batching":
+        results = bench_batching(args)
+    elif args.command == "workers":
+        results = bench_workers(args)
+    elif args.command == "monitor":
+        results = bench_monitor(args)
+    elif args.command == "dashboard":
+        results = bench_dashboard(args)
+    elif args.command == "serve":
+        serve(args)
+        return
+    elif args.command == "subscribers":
+        results = bench_subscribers(args)
+    elif args.command == "vci-raster":
+        results = bench_vci_raster(args)
+    elif args.command == "sms-dispatch":
+        results = bench_sms_dispatch(args)
+    elif args.command == "cold-start":
+        results = bench_cold_start(args.runs, args.top)
+
+    if args.output:
+        params = {key: value for key, value in vars(args).items() if key not in ("command", "output")}
+        write_result(args.output, args.command, params, results)
+
+
+if __name__ == "__main__":
+    main()
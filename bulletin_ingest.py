@@ -0,0 +1,326 @@
+"""
+Streaming, cached ingestion of NDMA drought early warning bulletins.
+
+Monthly NDMA bulletins (PDF) are the authoritative source for a county's
+VCI, water distances and market prices. This module turns them into
+per-county text sections for the Sentinel:
+
+- The PDF is memory-mapped and parsed page by page, so the process never
+  holds a full copy of the file.
+- Larger bulletins are split into page ranges and extracted in parallel
+  in a process pool. Each worker maps the file itself, and results stream
+  back as each range finishes.
+- Extracted text and table rows are cached on disk, keyed by the SHA-256 of
+  the file content. Re-ingesting an unchanged bulletin only re-hashes it, and
+  an unchanged path, size and mtime skips even that. Only the condensed
+  county sections and the indicator table rows are kept, not the page text.
+- A file that fails to parse is remembered as failed until its size or
+  mtime changes, so a corrupt PDF is not re-parsed on every request.
+- Concurrent ingests of the same file share one parse (singleflight.py),
+  and BulletinLibrary.warm() runs the first ingest on a background thread
+  so no request thread pays for it.
+"""
+import concurrent.futures
+import hashlib
+import importlib.util
+import json
+import mmap
+import multiprocessing
+import os
+import re
+import threading
+
+from singleflight import Group
+from telemetry import get_logger
+
+# Bulletin ingestion is optional; the Sentinel falls back to field reports.
+# pypdf is imported on the first parse, not at module load.
+HAS_PYPDF = importlib.util.find_spec("pypdf") is not None
+
+# Kenya's 23 arid and semi-arid (ASAL) counties monitored by the NDMA
+ASAL_COUNTIES = (
+    "Baringo", "Embu", "Garissa", "Isiolo", "Kajiado", "Kilifi", "Kitui", "Kwale",
+    "Laikipia", "Lamu", "Makueni", "Mandera", "Marsabit", "Meru", "Narok", "Nyeri",
+    "Samburu", "Taita Taveta", "Tana River", "Tharaka Nithi", "Turkana", "Wajir",
+    "West Pokot",
+)
+
+log = get_logger("bulletin_ingest")
+
+# Pages per extraction task; bulletins up to this size are read in-process
+PAGES_PER_TASK = 8
+
+# Part of the cache file name; bumped when the cached bulletin layout changes
+CACHE_FORMAT = 2
+
+_HASH_BLOCK = 1 << 20
+
+_COUNTY_HEADER = re.compile(
+    r"^[ \t]*(" + "|".join(re.escape(c) for c in ASAL_COUNTIES) + r")\s+COUNTY\b",
+    re.IGNORECASE | re.MULTILINE)
+_PERIOD = re.compile(
+    r"BULLETIN\s+(?:FOR\s+)?(JANUARY|FEBRUARY|MARCH|APRIL|MAY|JUNE|JULY|AUGUST|SEPTEMBER|"
+    r"OCTOBER|NOVEMBER|DECEMBER)\s+(\d{4})", re.IGNORECASE)
+_MONTHS = ("JANUARY", "FEBRUARY", "MARCH", "APRIL", "MAY", "JUNE", "JULY", "AUGUST",
+           "SEPTEMBER", "OCTOBER", "NOVEMBER", "DECEMBER")
+_BULLET = re.compile(r"\s*[•▪●]\s*")
+_VALUE = re.compile(r"(?<![\w.])(?:Kshs?\.?\s*|KES\s*)?\d[\d,]*(?:\.\d+)?\s*(?:%|km|kg|litres|mm)?",
+                    re.IGNORECASE)
+_KEYWORDS = re.compile(
+    r"\b(?:VCI|vegetation condition|water|distance|trek\w*|goats?|maize|terms of trade|ToT)\b",
+    re.IGNORECASE)
+
+
+def file_sha256(path):
+    """SHA-256 of a file's content, read through a memory map in 1MB blocks."""
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        if os.fstat(f.fileno()).st_size == 0:
+            return digest.hexdigest()
+        with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mapped:
+            for offset in range(0, len(mapped), _HASH_BLOCK):
+                digest.update(mapped[offset:offset + _HASH_BLOCK])
+    return digest.hexdigest()
+
+
+def _open_reader(f):
+    from pypdf import PdfReader
+    mapped = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+    return mapped, PdfReader(mapped)
+
+
+def page_count(path):
+    with open(path, "rb") as f:
+        mapped, reader = _open_reader(f)
+        try:
+            return len(reader.pages)
+        finally:
+            del reader
+            mapped.close()
+
+
+def extract_page_range(path, start, stop):
+    """
+    Extracts pages [start, stop) of a PDF. Runs in pool workers.
+
+    Returns:
+        list: (page_number, text) tuples
+    """
+    with open(path, "rb") as f:
+        mapped, reader = _open_reader(f)
+        try:
+            return [(n, reader.pages[n].extract_text() or "") for n in range(start, stop)]
+        finally:
+            del reader
+            mapped.close()
+
+
+def iter_pages(path, workers=None):
+    """
+    Yields (page_number, text) as page ranges finish, not necessarily in order.
+
+    Bulletins of up to PAGES_PER_TASK pages are read in this process. Larger
+    ones are spread over a spawn-based process pool, since forking a
+    multi-threaded web worker is unsafe.
+    """
+    total = page_count(path)
+    if total <= PAGES_PER_TASK:
+        yield from extract_page_range(path, 0, total)
+        return
+    workers = workers or min(4, os.cpu_count() or 1)
+    ranges = [(start, min(start + PAGES_PER_TASK, total))
+              for start in range(0, total, PAGES_PER_TASK)]
+    context = multiprocessing.get_context("spawn")
+    with concurrent.futures.ProcessPoolExecutor(max_workers=min(workers, len(ranges)),
+                                                mp_context=context) as pool:
+        futures = [pool.submit(extract_page_range, path, start, stop) for start, stop in ranges]
+        for future in concurrent.futures.as_completed(futures):
+            yield from future.result()
+
+
+def normalize(text):
+    """Re-flows PDF text into one line per bullet point, with whitespace collapsed."""
+    lines = []
+    for chunk in _BULLET.split(text):
+        line = re.sub(r"\s+", " ", chunk).strip()
+        if line:
+            lines.append(line)
+    return lines
+
+
+def table_rows(text):
+    """
+    Picks indicator-table rows out of a page: a text label followed by two or
+    more values, e.g. 'Terms of Trade (ToT) 43 36kg' -> label, ['43', '36kg'].
+    """
+    rows = []
+    for line in text.splitlines():
+        line = line.strip()
+        if not line or len(line) > 160 or line.endswith("."):
+            continue
+        first = _VALUE.search(line)
+        if first is None or first.start() == 0:
+            continue
+        values = [v.strip() for v in _VALUE.findall(line[first.start():]) if v.strip()]
+        if len(values) >= 2:
+            rows.append({"label": line[:first.start()].strip(), "values": values})
+    return rows
+
+
+def bulletin_period(text):
+    """'YYYY-MM' of the bulletin from its title, or None."""
+    match = _PERIOD.search(text)
+    if match is None:
+        return None
+    return f"{match.group(2)}-{_MONTHS.index(match.group(1).upper()) + 1:02d}"
+
+
+def split_sections(pages):
+    """
+    Groups pages by the county named in their header line.
+
+    A page without a county header belongs to the county of the page before
+    it. County bulletins therefore become one section, and a multi-county
+    bulletin becomes one section per county.
+
+    Returns:
+        dict: County name -> list of normalized lines
+    """
+    sections = {}
+    county = None
+    for _, text in sorted(pages):
+        header = _COUNTY_HEADER.search(text[:400])
+        if header:
+            county = header.group(1).title()
+        if county is None:
+            continue
+        sections.setdefault(county, []).extend(normalize(text))
+    return sections
+
+
+def condense(lines, limit=60):
+    """Keeps the lines that mention Sentinel indicators, in document order."""
+    return "\n".join([line for line in lines if _KEYWORDS.search(line)][:limit])
+
+
+class BulletinLibrary:
+    """
+    Ingested bulletins with a content-addressed on-disk cache.
+
+    Attributes:
+        paths (list): Bulletin PDFs to ingest
+        cache_dir (str): Directory for <sha256>.v<CACHE_FORMAT>.json extraction results
+    """
+    def __init__(self, paths, cache_dir, workers=None):
+        self.paths = list(paths)
+        self.cache_dir = cache_dir
+        self.workers = workers
+        self._lock = threading.Lock()
+        # Path -> ((size, mtime_ns), bulletin or None, error or None)
+        self._loaded = {}
+        # One parse per file version at a time; finished ones are in _loaded
+        self._ingests = Group(linger=0.0)
+
+    @property
+    def available(self):
+        return HAS_PYPDF
+
+    def ingest(self, path):
+        """
+        Returns the extracted bulletin, from memory, disk cache or a fresh parse.
+
+        Returns:
+            dict: {"source", "sha256", "period", "page_count", "tables", "sections"},
+                sections mapping county -> condensed text
+
+        Raises:
+            Exception: The parse error, again on every call until the file changes
+        """
+        stat = os.stat(path)
+        identity = (stat.st_size, stat.st_mtime_ns)
+        with self._lock:
+            known = self._loaded.get(path)
+        if known is not None and known[0] == identity:
+            if known[2] is not None:
+                raise known[2]
+            return known[1]
+        bulletin, _ = self._ingests.do((path, identity), lambda publish: self._ingest(path, identity))
+        return bulletin
+
+    def _ingest(self, path, identity):
+        try:
+            bulletin = self._extract(path)
+        except Exception as e:
+            log.warning(f"⚠️  Warning: Could not ingest {path}: {e}")
+            with self._lock:
+                self._loaded[path] = (identity, None, e)
+            raise
+        with self._lock:
+            self._loaded[path] = (identity, bulletin, None)
+        return bulletin
+
+    def _extract(self, path):
+        digest = file_sha256(path)
+        cache_path = os.path.join(self.cache_dir, f"{digest}.v{CACHE_FORMAT}.json")
+        try:
+            with open(cache_path, encoding="utf-8") as f:
+                bulletin = json.load(f)
+        except (OSError, ValueError):
+            log.info(f"📄 [Ingest] Extracting {os.path.basename(path)}...")
+            pages = list(iter_pages(path, self.workers))
+            pages.sort()
+            full_text = "\n".join(text for _, text in pages)
+            bulletin = {
+                "source": os.path.basename(path),
+                "sha256": digest,
+                "period": bulletin_period(full_text),
+                "page_count": len(pages),
+                "tables": [dict(row, page=n) for n, text in pages for row in table_rows(text)],
+                "sections": {county: condense(lines) for county, lines in split_sections(pages).items()},
+            }
+            os.makedirs(self.cache_dir, exist_ok=True)
+            tmp_path = f"{cache_path}.{os.getpid()}.tmp"
+            with open(tmp_path, "w", encoding="utf-8") as f:
+                json.dump(bulletin, f)
+            os.replace(tmp_path, cache_path)
+        return bulletin
+
+    def warm(self):
+        """
+        Ingests every configured bulletin on a background thread and returns
+        the thread. Callers that need a bulletin meanwhile join its ingest.
+        """
+        thread = threading.Thread(target=self.bulletins, name="bulletin-warm", daemon=True)
+        thread.start()
+        return thread
+
+    def bulletins(self):
+        """All configured bulletins that exist and parse; failures are skipped (ingest() reports them)."""
+        if not self.available:
+            return []
+        results = []
+        for path in self.paths:
+            if not os.path.exists(path):
+                continue
+            try:
+                results.append(self.ingest(path))
+            except Exception:
+                continue
+        return results
+
+    def counties(self):
+        """Counties with at least one bulletin section."""
+        return sorted({county for b in self.bulletins() for county in b["sections"]})
+
+    def latest_section(self, county):
+        """
+        The condensed section for a county from its most recent bulletin.
+
+        Returns:
+            tuple or None: (text, bulletin) or None if no bulletin covers the county
+        """
+        covering = [b for b in self.bulletins() if county in b["sections"]]
+        if not covering:
+            return None
+        latest = max(covering, key=lambda b: b["period"] or "")
+        return latest["sections"][county], latest
@@ -0,0 +1,249 @@
+"""
+Local stand-in for Gemini models.
+
+FakeGenerativeModel mimics the parts of `genai.GenerativeModel` the agents
+use (`generate_content`, with and without `stream=True`). It can inject 429
+quota errors and 5xx server errors at configurable rates, so retry and rate
+limiting can be exercised without an API key or network. Latency can be
+fixed or drawn from a distribution, and without an explicit reply the model
+answers with JSON that fits its response schema.
+
+install() swaps the whole `genai` module used by main.py for FakeGenAI, so
+the real workflow runs end to end against fakes.
+"""
+import json
+import math
+import random
+import re
+import threading
+import time
+from types import SimpleNamespace
+
+
+class FakeQuotaError(Exception):
+    """Shaped like google.api_core's ResourceExhausted: HTTP 429 with a retry hint."""
+    code = 429
+
+    def __init__(self, retry_after=None):
+        super().__init__("429 Resource has been exhausted (e.g. check quota).")
+        self.retry_after = retry_after
+
+
+class FakeServerError(Exception):
+    """Shaped like google.api_core's ServiceUnavailable."""
+    code = 503
+
+    def __init__(self):
+        super().__init__("503 The service is currently unavailable.")
+
+
+def latency_distribution(spec):
+    """
+    Parses a latency spec into sample(rng) -> seconds.
+
+    Specs:
+        'fixed:0.8'            always 0.8s
+        'uniform:0.5,1.5'      uniform between the bounds
+        'lognormal:0.8,0.5'    median 0.8s, log-space sigma 0.5 (long tail)
+        'exponential:0.8'      mean 0.8s
+    """
+    kind, _, params = spec.partition(":")
+    values = [float(v) for v in params.split(",") if v.strip()]
+    if kind == "fixed":
+        return lambda rng: values[0]
+    if kind == "uniform":
+        return lambda rng: rng.uniform(values[0], values[1])
+    if kind == "lognormal":
+        return lambda rng: rng.lognormvariate(math.log(values[0]), values[1])
+    if kind == "exponential":
+        return lambda rng: rng.expovariate(1.0 / values[0])
+    raise ValueError(f"Unknown latency distribution '{spec}'")
+
+
+def schema_sample(schema):
+    """A minimal value that satisfies an OpenAPI-subset response schema."""
+    kind = schema.get("type")
+    if kind == "object":
+        return {name: schema_sample(spec) for name, spec in schema.get("properties", {}).items()}
+    if kind == "array":
+        return [schema_sample(schema.get("items", {}))]
+    if "enum" in schema:
+        return schema["enum"][0]
+    if kind == "string":
+        return "NDMA ALERT: sample"
+    if kind in ("number", "integer"):
+        return 1
+    if kind == "boolean":
+        return True
+    return None
+
+
+_BATCH_ID = re.compile(r"^### id=(\S+)$", re.MULTILINE)
+
+
+def batched_sample(schema, contents, drop, rng):
+    """
+    Reply to a batched prompt (see batching.batch_schema): one sample item per
+    '### id=' request in the prompt, each dropped with probability `drop`.
+    """
+    item_schema = schema["properties"]["items"]["items"]
+    items = []
+    for item_id in _BATCH_ID.findall(contents):
+        if drop and rng.random() < drop:
+            continue
+        item = schema_sample(item_schema)
+        item["id"] = item_id
+        items.append(item)
+    return {"items": items}
+
+
+class FakeUsage:
+    """Shaped like a response's usage_metadata; counts are roughly 4 characters per token."""
+    def __init__(self, prompt, text):
+        self.prompt_token_count = max(1, len(str(prompt)) // 4)
+        self.candidates_token_count = max(1, len(text) // 4)
+        self.total_token_count = self.prompt_token_count + self.candidates_token_count
+
+
+class FakeResponse:
+    def __init__(self, text, usage_metadata=None):
+        self.text = text
+        self.usage_metadata = usage_metadata
+
+
+class FakeGenerativeModel:
+    """
+    Drop-in replacement for genai.GenerativeModel.
+
+    Args:
+        model_name (str): Reported model name
+        system_instruction (str): Accepted and ignored
+        reply (str or callable): Response text, or reply(contents) -> text; if
+            None, JSON fitting the response schema (or '{}' without one)
+        generation_config (dict): As for genai; its 'response_schema' shapes default replies
+        latency (float or callable): Seconds each call takes, or a sampler
+            from latency_distribution()
+        quota_error_rate (float): Probability that a call raises FakeQuotaError
+        server_error_rate (float): Probability that a call raises FakeServerError
+        retry_after (float): Retry hint carried by injected 429s
+        batch_drop_rate (float): Probability that an item of a batched reply is left out
+        chunk_size (int): Characters per chunk when streaming
+    """
+    def __init__(self, model_name="models/fake", system_instruction=None, reply=None,
+                 latency=0.0, quota_error_rate=0.0, server_error_rate=0.0,
+                 retry_after=None, chunk_size=16, seed=None, generation_config=None,
+                 batch_drop_rate=0.0):
+        self.model_name = model_name
+        self.system_instruction = system_instruction
+        self.generation_config = generation_config
+        self.reply = reply
+        self.latency = latency
+        self.quota_error_rate = quota_error_rate
+        self.server_error_rate = server_error_rate
+        self.retry_after = retry_after
+        self.chunk_size = chunk_size
+        self.batch_drop_rate = batch_drop_rate
+        self._random = random.Random(seed)
+        self._lock = threading.Lock()
+        self.calls = 0
+        self.errors = 0
+
+    def _attempt(self, contents, generation_config=None):
+        with self._lock:
+            self.calls += 1
+            roll = self._random.random()
+            delay = self.latency(self._random) if callable(self.latency) else self.latency
+        if delay:
+            time.sleep(delay)
+        if roll < self.quota_error_rate:
+            with self._lock:
+                self.errors += 1
+            raise FakeQuotaError(self.retry_after)
+        if roll < self.quota_error_rate + self.server_error_rate:
+            with self._lock:
+                self.errors += 1
+            raise FakeServerError()
+        if self.reply is None:
+            schema = (generation_config or self.generation_config or {}).get("response_schema")
+            if not schema:
+                return "{}"
+            if "id" in schema.get("properties", {}).get("items", {}).get("items", {}).get("properties", {}):
+                with self._lock:
+                    return json.dumps(batched_sample(schema, contents, self.batch_drop_rate, self._random))
+            return json.dumps(schema_sample(schema))
+        return self.reply(contents) if callable(self.reply) else self.reply
+
+    def generate_content(self, contents, stream=False, generation_config=None, **kwargs):
+        text = self._attempt(contents, generation_config)
+        usage = FakeUsage(contents, text)
+        if not stream:
+            return FakeResponse(text, usage)
+        chunks = [FakeResponse(text[i:i + self.chunk_size])
+                  for i in range(0, len(text), self.chunk_size)] or [FakeResponse("")]
+        # As with the real API, the final chunk carries the totals
+        chunks[-1].usage_metadata = usage
+        return chunks
+
+
+class FakeGenAI:
+    """
+    Stands in for the `google.generativeai` module: configure, list_models
+    and GenerativeModel. Every model it builds shares the same options.
+
+    Args:
+        model_names (list): Names list_models() reports
+        **model_options: Passed to each FakeGenerativeModel (latency, error rates, reply, ...)
+    """
+    def __init__(self, model_names, seed=None, **model_options):
+        self.model_names = list(model_names)
+        self.model_options = model_options
+        self.models = []
+        self._seed = seed
+        self._lock = threading.Lock()
+        self.listings = 0
+
+    def configure(self, **kwargs):
+        pass
+
+    def list_models(self):
+        with self._lock:
+            self.listings += 1
+        return [SimpleNamespace(name=name, supported_generation_methods=["generateContent"])
+                for name in self.model_names]
+
+    def GenerativeModel(self, model_name, system_instruction=None, generation_config=None):
+        with self._lock:
+            seed = None if self._seed is None else self._seed + len(self.models)
+            model = FakeGenerativeModel(model_name, system_instruction, seed=seed,
+                                        generation_config=generation_config, **self.model_options)
+            self.models.append(model)
+        return model
+
+    def stats(self):
+        """Calls and injected errors summed over every model built so far, plus model listings."""
+        with self._lock:
+            models = list(self.models)
+            listings = self.listings
+        return {"calls": sum(m.calls for m in models), "errors": sum(m.errors for m in models),
+                "listings": listings}
+
+
+def install(main_module, model_names=None, **options):
+    """
+    Points main.py at a FakeGenAI and drops its cached models and agents.
+
+    Args:
+        main_module: The imported main module
+        model_names (list): Models to report; defaults to every MODEL_PREFERENCES entry
+        **options: See FakeGenAI
+
+    Returns:
+        FakeGenAI: For call statistics
+    """
+    if model_names is None:
+        model_names = sorted({name for prefs in main_module.MODEL_PREFERENCES.values() for name in prefs})
+    fake = FakeGenAI(model_names, **options)
+    main_module.genai = fake
+    main_module.model_registry.invalidate()
+    main_module.agent_pool.clear()
+    return fake
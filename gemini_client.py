@@ -0,0 +1,266 @@
+"""
+Rate-limited, retrying client layer for Gemini calls.
+
+Every agent call goes through one process-wide GeminiClient:
+- A token bucket per model keeps the process under that model's quota.
+- Transient failures (429, 5xx, deadline) are retried with jittered
+  exponential backoff. A server-supplied retry delay is honoured and pauses
+  the whole bucket, so other threads stop hitting the same quota.
+- Interactive requests are served before batch requests when both wait for
+  the same bucket.
+- When retries are exhausted, GeminiError is raised. An error never turns
+  into a string that is passed to the next agent as data.
+"""
+import contextlib
+import contextvars
+import random
+import re
+import threading
+import time
+
+from telemetry import get_logger, registry
+
+log = get_logger("gemini_client")
+
+QUOTA_WAIT = registry.histogram("asal_quota_wait_seconds", "Time spent waiting for a model's rate limit",
+                                labels=("model",))
+
+INTERACTIVE = 0
+BATCH = 1
+
+# HTTP status codes worth retrying
+RETRYABLE_CODES = {408, 429, 500, 502, 503, 504}
+_RETRYABLE_NAMES = {"ResourceExhausted", "TooManyRequests", "ServiceUnavailable",
+                    "InternalServerError", "DeadlineExceeded", "GatewayTimeout"}
+
+_RETRY_HINTS = (
+    re.compile(r"retry_delay\s*\{\s*seconds:\s*(\d+)", re.IGNORECASE),
+    re.compile(r"retry in\s+(\d+(?:\.\d+)?)\s*s", re.IGNORECASE),
+    re.compile(r"retry[- ]after:?\s*(\d+(?:\.\d+)?)", re.IGNORECASE),
+)
+
+_priority = contextvars.ContextVar("gemini_priority", default=INTERACTIVE)
+
+
+class GeminiError(Exception):
+    """A model call that failed permanently or ran out of retries."""
+    def __init__(self, message, cause=None, attempts=0):
+        super().__init__(message)
+        self.cause = cause
+        self.attempts = attempts
+
+
+@contextlib.contextmanager
+def request_priority(priority):
+    """Runs the enclosed model calls at INTERACTIVE or BATCH priority."""
+    token = _priority.set(priority)
+    try:
+        yield
+    finally:
+        _priority.reset(token)
+
+
+def current_priority():
+    """The priority model calls made here would run at (see request_priority())."""
+    return _priority.get()
+
+
+def is_retryable(error):
+    """True for quota, server-side and timeout errors."""
+    code = getattr(error, "code", None)
+    if isinstance(code, int) and code in RETRYABLE_CODES:
+        return True
+    return type(error).__name__ in _RETRYABLE_NAMES
+
+
+def retry_after(error):
+    """Server-suggested delay in seconds, or None if the error carries none."""
+    hint = getattr(error, "retry_after", None)
+    if isinstance(hint, (int, float)):
+        return float(hint)
+    text = str(error)
+    for pattern in _RETRY_HINTS:
+        match = pattern.search(text)
+        if match:
+            return float(match.group(1))
+    return None
+
+
+class TokenBucket:
+    """
+    Requests-per-minute limiter with priority-ordered waiting.
+
+    Tokens refill continuously at `rate_per_minute`; up to `burst` can be
+    spent at once. A batch caller never takes a token while an interactive
+    caller is waiting for one. A rate of 0 (or None) means no limit; the
+    bucket then only holds callers back during a pause().
+
+    Raises:
+        ValueError: If rate_per_minute is negative
+    """
+    def __init__(self, rate_per_minute, burst=None):
+        rate_per_minute = rate_per_minute or 0
+        if rate_per_minute < 0:
+            raise ValueError(f"rate_per_minute must be >= 0, got {rate_per_minute}")
+        self.unlimited = rate_per_minute == 0
+        self.rate = rate_per_minute / 60.0
+        self.capacity = float(burst if burst is not None else max(1, rate_per_minute // 6))
+        self._tokens = self.capacity
+        self._updated = time.monotonic()
+        self._paused_until = 0.0
+        self._waiting = [0, 0]
+        self._cond = threading.Condition()
+
+    def _refill(self, now):
+        self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+        self._updated = now
+
+    def acquire(self, priority=INTERACTIVE, timeout=None):
+        """
+        Blocks until a token is available.
+
+        Returns:
+            float: Seconds spent waiting
+
+        Raises:
+            TimeoutError: If no token became available within `timeout` seconds
+        """
+        start = time.monotonic()
+        deadline = None if timeout is None else start + timeout
+        with self._cond:
+            self._waiting[priority] += 1
+            try:
+                while True:
+                    now = time.monotonic()
+                    self._refill(now)
+                    blocked = priority == BATCH and self._waiting[INTERACTIVE] > 0
+                    if not blocked and now >= self._paused_until and (self.unlimited or self._tokens >= 1):
+                        if not self.unlimited:
+                            self._tokens -= 1
+                        return now - start
+                    refill_wait = 0.0 if self.unlimited else (1 - self._tokens) / self.rate
+                    wait = max(self._paused_until - now, refill_wait, 0.01)
+                    if deadline is not None:
+                        if now >= deadline:
+                            raise TimeoutError("Timed out waiting for model quota")
+                        wait = min(wait, deadline - now)
+                    self._cond.wait(wait)
+            finally:
+                self._waiting[priority] -= 1
+                self._cond.notify_all()
+
+    def pause(self, seconds):
+        """Stops handing out tokens for `seconds`, e.g. after a 429 with a retry hint."""
+        with self._cond:
+            self._paused_until = max(self._paused_until, time.monotonic() + seconds)
+            self._tokens = 0.0
+
+    def saturation(self):
+        """Share of the burst currently spent, 1.0 meaning no token is available."""
+        with self._cond:
+            self._refill(time.monotonic())
+            if time.monotonic() < self._paused_until:
+                return 1.0
+            if self.unlimited:
+                return 0.0
+            return 1.0 - self._tokens / self.capacity
+
+
+class GeminiClient:
+    """
+    Shared entry point for model calls: rate limiting, retry and priority.
+
+    Attributes:
+        default_rpm (int): Requests per minute for models without an override
+        rpm_overrides (dict): Model name -> requests per minute
+        max_attempts (int): Attempts per call, including the first
+        base_delay, max_delay (float): Backoff bounds in seconds
+    """
+    def __init__(self, default_rpm=60, rpm_overrides=None, max_attempts=5,
+                 base_delay=1.0, max_delay=60.0, sleep=time.sleep):
+        self.default_rpm = default_rpm
+        self.rpm_overrides = dict(rpm_overrides or {})
+        self.max_attempts = max_attempts
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self._sleep = sleep
+        self._buckets = {}
+        self._lock = threading.Lock()
+        self._stats_lock = threading.Lock()
+        self.calls = 0
+        self.retries = 0
+        self.failures = 0
+        self.throttled = 0
+
+    def bucket(self, model_name):
+        """Returns (creating on first use) the token bucket of a model."""
+        bucket = self._buckets.get(model_name)
+        if bucket is None:
+            with self._lock:
+                bucket = self._buckets.get(model_name)
+                if bucket is None:
+                    rpm = self.rpm_overrides.get(model_name, self.default_rpm)
+                    bucket = self._buckets[model_name] = TokenBucket(rpm)
+        return bucket
+
+    def backoff(self, attempt, hint=None):
+        """Full-jitter exponential delay for a retry, never shorter than the server hint."""
+        delay = random.uniform(0, min(self.max_delay, self.base_delay * (2 ** attempt)))
+        if hint is not None:
+            delay = max(delay, min(hint, self.max_delay))
+        return delay
+
+    def call(self, model_name, fn, priority=None, retryable=None):
+        """
+        Runs fn() under the model's rate limit, retrying transient failures.
+
+        Args:
+            model_name (str): Model whose quota the call spends
+            fn (callable): Performs one attempt and returns its result
+            priority (int): INTERACTIVE or BATCH; defaults to the request_priority() context
+            retryable (callable): Optional retryable(error) -> bool consulted in
+                addition to is_retryable(), e.g. to refuse retries once a
+                stream has already emitted tokens
+
+        Raises:
+            GeminiError: After a permanent error or max_attempts transient ones
+        """
+        if priority is None:
+            priority = _priority.get()
+        bucket = self.bucket(model_name)
+        for attempt in range(self.max_attempts):
+            QUOTA_WAIT.observe(bucket.acquire(priority), model=model_name)
+            with self._stats_lock:
+                self.calls += 1
+            try:
+                return fn()
+            except Exception as e:
+                transient = is_retryable(e) and (retryable is None or retryable(e))
+                if not transient or attempt == self.max_attempts - 1:
+                    with self._stats_lock:
+                        self.failures += 1
+                    raise GeminiError(f"{model_name} call failed: {e}", cause=e,
+                                      attempts=attempt + 1) from e
+                hint = retry_after(e)
+                if getattr(e, "code", None) == 429 or type(e).__name__ == "ResourceExhausted":
+                    with self._stats_lock:
+                        self.throttled += 1
+                    bucket.pause(hint if hint is not None else self.backoff(attempt))
+                with self._stats_lock:
+                    self.retries += 1
+                delay = self.backoff(attempt, hint)
+                log.warning(f"⚠️  [{model_name}] {type(e).__name__}, retry {attempt + 1} in {delay:.1f}s")
+                self._sleep(delay)
+
+    def saturation(self, per_model=False):
+        """Highest saturation among the models' buckets (0.0 before any call), or {model: saturation}."""
+        with self._lock:
+            buckets = dict(self._buckets)
+        if per_model:
+            return {name: bucket.saturation() for name, bucket in buckets.items()}
+        return max((bucket.saturation() for bucket in buckets.values()), default=0.0)
+
+    def stats(self):
+        with self._stats_lock:
+            return {"calls": self.calls, "retries": self.retries,
+                    "failures": self.failures, "throttled": self.throttled}
@@ -0,0 +1,133 @@
+"""
+Deterministic NDMA rule engine for the Guardian stage.
+
+The drought-phase and Terms-of-Trade thresholds in `guardian_instructions`
+are fixed rules, so they do not need a model call. This module evaluates
+them locally, either for one record or for NumPy arrays of many
+county-month records in a single vectorized pass. The output uses the same
+keys as the Guardian agent.
+
+Thresholds (NDMA):
+    DROUGHT PHASE:   ALARM if VCI < 20 or water distance > 10km,
+                     ALERT if VCI is 20-35, NORMAL if VCI > 35
+    ECONOMIC STATUS: ToT = goat price / maize price,
+                     CRISIS if ToT < 30, STRESSED if 30-50, STABLE if ToT > 50
+"""
+import numpy as np
+
+VCI_ALARM_BELOW = 20.0
+VCI_NORMAL_ABOVE = 35.0
+WATER_ALARM_ABOVE_KM = 10.0
+TOT_CRISIS_BELOW = 30.0
+TOT_STABLE_ABOVE = 50.0
+
+# Index order matters: the vectorized pass returns codes into these tuples
+DROUGHT_PHASES = ("ALARM", "ALERT", "NORMAL", "UNKNOWN")
+ECONOMIC_STATUSES = ("CRISIS", "STRESSED", "STABLE", "UNKNOWN")
+
+METRIC_KEYS = ("vci", "water_distance_km", "goat_price_kes", "maize_price_kes")
+
+
+def classify_arrays(vci, water_distance_km, goat_price_kes, maize_price_kes):
+    """
+    Classifies many records in one vectorized pass.
+
+    Missing inputs may be passed as NaN. A record whose phase cannot be decided
+    (VCI missing and water distance not over the ALARM limit) is UNKNOWN, as is
+    a record whose Terms of Trade cannot be computed.
+
+    Args:
+        vci, water_distance_km, goat_price_kes, maize_price_kes: array-likes of equal length
+
+    Returns:
+        dict: 'drought_phase' and 'economic_status' (arrays of int8 codes into
+            DROUGHT_PHASES / ECONOMIC_STATUSES) and 'terms_of_trade' (float64 array)
+    """
+    vci = np.asarray(vci, dtype=np.float64)
+    water = np.asarray(water_distance_km, dtype=np.float64)
+    goat = np.asarray(goat_price_kes, dtype=np.float64)
+    maize = np.asarray(maize_price_kes, dtype=np.float64)
+
+    # NaN compares False everywhere, so only the explicit UNKNOWN mask is needed
+    phase = np.full(vci.shape, 2, dtype=np.int8)
+    phase[vci <= VCI_NORMAL_ABOVE] = 1
+    phase[np.isnan(vci)] = 3
+    phase[(vci < VCI_ALARM_BELOW) | (water > WATER_ALARM_ABOVE_KM)] = 0
+
+    with np.errstate(divide="ignore", invalid="ignore"):
+        tot = goat / maize
+    valid = np.isfinite(tot) & (maize > 0)
+    tot = np.where(valid, tot, np.nan)
+    status = np.full(tot.shape, 3, dtype=np.int8)
+    status[valid & (tot > TOT_STABLE_ABOVE)] = 2
+    status[valid & (tot <= TOT_STABLE_ABOVE)] = 1
+    status[valid & (tot < TOT_CRISIS_BELOW)] = 0
+
+    return {"drought_phase": phase, "economic_status": status, "terms_of_trade": tot}
+
+
+def label_arrays(result):
+    """Converts the int8 codes from classify_arrays() into arrays of label strings."""
+    return {
+        "drought_phase": np.asarray(DROUGHT_PHASES)[result["drought_phase"]],
+        "economic_status": np.asarray(ECONOMIC_STATUSES)[result["economic_status"]],
+        "terms_of_trade": result["terms_of_trade"],
+    }
+
+
+def explain(metrics, drought_phase, economic_status, terms_of_trade):
+    """Deterministic one-sentence reasoning for a classified record."""
+    drivers = []
+    vci = metrics.get("vci")
+    water = metrics.get("water_distance_km")
+    if vci is not None:
+        drivers.append(f"VCI of {vci:g}")
+    if water is not None:
+        drivers.append(f"a {water:g}km trek to water")
+    phase_part = (f"{' and '.join(drivers)} place the county in {drought_phase}"
+                  if drivers else f"Drought phase is {drought_phase}")
+    phase_part = phase_part[0].upper() + phase_part[1:]
+    if terms_of_trade is None:
+        return f"{phase_part}; Terms of Trade could not be computed ({economic_status})."
+    return (f"{phase_part}; a goat-to-maize Terms of Trade of {terms_of_trade:.1f} "
+            f"signals {economic_status}.")
+
+
+def describe_trend(trend, metric="VCI", steady_within=1.0):
+    """
+    One sentence on a metric's trailing trend, from IndicatorStore.trend().
+
+    Args:
+        trend (dict): One county's entry: 'months', 'first', 'latest', 'slope_per_month'
+        steady_within (float): Slopes smaller than this per month read as steady
+    """
+    slope = trend["slope_per_month"] or 0.0
+    direction = ("steady" if abs(slope) < steady_within
+                 else "improving" if slope > 0 else "deteriorating")
+    return (f"{metric} has been {direction} over the last {trend['months']} months "
+            f"({trend['first']:g} to {trend['latest']:g}).")
+
+
+def classify(metrics):
+    """
+    Classifies a single record.
+
+    Args:
+        metrics (dict): Canonical metrics, see METRIC_KEYS. Missing keys are allowed.
+
+    Returns:
+        dict: Same keys as the Guardian agent ('drought_phase', 'economic_status',
+            'reasoning') plus 'terms_of_trade'
+    """
+    values = [metrics.get(key) for key in METRIC_KEYS]
+    codes = classify_arrays(*[[np.nan if v is None else v] for v in values])
+    phase = DROUGHT_PHASES[codes["drought_phase"][0]]
+    status = ECONOMIC_STATUSES[codes["economic_status"][0]]
+    tot = codes["terms_of_trade"][0]
+    tot = None if np.isnan(tot) else round(float(tot), 2)
+    return {
+        "drought_phase": phase,
+        "economic_status": status,
+        "reasoning": explain(metrics, phase, status, tot),
+        "terms_of_trade": tot,
+    }
@@ -0,0 +1,158 @@
+"""
+Precompressed, validator-carrying HTTP responses for read-heavy endpoints.
+
+The dashboard polls for each county's latest result far more often than any
+county's result changes. Serializing, compressing and hashing that result on
+every poll costs CPU for bytes the client already has, and re-running the
+workflow costs model calls. Instead:
+
+- CachedBody holds one representation: the raw bytes, their gzip (and, when
+  the optional brotli package is installed, brotli) encodings and a weak
+  ETag, all computed once when the content changes.
+- CachedBody.respond() picks the encoding from Accept-Encoding and answers
+  a matching If-None-Match with 304 and no body, so an unchanged poll costs
+  a dictionary lookup and a header comparison.
+- LatestResults keeps one CachedBody per county, built from the latest
+  stored workflow result (shared_state.py across workers). A county's
+  source is checked again only after refresh_seconds, so a burst of polls
+  reads the database once.
+
+Design Decision: Weak ETags
+- The gzip, brotli and identity bodies are different bytes of the same
+  content. A weak validator lets one ETag cover all three, so a client that
+  changes Accept-Encoding still gets its 304.
+"""
+import gzip
+import hashlib
+import importlib.util
+import json
+import threading
+import time
+
+from flask import Response
+
+# Brotli is optional; without it clients get gzip
+HAS_BROTLI = importlib.util.find_spec("brotli") is not None
+
+# Bodies smaller than this are sent uncompressed (headers would eat the savings)
+MIN_COMPRESS_BYTES = 512
+
+_brotli = None
+
+
+def _brotli_compress(data):
+    global _brotli
+    if _brotli is None:
+        import brotli
+        _brotli = brotli
+    return _brotli.compress(data)
+
+
+class CachedBody:
+    """
+    One response body with its encodings and validators precomputed.
+
+    Attributes:
+        body (bytes): Identity encoding
+        encodings (dict): Content-Coding -> bytes, best first
+        etag (str): Weak entity tag (without the W/ prefix and quotes)
+        last_modified (float): Unix time of the content, if known
+    """
+    __slots__ = ("body", "mimetype", "encodings", "etag", "last_modified")
+
+    def __init__(self, body, mimetype, last_modified=None):
+        self.body = body.encode("utf-8") if isinstance(body, str) else body
+        self.mimetype = mimetype
+        self.last_modified = last_modified
+        self.etag = hashlib.sha1(self.body).hexdigest()
+        self.encodings = {}
+        if len(self.body) >= MIN_COMPRESS_BYTES:
+            if HAS_BROTLI:
+                self.encodings["br"] = _brotli_compress(self.body)
+            # mtime=0 keeps the gzip bytes identical across workers and restarts
+            self.encodings["gzip"] = gzip.compress(self.body, compresslevel=6, mtime=0)
+
+    def respond(self, request, cache_control):
+        """
+        The response to `request`: 304 if its If-None-Match matches,
+        otherwise the best encoding it accepts.
+
+        Args:
+            request: The current flask.request
+            cache_control (str): Cache-Control header value
+        """
+        headers = {"ETag": f'W/"{self.etag}"', "Cache-Control": cache_control, "Vary": "Accept-Encoding"}
+        if self.last_modified is not None:
+            headers["Last-Modified"] = time.strftime("%a, %d %b %Y %H:%M:%S GMT",
+                                                     time.gmtime(self.last_modified))
+        if request.if_none_match.contains_weak(self.etag):
+            return Response(status=304, headers=headers)
+        accepted = request.accept_encodings
+        for coding, data in self.encodings.items():
+            if accepted[coding]:
+                headers["Content-Encoding"] = coding
+                return Response(data, mimetype=self.mimetype, headers=headers)
+        return Response(self.body, mimetype=self.mimetype, headers=headers)
+
+
+class LatestResults:
+    """
+    Per-county latest workflow results, kept serialized and compressed in memory.
+
+    Args:
+        load (callable): load(county) -> dict with 'updated_at', or None
+        refresh_seconds (float): How long a county's entry is served before
+            `load` is asked again
+    """
+    def __init__(self, load, refresh_seconds=1.0):
+        self.load = load
+        self.refresh_seconds = refresh_seconds
+        self._entries = {}
+        self._lock = threading.Lock()
+        self._counter_lock = threading.Lock()
+        self.hits = 0
+        self.loads = 0
+        self.builds = 0
+
+    def get(self, county):
+        """The county's CachedBody, or None if it has no stored result yet."""
+        now = time.monotonic()
+        entry = self._entries.get(county)
+        if entry is not None and now - entry[0] < self.refresh_seconds:
+            with self._counter_lock:
+                self.hits += 1
+            return entry[2]
+        with self._lock:
+            # Another thread may have refreshed it while this one waited
+            entry = self._entries.get(county)
+            if entry is not None and now - entry[0] < self.refresh_seconds:
+                with self._counter_lock:
+                    self.hits += 1
+                return entry[2]
+            self.loads += 1
+            latest = self.load(county)
+            if latest is None:
+                self._entries.pop(county, None)
+                return None
+            updated_at = latest.get("updated_at")
+            if entry is not None and entry[1] == updated_at:
+                cached = entry[2]
+            else:
+                self.builds += 1
+                body = json.dumps(dict(latest, county=county), sort_keys=True, separators=(",", ":"))
+                cached = CachedBody(body, "application/json", last_modified=updated_at)
+            self._entries[county] = (time.monotonic(), updated_at, cached)
+            return cached
+
+    def invalidate(self, county=None):
+        """Drops one county's entry, or all of them, so the next get() loads again."""
+        with self._lock:
+            if county is None:
+                self._entries.clear()
+            else:
+                self._entries.pop(county, None)
+
+    def stats(self):
+        with self._counter_lock:
+            hits = self.hits
+        return {"counties": len(self._entries), "hits": hits, "loads": self.loads, "builds": self.builds}
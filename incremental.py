@@ -0,0 +1,144 @@
+"""
+Dirty tracking for incremental workflow re-evaluation.
+
+Most runs for a county see the same indicators as the run before. This
+module remembers each county's last metrics, analysis and artifacts and
+decides which downstream stages actually need to run:
+
+- Metrics within tolerance of the last run: the Guardian and Responder are
+  both skipped and their last outputs reused.
+- Metrics moved: both stages run again. An unchanged drought phase and
+  economic status do not make the last artifacts reusable, because the SMS
+  and brief quote the metrics; the template bank re-renders them instead.
+
+Skipped stage executions are counted so the savings can be reported.
+With a SharedState, baselines live in its database so every worker process
+compares against the last run any of them served.
+"""
+import threading
+
+from schemas import Analysis, Artifacts
+
+# Largest change per metric that still counts as "unchanged"
+DEFAULT_TOLERANCES = {
+    "vci": 0.5,
+    "water_distance_km": 0.2,
+    "goat_price_kes": 50.0,
+    "maize_price_kes": 2.0,
+}
+
+
+def parse_tolerances(spec):
+    """'vci=1,goat_price_kes=100' -> DEFAULT_TOLERANCES with those overrides."""
+    tolerances = dict(DEFAULT_TOLERANCES)
+    for item in filter(None, (part.strip() for part in spec.split(","))):
+        key, _, value = item.partition("=")
+        tolerances[key.strip()] = float(value)
+    return tolerances
+
+
+def within_tolerance(previous, current, tolerances):
+    """
+    True if every metric in tolerances is within its tolerance.
+
+    A metric that is missing on one side but not the other counts as changed.
+    """
+    for key, tolerance in tolerances.items():
+        old, new = previous.get(key), current.get(key)
+        if old is None or new is None:
+            if old is not new:
+                return False
+        elif abs(new - old) > tolerance:
+            return False
+    return True
+
+
+class _CountyState:
+    __slots__ = ("metrics", "analysis", "artifacts")
+
+    def __init__(self):
+        self.metrics = None
+        self.analysis = None
+        self.artifacts = None
+
+
+class IncrementalState:
+    """
+    Per-county memory of the last workflow outputs.
+
+    Attributes:
+        tolerances (dict): Metric -> largest change treated as unchanged
+        shared (SharedState): Cross-process baseline store, or None to keep baselines in memory
+        executed (dict): Stage -> executions that ran
+        skipped (dict): Stage -> executions avoided by reusing the last output
+    """
+    def __init__(self, tolerances=None, shared=None):
+        self.tolerances = dict(DEFAULT_TOLERANCES if tolerances is None else tolerances)
+        self.shared = shared
+        self._counties = {}
+        self._lock = threading.Lock()
+        self.executed = {}
+        self.skipped = {}
+
+    def _baseline(self, county):
+        """The county's complete baseline, or None."""
+        if self.shared is not None:
+            stored = self.shared.get_baseline(county)
+            if stored is None:
+                return None
+            state = _CountyState()
+            state.metrics = stored["metrics"]
+            state.analysis = Analysis.from_dict(stored["analysis"])
+            state.artifacts = Artifacts.from_dict(stored["artifacts"])
+            return state
+        with self._lock:
+            state = self._counties.get(county)
+        if state is None or state.analysis is None or state.artifacts is None:
+            return None
+        return state
+
+    def reusable_analysis(self, county, metrics):
+        """
+        The last (analysis, artifacts) if metrics are within tolerance of the
+        last run's, else None.
+
+        Args:
+            metrics (dict): Canonical metrics of the current run
+        """
+        state = self._baseline(county)
+        if state is None or not within_tolerance(state.metrics, metrics, self.tolerances):
+            return None
+        return state.analysis, state.artifacts
+
+    def remember(self, county, metrics, analysis, artifacts):
+        """Stores a completed run's outputs as the county's new baseline."""
+        if self.shared is not None:
+            self.shared.put_baseline(county, {"metrics": dict(metrics), "analysis": analysis.to_dict(),
+                                              "artifacts": artifacts.to_dict()})
+            return
+        with self._lock:
+            state = self._counties.setdefault(county, _CountyState())
+            state.metrics = dict(metrics)
+            state.analysis = analysis
+            state.artifacts = artifacts
+
+    def record(self, stage, executed):
+        """Counts one stage execution, or one avoided execution."""
+        with self._lock:
+            counter = self.executed if executed else self.skipped
+            counter[stage] = counter.get(stage, 0) + 1
+
+    def forget(self, county=None):
+        if self.shared is not None:
+            self.shared.clear_baselines(county)
+        with self._lock:
+            if county is None:
+                self._counties.clear()
+            else:
+                self._counties.pop(county, None)
+
+    def stats(self):
+        with self._lock:
+            return {"executed": dict(self.executed), "skipped": dict(self.skipped),
+                    "skipped_total": sum(self.skipped.values()),
+                    "counties": len(self._counties)}
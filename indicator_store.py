@@ -0,0 +1,347 @@
+"""
+Append-only columnar store of per-county, per-month drought indicators.
+
+Every workflow run records the Sentinel's metrics here, so the Guardian and
+the dashboard can look at history without a model call:
+
+- Rows are kept in NumPy columns (county id, month, one float32 column per
+  metric). Capacity doubles as rows are appended.
+- A sorted (county, month) index points at the latest row for each key.
+  An append for a known key updates its entry in place. Keys seen for the
+  first time are buffered and merged into the index in one pass by the
+  next query, so a run of appends costs O(batch) each instead of copying
+  the index every time, and point, range and per-county aggregate queries
+  stay in the millisecond range at millions of rows.
+- On disk the store is one file of fixed-width binary records, only ever
+  appended to. Other worker processes appending to the same file are
+  picked up on the next query.
+
+Months are 'YYYY-MM' strings outside the store and year * 12 + month - 1
+inside it. Missing metrics are stored as NaN and returned as None.
+"""
+import os
+import threading
+import time
+
+import numpy as np
+
+from guardian_rules import METRIC_KEYS
+
+# On-disk record layout, one per append
+RECORD_DTYPE = np.dtype([
+    ("county", "S24"),
+    ("month", "<i4"),
+    ("vci", "<f4"),
+    ("water_distance_km", "<f4"),
+    ("goat_price_kes", "<f4"),
+    ("maize_price_kes", "<f4"),
+    ("recorded_at", "<f8"),
+])
+
+_MONTH_BITS = 32
+_MONTH_MASK = (1 << _MONTH_BITS) - 1
+
+
+def month_index(month):
+    """'YYYY-MM' -> year * 12 + month - 1."""
+    year, _, mon = month.partition("-")
+    return int(year) * 12 + int(mon) - 1
+
+
+def month_label(index):
+    """year * 12 + month - 1 -> 'YYYY-MM'."""
+    year, mon = divmod(int(index), 12)
+    return f"{year:04d}-{mon + 1:02d}"
+
+
+def current_month():
+    return time.strftime("%Y-%m", time.gmtime())
+
+
+def _value(x):
+    return None if np.isnan(x) else round(float(x), 2)
+
+
+class IndicatorStore:
+    """
+    Columnar indicator history with a (county, month) index.
+
+    Attributes:
+        path (str): Backing file of RECORD_DTYPE records, or None for in-memory only
+        rows (int): Rows appended so far, including superseded ones
+    """
+    def __init__(self, path=None, initial_capacity=1024):
+        self.path = path
+        self._lock = threading.RLock()
+        self._capacity = initial_capacity
+        self.rows = 0
+        self._county = np.empty(initial_capacity, np.int32)
+        self._month = np.empty(initial_capacity, np.int32)
+        self._metrics = {key: np.empty(initial_capacity, np.float32) for key in METRIC_KEYS}
+        self._recorded_at = np.empty(initial_capacity, np.float64)
+        self._county_ids = {}
+        self._county_names = []
+        # Sorted (county << 32 | month) keys and the row holding each key's latest value
+        self._index_keys = np.empty(0, np.int64)
+        self._index_rows = np.empty(0, np.int64)
+        # New keys (and their rows) appended since the last query, not yet in the index
+        self._pending_keys = []
+        self._pending_rows = []
+        # The file is read on the first query or append, not here, so creating
+        # the store at import time costs nothing
+        self._file_offset = 0
+
+    # --- Writes ---
+
+    def append(self, county, month, metrics, recorded_at=None):
+        """
+        Records one county-month observation. A later append for the same
+        (county, month) supersedes the earlier one in queries.
+
+        Args:
+            county (str): County name
+            month (str): 'YYYY-MM'
+            metrics (dict): Canonical metrics; missing keys are stored as NaN
+        """
+        records = np.zeros(1, RECORD_DTYPE)
+        records["county"] = county.encode("utf-8")[:24]
+        records["month"] = month_index(month)
+        for key in METRIC_KEYS:
+            value = metrics.get(key)
+            records[key] = np.nan if value is None else value
+        records["recorded_at"] = time.time() if recorded_at is None else recorded_at
+        self.append_records(records)
+
+    def append_many(self, counties, months, metrics, recorded_at=None):
+        """
+        Bulk append.
+
+        Args:
+            counties (sequence): County name per row
+            months (array): Month index per row (see month_index)
+            metrics (dict): Metric -> array of values (NaN for missing)
+        """
+        records = np.zeros(len(months), RECORD_DTYPE)
+        records["county"] = np.asarray(counties, dtype="S24")
+        records["month"] = months
+        for key in METRIC_KEYS:
+            records[key] = metrics.get(key, np.nan)
+        records["recorded_at"] = time.time() if recorded_at is None else recorded_at
+        self.append_records(records)
+
+    def append_records(self, records):
+        """Appends a RECORD_DTYPE array to the file (if any) and the in-memory columns."""
+        with self._lock:
+            if self.path is None:
+                self._ingest(records)
+                return
+            # Pick up other writers first; our own rows are read back the same way,
+            # so the in-memory columns always mirror the file order
+            os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+            with open(self.path, "ab") as f:
+                f.write(records.tobytes())
+            self._load_new()
+
+    def _load_new(self):
+        # Caller holds the lock
+        try:
+            size = os.path.getsize(self.path)
+        except OSError:
+            return
+        complete = size - (size - self._file_offset) % RECORD_DTYPE.itemsize
+        if complete <= self._file_offset:
+            return
+        count = (complete - self._file_offset) // RECORD_DTYPE.itemsize
+        records = np.fromfile(self.path, RECORD_DTYPE, count=count, offset=self._file_offset)
+        self._file_offset = complete
+        self._ingest(records)
+
+    def _ingest(self, records):
+        n = len(records)
+        if n == 0:
+            return
+        names, inverse = np.unique(records["county"], return_inverse=True)
+        ids = np.empty(len(names), np.int32)
+        for i, raw in enumerate(names):
+            name = raw.decode("utf-8", "replace")
+            if name not in self._county_ids:
+                self._county_ids[name] = len(self._county_names)
+                self._county_names.append(name)
+            ids[i] = self._county_ids[name]
+
+        self._reserve(self.rows + n)
+        start, stop = self.rows, self.rows + n
+        self._county[start:stop] = ids[inverse]
+        self._month[start:stop] = records["month"]
+        for key in METRIC_KEYS:
+            self._metrics[key][start:stop] = records[key]
+        self._recorded_at[start:stop] = records["recorded_at"]
+        self.rows = stop
+        self._merge_index(start, stop)
+
+    def _reserve(self, needed):
+        if needed <= self._capacity:
+            return
+        capacity = self._capacity
+        while capacity < needed:
+            capacity *= 2
+
+        def grow(column):
+            grown = np.empty(capacity, column.dtype)
+            grown[:self.rows] = column[:self.rows]
+            return grown
+
+        self._county = grow(self._county)
+        self._month = grow(self._month)
+        self._metrics = {key: grow(column) for key, column in self._metrics.items()}
+        self._recorded_at = grow(self._recorded_at)
+        self._capacity = capacity
+
+    @staticmethod
+    def _latest_per_key(keys, rows):
+        # Sorted unique keys; for a repeated key, the last row appended wins
+        order = np.argsort(keys, kind="stable")
+        keys, rows = keys[order], rows[order]
+        last = np.r_[keys[1:] != keys[:-1], True]
+        return keys[last], rows[last]
+
+    def _merge_index(self, start, stop):
+        keys = (self._county[start:stop].astype(np.int64) << _MONTH_BITS) | self._month[start:stop]
+        keys, rows = self._latest_per_key(keys, np.arange(start, stop, dtype=np.int64))
+
+        positions = np.searchsorted(self._index_keys, keys)
+        existing = positions < len(self._index_keys)
+        existing[existing] = self._index_keys[positions[existing]] == keys[existing]
+        self._index_rows[positions[existing]] = rows[existing]
+        fresh = ~existing
+        if fresh.any():
+            self._pending_keys.append(keys[fresh])
+            self._pending_rows.append(rows[fresh])
+
+    def _flush_index(self):
+        # Caller holds the lock. Pending keys are never in the index (the index
+        # only changes here), so one insert places them all.
+        if not self._pending_keys:
+            return
+        keys, rows = self._latest_per_key(np.concatenate(self._pending_keys),
+                                          np.concatenate(self._pending_rows))
+        self._pending_keys, self._pending_rows = [], []
+        positions = np.searchsorted(self._index_keys, keys)
+        self._index_keys = np.insert(self._index_keys, positions, keys)
+        self._index_rows = np.insert(self._index_rows, positions, rows)
+
+    # --- Reads ---
+
+    def refresh(self):
+        """Picks up rows appended to the file by other processes and brings the index up to date."""
+        with self._lock:
+            if self.path is not None:
+                self._load_new()
+            self._flush_index()
+
+    def counties(self):
+        with self._lock:
+            self.refresh()
+            present = np.unique(self._index_keys >> _MONTH_BITS)
+            return sorted(self._county_names[i] for i in present)
+
+    def get(self, county, month):
+        """The latest metrics recorded for (county, month), or None."""
+        history = self.history(county, month, month)
+        if not history["months"]:
+            return None
+        return {key: history[key][0] for key in METRIC_KEYS}
+
+    def history(self, county, start=None, end=None):
+        """
+        A county's indicators over a month range, oldest first.
+
+        Args:
+            county (str): County name
+            start, end (str): Inclusive 'YYYY-MM' bounds; open-ended if None
+
+        Returns:
+            dict: 'county', 'months' and one list per metric (None where missing)
+        """
+        with self._lock:
+            self.refresh()
+            rows = self._range_rows(county, start, end)
+            return {
+                "county": county,
+                "months": [month_label(m) for m in self._month[rows]],
+                **{key: [_value(v) for v in self._metrics[key][rows]] for key in METRIC_KEYS},
+            }
+
+    def _range_rows(self, county, start, end):
+        county_id = self._county_ids.get(county)
+        if county_id is None:
+            return np.empty(0, np.int64)
+        base = county_id << _MONTH_BITS
+        low = base | (month_index(start) if start else 0)
+        high = base | (month_index(end) if end else _MONTH_MASK)
+        lo = np.searchsorted(self._index_keys, low, side="left")
+        hi = np.searchsorted(self._index_keys, high, side="right")
+        return self._index_rows[lo:hi]
+
+    def trend(self, metric="vci", months=3, end=None):
+        """
+        Per-county trend of one metric over the trailing window, for all counties.
+
+        Args:
+            metric (str): One of METRIC_KEYS
+            months (int): Window length in months, ending at 'end'
+            end (str): Last month of the window; defaults to the latest month stored
+
+        Returns:
+            dict: County -> {'months', 'first', 'latest', 'mean', 'min', 'max',
+                'slope_per_month'}; counties without a value in the window are omitted
+        """
+        with self._lock:
+            self.refresh()
+            if not len(self._index_keys):
+                return {}
+            index_months = (self._index_keys & _MONTH_MASK).astype(np.int32)
+            last = month_index(end) if end else int(index_months.max())
+            in_window = (index_months > last - months) & (index_months <= last)
+            rows = self._index_rows[in_window]
+            values = self._metrics[metric][rows].astype(np.float64)
+            present = ~np.isnan(values)
+            rows, values = rows[present], values[present]
+            if not len(rows):
+                return {}
+            county = self._county[rows]
+            x = (self._month[rows] - last).astype(np.float64)
+            names = self._county_names
+
+        # Index order keeps each county's rows contiguous and month-ascending
+        starts = np.flatnonzero(np.r_[True, county[1:] != county[:-1]])
+        ends = np.r_[starts[1:], len(county)] - 1
+        n = np.diff(np.r_[starts, len(county)]).astype(np.float64)
+        sum_x = np.add.reduceat(x, starts)
+        sum_y = np.add.reduceat(values, starts)
+        sum_xx = np.add.reduceat(x * x, starts)
+        sum_xy = np.add.reduceat(x * values, starts)
+        denominator = n * sum_xx - sum_x * sum_x
+        with np.errstate(divide="ignore", invalid="ignore"):
+            slope = np.where(denominator > 0, (n * sum_xy - sum_x * sum_y) / denominator, 0.0)
+        minimum = np.minimum.reduceat(values, starts)
+        maximum = np.maximum.reduceat(values, starts)
+
+        return {
+            names[county[s]]: {
+                "months": int(n[i]),
+                "first": _value(values[s]),
+                "latest": _value(values[ends[i]]),
+                "mean": _value(sum_y[i] / n[i]),
+                "min": _value(minimum[i]),
+                "max": _value(maximum[i]),
+                "slope_per_month": _value(slope[i]),
+            }
+            for i, s in enumerate(starts)
+        }
+
+    def stats(self):
+        with self._lock:
+            self.refresh()
+            return {"rows": self.rows, "keys": len(self._index_keys),
+                    "counties": len(self._county_names)}
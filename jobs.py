@@ -0,0 +1,210 @@
+"""
+Asynchronous job subsystem for ASAL-Guardian workflow runs.
+
+A workflow run takes 30-60 seconds. Running it on the request thread ties up
+one of the few gunicorn threads for that long. Instead, jobs run on a bounded
+executor. Clients get a job id at once and poll for per-stage status, and
+finished jobs are kept for a bounded time so their results can be collected.
+
+With a SharedState, every change to a job is also written to the shared
+database, so a job submitted to one gunicorn worker can be polled through
+any other.
+"""
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+
+QUEUED = "queued"
+RUNNING = "running"
+SUCCEEDED = "succeeded"
+FAILED = "failed"
+
+
+class QueueFullError(Exception):
+    """Raised by JobManager.submit() when the pending-job limit is reached."""
+
+
+class Job:
+    """
+    One workflow run and its progress.
+
+    Attributes:
+        id (str): Opaque job identifier
+        status (str): queued, running, succeeded or failed
+        stages (dict): Stage name -> {"status", "started_at", "finished_at", "output"}
+        result: Return value of the job function once succeeded
+        error (str): Error message once failed
+    """
+    def __init__(self, stages, listener=None, on_change=None):
+        self.id = uuid.uuid4().hex
+        self.status = QUEUED
+        self.stages = OrderedDict((name, self._pending_stage()) for name in stages)
+        self.result = None
+        self.error = None
+        self.created_at = time.time()
+        self.started_at = None
+        self.finished_at = None
+        self.done = threading.Event()
+        self._listener = listener
+        self._on_change = on_change
+        self._change_lock = threading.Lock()
+
+    def changed(self):
+        """Reports the job's new state to the on_change callback, if any."""
+        if self._on_change is not None:
+            # Serialized, so a snapshot taken earlier never overwrites a later one
+            with self._change_lock:
+                self._on_change(self)
+
+    @staticmethod
+    def _pending_stage():
+        return {"status": "pending", "started_at": None, "finished_at": None, "output": None}
+
+    def on_stage(self, stage, status, output=None):
+        """Progress callback handed to the workflow: status is 'running', 'done' or 'reused'."""
+        entry = self.stages.setdefault(stage, self._pending_stage())
+        entry["status"] = status
+        if status == "running":
+            entry["started_at"] = time.time()
+        else:
+            entry["finished_at"] = time.time()
+            entry["output"] = output
+        self.changed()
+        if self._listener is not None:
+            self._listener(stage, status, output)
+
+    def to_dict(self):
+        return {
+            "job_id": self.id,
+            "status": self.status,
+            "stages": {name: dict(entry) for name, entry in self.stages.items()},
+            "created_at": self.created_at,
+            "started_at": self.started_at,
+            "finished_at": self.finished_at,
+            "result": self.result,
+            "error": self.error,
+        }
+
+
+class StoredJob:
+    """
+    Read-only view of a job snapshot from the shared state, for jobs that
+    run in another worker process. Offers the parts of Job that pollers use.
+    """
+    def __init__(self, body):
+        self._body = body
+        self.id = body["job_id"]
+        self.status = body["status"]
+        self.result = body.get("result")
+        self.error = body.get("error")
+        self.finished_at = body.get("finished_at")
+
+    def to_dict(self):
+        return dict(self._body)
+
+
+class JobManager:
+    """
+    Runs jobs on a bounded thread pool and retains finished jobs for polling.
+
+    Design Decision: Bounded on Both Sides
+    - At most `max_workers` workflows run at once and at most `max_pending`
+      wait. Beyond that submit() refuses instead of queueing unbounded work.
+    - Finished jobs are kept for `retention_seconds`, capped at
+      `max_retained` (oldest dropped first), so memory stays flat.
+
+    Args:
+        shared (SharedState): If given, job snapshots are published there and
+            get() falls back to it for jobs of other processes
+    """
+    # Seconds between deletions of expired jobs from the shared state
+    SHARED_PRUNE_INTERVAL = 60.0
+
+    def __init__(self, max_workers=4, max_pending=32, retention_seconds=3600, max_retained=200,
+                 shared=None):
+        self._executor = ThreadPoolExecutor(max_workers=max_workers,
+                                            thread_name_prefix="asal-job")
+        self.max_pending = max_pending
+        self.retention_seconds = retention_seconds
+        self.max_retained = max_retained
+        self._jobs = OrderedDict()
+        self._active = 0
+        self._lock = threading.Lock()
+        self.shared = shared
+        self._shared_pruned_at = 0.0
+
+    def submit(self, fn, stages=(), listener=None, **kwargs):
+        """
+        Queues fn(on_stage=job.on_stage, **kwargs) and returns the Job immediately.
+
+        Args:
+            listener (callable): Also receives every on_stage(stage, status, output)
+                call, after the job has recorded it
+
+        Raises:
+            QueueFullError: If max_pending jobs are already waiting or running
+        """
+        job = Job(stages, listener, self._publish if self.shared is not None else None)
+        with self._lock:
+            self._prune()
+            if self._active >= self.max_pending:
+                raise QueueFullError(f"{self._active} jobs already in flight")
+            self._active += 1
+            self._jobs[job.id] = job
+        job.changed()
+        self._executor.submit(self._run, job, fn, kwargs)
+        return job
+
+    def _run(self, job, fn, kwargs):
+        job.status = RUNNING
+        job.started_at = time.time()
+        job.changed()
+        try:
+            job.result = fn(on_stage=job.on_stage, **kwargs)
+            job.status = SUCCEEDED
+        except Exception as e:
+            job.error = str(e)
+            job.status = FAILED
+        finally:
+            job.finished_at = time.time()
+            with self._lock:
+                self._active -= 1
+            job.changed()
+            job.done.set()
+
+    def _publish(self, job):
+        self.shared.put_job(job.to_dict())
+
+    def get(self, job_id):
+        """
+        Returns the Job, or None if unknown or expired. With shared state, a
+        job run by another process comes back as a StoredJob.
+        """
+        with self._lock:
+            self._prune()
+            job = self._jobs.get(job_id)
+        if job is None and self.shared is not None:
+            body = self.shared.get_job(job_id)
+            if body is not None:
+                job = StoredJob(body)
+        return job
+
+    def _prune(self):
+        # Caller holds the lock. Unfinished jobs are never dropped.
+        cutoff = time.time() - self.retention_seconds
+        finished = [job_id for job_id, job in self._jobs.items() if job.finished_at is not None]
+        excess = len(finished) - self.max_retained
+        for job_id in finished:
+            job = self._jobs[job_id]
+            if excess > 0 or job.finished_at < cutoff:
+                del self._jobs[job_id]
+                excess -= 1
+        if self.shared is not None and time.monotonic() - self._shared_pruned_at > self.SHARED_PRUNE_INTERVAL:
+            self._shared_pruned_at = time.monotonic()
+            self.shared.prune_jobs(cutoff)
+
+    def stats(self):
+        with self._lock:
+            return {"active": self._active, "retained": len(self._jobs)}
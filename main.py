@@ -1,25 +1,137 @@
-import google.generativeai as genai
 import json
 import os
 import time
 from dotenv import load_dotenv
+from model_registry import ModelRegistry
+from agent_pool import AgentPool
+import guardian_rules
+import sentinel_extractor
+from response_cache import ResponseCache, DEFAULT_TTLS, cache_key
+from gemini_client import GeminiClient, GeminiError, request_priority, BATCH
+from singleflight import Group
+from bulletin_ingest import BulletinLibrary
+from indicator_store import IndicatorStore, current_month
+from incremental import IncrementalState, parse_tolerances
+from pipeline import Pipeline
+from responder_templates import TemplateBank, TEMPLATE_PROMPT, template_version, valid_reply
+from shared_state import SharedState
+from sms_dispatch import SmsDispatcher, LocalGateway
+from subscribers import SubscriberRegistry
+from vci_raster import NdviStack
+from telemetry import get_logger, registry, span
+from batching import Batcher, BatchError, batch_prompt, batch_schema, split_reply
+from schemas import (Metrics, Analysis, Artifacts, PayloadError,
+                     METRICS_SCHEMA, ANALYSIS_SCHEMA, ARTIFACTS_SCHEMA, ARTIFACT_FIELD_SCHEMAS)
+import hashlib
+import threading
+from concurrent.futures import ThreadPoolExecutor
 
 # --- Configuration ---
 # Load environment variables from .env file if it exists
 load_dotenv()
 
-# Ensure API Key is set in your environment variables
-try:
-    api_key = os.environ["GOOGLE_API_KEY"]
-    print(f"✅ [SYSTEM] Found API Key starting with: {api_key[:8]}...")
-    genai.configure(api_key=api_key)
-    print("✅ [SYSTEM] Google AI API Key configured.")
-except KeyError:
-    print("❌ CRITICAL ERROR: GOOGLE_API_KEY environment variable not found.")
-    print("   Please set the key using one of these methods:")
-    print("   1. Create a .env file with: GOOGLE_API_KEY=your_key_here")
-    print("   2. Or export it: export GOOGLE_API_KEY='your_key_here'")
-    exit() # Exit if the key is not found
+# --- Gemini SDK ---
+# google.generativeai takes most of a second to import, so it is imported and
+# configured on first use, not at module load. Importing this module (and
+# serving /health or the index page) never touches the SDK. fake_gemini.install()
+# assigns `genai` directly, which skips the real import altogether.
+genai = None
+_sdk_lock = threading.Lock()
+log = get_logger("main")
+
+def _configure_sdk(sdk):
+    """Configures the SDK with GOOGLE_API_KEY, if set."""
+    try:
+        api_key = os.environ["GOOGLE_API_KEY"]
+        log.info(f"✅ [SYSTEM] Found API Key starting with: {api_key[:8]}...")
+        sdk.configure(api_key=api_key)
+        log.info("✅ [SYSTEM] Google AI API Key configured.")
+    except KeyError:
+        log.critical("❌ CRITICAL ERROR: GOOGLE_API_KEY environment variable not found.\n"
+                     "   Please set the key using one of these methods:\n"
+                     "   1. Create a .env file with: GOOGLE_API_KEY=your_key_here\n"
+                     "   2. Or export it: export GOOGLE_API_KEY='your_key_here'\n"
+                     "   Model calls will fail until a key is set.")
+
+def get_genai():
+    """The configured google.generativeai module, imported on the first call."""
+    global genai
+    if genai is None:
+        with _sdk_lock:
+            if genai is None:
+                import google.generativeai as sdk
+                _configure_sdk(sdk)
+                genai = sdk
+    return genai
+
+# --- Response Cache ---
+# Identical (model, instructions, input) calls are answered from a local SQLite
+# cache shared by all threads and worker processes. ASAL_RESPONSE_CACHE=0 disables it.
+CACHE_DIR = os.environ.get("ASAL_CACHE_DIR", os.path.join(os.path.dirname(os.path.abspath(__file__)), ".asal_cache"))
+if os.environ.get("ASAL_RESPONSE_CACHE", "1").lower() in ("0", "false", "no"):
+    response_cache = None
+else:
+    response_cache = ResponseCache(
+        os.path.join(CACHE_DIR, "responses.sqlite3"),
+        max_bytes=int(os.environ.get("ASAL_CACHE_MAX_MB", "64")) * 1024 * 1024,
+        ttls={role: int(os.environ.get(f"ASAL_CACHE_TTL_{role.upper()}", ttl))
+              for role, ttl in DEFAULT_TTLS.items()}
+    )
+
+# --- Shared State ---
+# Model listings, job snapshots, incremental baselines and the latest result per
+# county live in one SQLite database shared by every gunicorn worker, so adding
+# workers adds neither model listings nor lost reuse. ASAL_SHARED_STATE=0 keeps
+# them in process.
+if os.environ.get("ASAL_SHARED_STATE", "1").lower() in ("0", "false", "no"):
+    shared_state = None
+else:
+    shared_state = SharedState(os.path.join(CACHE_DIR, "shared_state.sqlite3"))
+
+# --- Model Call Layer ---
+# Every model call goes through this client: per-model token buckets
+# (ASAL_MODEL_RPM, overridable per model with ASAL_MODEL_RPM_OVERRIDES as
+# "models/name=rpm,..."; 0 for no client-side limit), jittered retries and
+# interactive-first scheduling.
+def _parse_rpm_overrides(spec):
+    overrides = {}
+    for item in filter(None, (part.strip() for part in spec.split(","))):
+        model_name, _, rpm = item.partition("=")
+        overrides[model_name.strip()] = int(rpm)
+    return overrides
+
+gemini_client = GeminiClient(
+    default_rpm=int(os.environ.get("ASAL_MODEL_RPM", "60")),
+    rpm_overrides=_parse_rpm_overrides(os.environ.get("ASAL_MODEL_RPM_OVERRIDES", "")),
+    max_attempts=int(os.environ.get("ASAL_MODEL_MAX_ATTEMPTS", "5"))
+)
+
+# Token buckets are per process. Each process publishes its quota use to the
+# shared state after model calls (at most once per QUOTA_PUBLISH_SECONDS), so
+# the monitor daemon, a separate process, can yield to busy web workers.
+QUOTA_PUBLISH_SECONDS = 1.0
+QUOTA_MAX_AGE = 10.0
+_quota_published = 0.0
+
+def publish_quota():
+    global _quota_published
+    now = time.monotonic()
+    if shared_state is None or now - _quota_published < QUOTA_PUBLISH_SECONDS:
+        return
+    _quota_published = now
+    shared_state.put_quota(gemini_client.saturation())
+
+def quota_saturation():
+    """Highest model quota use of this process and of any process that published in the last QUOTA_MAX_AGE s."""
+    local = gemini_client.saturation()
+    if shared_state is None:
+        return local
+    return max(local, shared_state.max_quota(QUOTA_MAX_AGE, exclude_pid=os.getpid()))
+
+# Presentation pauses: before each model call, and when fetching a simulated
+# field report. Benchmarks set both to 0.
+THINKING_PAUSE_SECONDS = float(os.environ.get("ASAL_THINKING_PAUSE_SECONDS", "1"))
+FIELD_REPORT_DELAY_SECONDS = float(os.environ.get("ASAL_FIELD_REPORT_DELAY_SECONDS", "1.5"))
 
 class Agent:
     """
@@ -36,6 +148,7 @@ class Agent:
         name (str): Human-readable name of the agent (e.g., "Sentinel", "Guardian")
         model_name (str): Gemini model identifier (e.g., "models/gemini-2.5-pro")
         instructions (str): System instructions that define the agent's persona and behavior
+        response_schema (dict): Optional JSON schema; replies are then constrained to JSON in that shape
         model: Initialized GenerativeModel instance (None if initialization fails)
     
     Behavior:
@@ -43,36 +156,120 @@ class Agent:
         - Gracefully handles model initialization failures
         - Provides safe content generation with error handling
     """
-    def __init__(self, name, model_name, instructions):
+    def __init__(self, name, model_name, instructions, response_schema=None):
         self.name = name
         self.model_name = model_name
         self.instructions = instructions
-        print(f"   - Initializing {self.name} with model {self.model_name}...")
+        self.response_schema = response_schema
+        # The schema shapes the reply as much as the persona does, so both key the cache
+        self._cache_identity = instructions + (json.dumps(response_schema, sort_keys=True)
+                                               if response_schema else "")
+        log.info(f"   - Initializing {self.name} with model {self.model_name}...")
         try:
-            self.model = genai.GenerativeModel(
+            generation_config = None
+            if response_schema is not None:
+                generation_config = {"response_mime_type": "application/json",
+                                     "response_schema": response_schema}
+            self.model = get_genai().GenerativeModel(
                 model_name=self.model_name,
-                system_instruction=self.instructions
+                system_instruction=self.instructions,
+                generation_config=generation_config
             )
         except Exception as e:
-            print(f"❌ CRITICAL: Failed to initialize {self.name}. Error: {e}")
+            log.critical(f"❌ CRITICAL: Failed to initialize {self.name}. Error: {e}")
             self.model = None
 
-    def think_and_act(self, input_data):
+    def think_and_act(self, input_data, on_token=None, use_cache=True, response_schema=None, accept=None):
         """
         Sends data to the model and retrieves the response.
+
+        Args:
+            input_data (str): Prompt for the model
+            on_token (callable): If given, the response is streamed and
+                on_token(text) is called for every chunk as it arrives
+            use_cache (bool): Set False to bypass the response cache and
+                always call the model (the fresh answer is still stored)
+            response_schema (dict): Constrains this one reply to a different
+                JSON schema than the agent's own
+            accept (callable): accept(text) -> bool; replies it rejects are
+                neither stored in nor served from the response cache
+
+        Returns:
+            str: The full response text
+
+        Raises:
+            GeminiError: If the model is unavailable or the call failed after
+                retries; the error is never returned as response text
         """
         if not self.model:
-            return f"Error: {self.name} model is not initialized."
+            raise GeminiError(f"{self.name} model is not initialized.")
+
+        role = self.name.lower()
+        request_kwargs = {}
+        identity = self._cache_identity
+        if response_schema is not None:
+            request_kwargs["generation_config"] = {"response_mime_type": "application/json",
+                                                   "response_schema": response_schema}
+            identity = self.instructions + json.dumps(response_schema, sort_keys=True)
+        key = None
+        if response_cache is not None:
+            key = cache_key(self.model_name, identity, input_data)
+            cached = response_cache.get(key, role) if use_cache else None
+            if cached is not None and (accept is None or accept(cached)):
+                MODEL_CALLS.inc(agent=role, outcome="cache_hit")
+                log.debug(f"⚡ [{self.name} answered from cache.]")
+                if on_token is not None:
+                    on_token(cached)
+                return cached
             
-        print(f"\n🧠 [{self.name} is thinking...]")
-        time.sleep(1) # Cinematic pause
+        log.debug(f"🧠 [{self.name} is thinking...]")
+        time.sleep(THINKING_PAUSE_SECONDS) # Cinematic pause
+        emitted = []
+        usage = []
+
+        def attempt():
+            if on_token is None:
+                response = self.model.generate_content(input_data, **request_kwargs)
+                usage.append(getattr(response, "usage_metadata", None))
+                return response.text
+            chunks = []
+            for chunk in self.model.generate_content(input_data, stream=True, **request_kwargs):
+                chunks.append(chunk.text)
+                emitted.append(True)
+                # Streamed usage is cumulative; the last chunk carries the totals
+                usage.append(getattr(chunk, "usage_metadata", None))
+                on_token(chunk.text)
+            return "".join(chunks)
+
         try:
-            response = self.model.generate_content(input_data)
-            print(f"✅ [{self.name} responded.]")
-            return response.text
-        except Exception as e:
-            print(f"❌ [{self.name} Error]: {e}")
-            return f"Error processing request: {e}"
+            # A stream that already reached the client cannot be replayed
+            with span("model_call", role):
+                text = gemini_client.call(self.model_name, attempt, retryable=lambda e: not emitted)
+        except GeminiError as e:
+            MODEL_CALLS.inc(agent=role, outcome="error")
+            publish_quota()
+            log.error(f"❌ [{self.name} Error]: {e}")
+            raise
+        MODEL_CALLS.inc(agent=role, outcome="ok")
+        publish_quota()
+        _count_tokens(role, next((u for u in reversed(usage) if u is not None), None))
+        log.debug(f"✅ [{self.name} responded.]")
+        if key is not None and (accept is None or accept(text)):
+            response_cache.put(key, role, text)
+        return text
+
+MODEL_CALLS = registry.counter("asal_model_calls_total", "Agent model requests by outcome (ok, error, cache_hit)",
+                               labels=("agent", "outcome"))
+MODEL_TOKENS = registry.counter("asal_model_tokens_total", "Tokens the model reported using",
+                                labels=("agent", "kind"))
+
+def _count_tokens(role, usage):
+    if usage is None:
+        return
+    for kind, attribute in (("prompt", "prompt_token_count"), ("output", "candidates_token_count")):
+        count = getattr(usage, attribute, None)
+        if count:
+            MODEL_TOKENS.inc(count, agent=role, kind=kind)
 
 # --- AGENT 1: THE SENTINEL ---
 # Role: Fetches and cleans data.
@@ -81,22 +278,143 @@ You are the Sentinel. Your job is to ingest raw data and structure it.
 You do not make decisions. You only report facts formatted as a single, clean JSON object.
 Focus on: VCI (Vegetation Condition Index), Water Distance, and Terms of Trade.
 The input will be a messy field report. Extract the key numbers.
+Use exactly these keys: 'vci', 'water_distance_km', 'goat_price_kes', 'maize_price_kes'.
 """
 
-class SentinelAgent(Agent):
-    def fetch_live_data(self):
-        # SIMULATION: In a real app, this would query live APIs or scrape websites.
-        print("\n📡 [Sentinel] Fetching live data from simulated field reports...")
-        time.sleep(1.5)
-        raw_data = """
+DEFAULT_COUNTY = "Garissa"
+
+# SIMULATION: latest raw field report per county
+FIELD_REPORTS = {
+    "Garissa": """
         Field Report - Garissa County - October 2025
         Vegetation Index (3-month) is currently at 18.5.
         Pastoralists reporting trekking 12km to water sources, up from 8km last month.
         Goat prices have dropped to 2500 KES at the local market.
         Maize prices are stable at 100 KES per kg.
+        """,
+}
+
+# NDMA early warning bulletins (PDF) take precedence over the simulated reports.
+# ASAL_BULLETINS is a comma-separated list of paths; extraction results are
+# cached under CACHE_DIR by content hash.
+_BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+BULLETIN_PATHS = [
+    path.strip() for path in os.environ.get(
+        "ASAL_BULLETINS",
+        ",".join(os.path.join(_BASE_DIR, name) for name in ("report_oct2025.pdf", "report_june2024.pdf.pdf"))
+    ).split(",") if path.strip()
+]
+bulletin_library = BulletinLibrary(BULLETIN_PATHS, os.path.join(CACHE_DIR, "bulletins"))
+
+# --- Indicator History ---
+# Every run's metrics are appended to a columnar store, so trends need no
+# model call. ASAL_DATA_DIR holds data that, unlike the cache, is kept.
+DATA_DIR = os.environ.get("ASAL_DATA_DIR", os.path.join(_BASE_DIR, ".asal_data"))
+indicator_store = IndicatorStore(os.path.join(DATA_DIR, "indicators.bin"))
+
+# Months of VCI history the Guardian reports a trend over
+TREND_MONTHS = int(os.environ.get("ASAL_TREND_MONTHS", "3"))
+
+def report_month(county):
+    """'YYYY-MM' a county's report describes: its bulletin's period, else this month."""
+    section = bulletin_library.latest_section(county)
+    if section is not None and section[1]["period"]:
+        return section[1]["period"]
+    return current_month()
+
+# --- Raster VCI ---
+# ASAL_NDVI_STACK names an NDVI stack directory (see vci_raster.py). When it
+# covers a county's report month, the Sentinel takes the county's
+# ASAL_VCI_WINDOW-month VCI from the imagery instead of the report text.
+NDVI_STACK_PATH = os.environ.get("ASAL_NDVI_STACK", "")
+VCI_WINDOW = int(os.environ.get("ASAL_VCI_WINDOW", "3"))
+RASTER_CONFIDENCE = 1.0
+ndvi_stack = NdviStack(NDVI_STACK_PATH) if NDVI_STACK_PATH else None
+
+def raster_vci(county, month):
+    """A county's VCI for the month from the NDVI stack, or None."""
+    if ndvi_stack is None:
+        return None
+    try:
+        return ndvi_stack.county_vci(county, month, window=VCI_WINDOW)
+    except (OSError, ValueError) as e:
+        log.warning(f"⚠️  Warning: No raster VCI for {county} {month}: {e}")
+        return None
+
+def available_counties():
+    """Counties the Sentinel currently has field data for."""
+    return sorted(set(FIELD_REPORTS) | set(bulletin_library.counties()))
+
+class SentinelAgent(Agent):
+    """
+    Sentinel with a local fast path.
+
+    Routine field reports are parsed by sentinel_extractor's compiled patterns;
+    the model is only asked for the fields the patterns could not resolve.
+    The output is the canonical metrics JSON plus a per-field 'confidence' map.
+    """
+    def fetch_field_report(self, county=DEFAULT_COUNTY):
         """
-        print("✅ [Sentinel] Raw data received.")
-        return self.think_and_act(f"Extract the key metrics from this report and format as JSON: {raw_data}")
+        Returns the latest raw field report for a county.
+
+        The county's section of its most recent NDMA bulletin is used when one
+        is available, condensed to the lines that mention Sentinel indicators.
+        Otherwise the simulated field report is returned.
+        """
+        section = bulletin_library.latest_section(county)
+        if section is not None:
+            text, bulletin = section
+            log.info(f"📡 [Sentinel] Using NDMA bulletin {bulletin['source']} ({bulletin['period']}) for {county}.")
+            return text
+        # SIMULATION: In a real app, this would query live APIs or scrape websites.
+        log.info(f"📡 [Sentinel] Fetching live data for {county} from simulated field reports...")
+        time.sleep(FIELD_REPORT_DELAY_SECONDS)
+        if county not in FIELD_REPORTS:
+            raise ValueError(f"No field report available for {county} County")
+        log.info("✅ [Sentinel] Raw data received.")
+        return FIELD_REPORTS[county]
+
+    def fetch_live_data(self, county=DEFAULT_COUNTY, on_token=None):
+        """Fetches a county's field report and structures it into Metrics."""
+        return self.structure_report(self.fetch_field_report(county), on_token=on_token)
+
+    def structure_report(self, raw_data, on_token=None, known=None):
+        """
+        Turns a raw field report into the Sentinel's metrics.
+
+        Args:
+            known (dict): Metrics measured elsewhere (the raster VCI); these
+                replace the report's values and are never asked of the model
+
+        Returns:
+            Metrics: 'vci', 'water_distance_km', 'goat_price_kes',
+                'maize_price_kes' and a 'confidence' map for the same keys
+        """
+        extraction = sentinel_extractor.extract(raw_data)
+        values = dict(extraction.metrics)
+        confidence = dict(extraction.confidence)
+        known = known or {}
+        values.update(known)
+        confidence.update({key: RASTER_CONFIDENCE for key in known})
+        unresolved = [key for key in extraction.unresolved if key not in known]
+        if unresolved:
+            log.info(f"⚠️  [Sentinel] Asking model for unresolved fields: {', '.join(unresolved)}")
+            prompt = f"Extract {', '.join(unresolved)} from this report: {raw_data}"
+            try:
+                if sentinel_batcher is not None and on_token is None:
+                    # Packed with other counties' requests; a streaming caller asks on its own
+                    reply = submit_batched("sentinel", sentinel_batcher, METRICS_SCHEMA, prompt, Metrics)
+                else:
+                    reply = Metrics.parse(self.think_and_act(prompt, on_token=on_token))
+            except (GeminiError, PayloadError, BatchError):
+                # Report what was extracted; missing fields stay missing
+                reply = None
+            for key in unresolved:
+                value = getattr(reply, key, None)
+                if value is not None:
+                    values[key] = value
+                    confidence[key] = sentinel_extractor.MODEL_CONFIDENCE
+        return Metrics.from_dict(dict(values, confidence=confidence))
 
 
 # --- AGENT 2: THE GUARDIAN ---
@@ -118,6 +436,53 @@ Output a structured JSON analysis with three keys: 'drought_phase', 'economic_st
 The reasoning should be a short, clear sentence explaining your conclusion.
 """
 
+# The thresholds above are evaluated locally by guardian_rules; the Guardian
+# model is only asked to phrase the reasoning when narrative mode is enabled.
+GUARDIAN_NARRATIVE = os.environ.get("ASAL_GUARDIAN_NARRATIVE", "").lower() in ("1", "true", "yes")
+
+def run_guardian(guardian, metrics, narrative=None, on_token=None, trend=None):
+    """
+    Guardian stage: deterministic NDMA classification, optional model narrative.
+
+    The rule engine produces the same keys the Guardian model would
+    ('drought_phase', 'economic_status', 'reasoning'). If the Sentinel found
+    neither VCI nor water distance, the full Guardian model call is used.
+
+    Args:
+        guardian (Agent): Guardian agent, used for narrative or fallback only
+        metrics (Metrics): Sentinel output
+        narrative (bool): Ask the model to write 'reasoning'; defaults to GUARDIAN_NARRATIVE
+        on_token (callable): Streams model output, see Agent.think_and_act
+        trend (dict): The county's VCI entry from IndicatorStore.trend(); a
+            trend over two or more months is added to the reasoning
+
+    Returns:
+        Analysis
+    """
+    if metrics.vci is None and metrics.water_distance_km is None:
+        log.warning("⚠️  [Guardian] Sentinel found no drought indicators, using model analysis.")
+        if guardian_batcher is not None and on_token is None:
+            return submit_batched("guardian", guardian_batcher, ANALYSIS_SCHEMA, metrics.to_prompt(), Analysis)
+        return Analysis.parse(guardian.think_and_act(metrics.to_prompt(), on_token=on_token))
+
+    analysis = Analysis.from_dict(guardian_rules.classify(metrics.values()))
+    if trend is not None and trend["months"] >= 2:
+        analysis.reasoning = f"{analysis.reasoning} {guardian_rules.describe_trend(trend)}"
+    if GUARDIAN_NARRATIVE if narrative is None else narrative:
+        try:
+            reply = Analysis.parse(guardian.think_and_act(
+                "The analysis below was computed from the NDMA thresholds and is final. "
+                "Return it unchanged with only 'reasoning' rewritten.\n"
+                f"Metrics: {metrics.to_prompt()}\nAnalysis: {analysis.to_prompt()}",
+                on_token=on_token
+            ))
+            if reply.reasoning and reply.reasoning.strip():
+                analysis.reasoning = reply.reasoning.strip()
+        except (GeminiError, PayloadError):
+            # Keep the deterministic reasoning
+            pass
+    return analysis
+
 # --- AGENT 3: THE RESPONDER ---
 # Role: Action. Writes the artifacts.
 responder_instructions = """
@@ -127,17 +492,59 @@ You will receive a JSON analysis from the Guardian agent. Based on this analysis
 2. 'governor_brief': A formal, single-paragraph brief for the County Governor. It should state the drought phase, the economic impact, and urgently request the activation of the County Drought Contingency Fund.
 """
 
+# Model preference lists per agent role, most preferred first.
+# Try newer models first, fall back to 1.5 if needed
+MODEL_PREFERENCES = {
+    "sentinel": [
+        "models/gemini-2.5-flash",
+        "models/gemini-1.5-flash",
+        "models/gemini-1.5-pro"
+    ],
+    "guardian": [
+        "models/gemini-2.5-pro",
+        "models/gemini-1.5-pro",
+        "models/gemini-1.5-flash"
+    ],
+    "responder": [
+        "models/gemini-2.5-pro",
+        "models/gemini-1.5-pro",
+        "models/gemini-1.5-flash"
+    ],
+}
+
+MODEL_CACHE_TTL = float(os.environ.get("ASAL_MODEL_CACHE_TTL", "600"))
+
+def _list_generation_models():
+    """
+    Names of all models that support generateContent for this API key.
+
+    With shared state, a listing another worker made within the TTL is used instead.
+    """
+    if shared_state is not None:
+        names = shared_state.get_models(MODEL_CACHE_TTL)
+        if names is not None:
+            return names
+    names = [m.name for m in get_genai().list_models()
+             if 'generateContent' in m.supported_generation_methods]
+    if shared_state is not None:
+        shared_state.put_models(names)
+    return names
+
+# Shared by every request thread: one listing per TTL instead of one per agent per run
+model_registry = ModelRegistry(_list_generation_models, ttl=MODEL_CACHE_TTL)
+
 def get_available_model(preferred_models):
     """
     Intelligent model selection with automatic fallback.
     
     This function implements a smart model selection strategy that ensures
-    system reliability across different API access levels. It queries the
-    Gemini API for available models and selects the best match from a
-    preference list, falling back gracefully if preferred models aren't available.
+    system reliability across different API access levels. It resolves the
+    preference list against the process-wide model registry and selects the
+    best match, falling back gracefully if preferred models aren't available.
     
     This addresses the "404 model not found" issue by dynamically discovering
-    what models are actually available to the current API key.
+    what models are actually available to the current API key. The listing
+    itself is cached by `model_registry`, so repeated calls cost no API round trip.
     
     Args:
         preferred_models (list): Ordered list of model names, from most to least preferred
@@ -150,118 +557,541 @@ def get_available_model(preferred_models):
         We prefer newer models (2.5) but gracefully fall back to 1.5 for
         compatibility. This ensures the system works regardless of API access level.
     """
+    model_name, reason = model_registry.resolve(preferred_models)
+    _report_resolution(model_name, reason)
+    return model_name
+
+def _report_resolution(model_name, reason):
+    if reason == "fallback":
+        log.warning(f"⚠️  Warning: Preferred models not found. Using fallback: {model_name}")
+    elif reason == "unlisted":
+        log.warning(f"⚠️  Warning: Could not list models. Using first preferred: {model_name}")
+
+def resolve_agent_models():
+    """
+    Resolves every agent role's model from the same registry snapshot.
+
+    Returns:
+        dict: role -> model name, e.g. {"sentinel": "models/gemini-2.5-flash", ...}
+    """
+    models = {}
+    with span("resolve_models"):
+        resolved = model_registry.resolve_all(MODEL_PREFERENCES)
+    for role, (model_name, reason) in resolved.items():
+        _report_resolution(model_name, reason)
+        models[role] = model_name
+    return models
+
+# Agent class, display name, persona and reply schema for every role in the pipeline
+AGENT_SPECS = {
+    "sentinel": (SentinelAgent, "Sentinel", sentinel_instructions, METRICS_SCHEMA),
+    "guardian": (Agent, "Guardian", guardian_instructions, ANALYSIS_SCHEMA),
+    "responder": (Agent, "Responder", responder_instructions, ARTIFACTS_SCHEMA),
+}
+
+# Agents are built once per (role, model) and shared by all request threads.
+# A change in the model list drops them so they are rebuilt on the new models.
+agent_pool = AgentPool()
+model_registry.add_listener(agent_pool.clear)
+
+def get_agents():
+    """
+    Returns warm agents for every role, building any that are missing.
+
+    Returns:
+        dict: role -> initialized Agent, keyed like AGENT_SPECS
+    """
+    agents = {}
+    for role, model_name in resolve_agent_models().items():
+        agent_class, name, instructions, schema = AGENT_SPECS[role]
+        agents[role] = agent_pool.get(
+            role, model_name,
+            lambda model, cls=agent_class, n=name, i=instructions, sc=schema: cls(n, model, i, sc)
+        )
+    return agents
+
+# --- Batched Prompting ---
+# Sentinel and Guardian model requests from concurrent runs are packed into one
+# schema-constrained call of up to ASAL_BATCH_MAX_ITEMS items, waiting at most
+# ASAL_BATCH_MAX_WAIT_MS for a batch to fill. ASAL_BATCH_MAX_ITEMS=1 sends each
+# request on its own (and streams it).
+BATCH_MAX_ITEMS = int(os.environ.get("ASAL_BATCH_MAX_ITEMS", "8"))
+BATCH_MAX_WAIT = float(os.environ.get("ASAL_BATCH_MAX_WAIT_MS", "50")) / 1000
+
+def _batch_sender(role, item_schema, task):
+    schema = batch_schema(item_schema)
+
+    def send(items):
+        agent = get_agents()[role]
+        return split_reply(agent.think_and_act(batch_prompt(task, items), response_schema=schema))
+    return send
+
+def submit_batched(role, batcher, item_schema, payload, record_type):
+    """
+    One request through a batcher, cached per item: a batched prompt mixes
+    other counties' requests, so only the item itself is a stable cache key.
+
+    Args:
+        record_type: Metrics or Analysis; only replies that validate are cached
+
+    Raises:
+        BatchError, PayloadError
+    """
+    key = None
+    if response_cache is not None:
+        agent = get_agents()[role]
+        key = cache_key(agent.model_name, "batched\0" + agent.instructions + json.dumps(item_schema, sort_keys=True),
+                        payload)
+        cached = response_cache.get(key, role)
+        if cached is not None:
+            MODEL_CALLS.inc(agent=role, outcome="cache_hit")
+            return record_type.from_dict(json.loads(cached))
+    reply = batcher.submit(payload)
+    record = record_type.from_dict(reply)
+    record.validate()
+    if key is not None:
+        response_cache.put(key, role, json.dumps(reply))
+    return record
+
+if BATCH_MAX_ITEMS > 1:
+    sentinel_batcher = Batcher(
+        _batch_sender("sentinel", METRICS_SCHEMA, "Extract the requested fields from each field report."),
+        max_items=BATCH_MAX_ITEMS, max_wait=BATCH_MAX_WAIT, overhead_chars=len(sentinel_instructions)
+    )
+    guardian_batcher = Batcher(
+        _batch_sender("guardian", ANALYSIS_SCHEMA, "Analyze each county's metrics."),
+        max_items=BATCH_MAX_ITEMS, max_wait=BATCH_MAX_WAIT, overhead_chars=len(guardian_instructions)
+    )
+else:
+    sentinel_batcher = guardian_batcher = None
+
+# --- Responder Templates ---
+# Artifacts for the nine phase x status combinations come from a template bank
+# built by the Responder model in the background and versioned by its
+# instructions. The bank warms when the app starts and again whenever the
+# Responder's instructions change. ASAL_RESPONDER_TEMPLATES=0 always calls the model.
+def _generate_template(phase, status):
+    with request_priority(BATCH):
+        return get_agents()["responder"].think_and_act(TEMPLATE_PROMPT.format(phase=phase, status=status),
+                                                       accept=valid_reply)
+
+if os.environ.get("ASAL_RESPONDER_TEMPLATES", "1").lower() in ("0", "false", "no"):
+    responder_templates = None
+else:
+    responder_templates = TemplateBank(_generate_template, template_version(AGENT_SPECS["responder"][2]),
+                                       os.path.join(CACHE_DIR, "responder_templates"))
+
+WORKFLOW_STAGES = ("sentinel", "guardian", "responder")
+
+def _notify(on_stage, stage, status, output=None):
+    if on_stage is not None:
+        on_stage(stage, status, output)
+
+# Identical concurrent runs (same county, same field report) share one execution,
+# and a finished run is reused for ASAL_COALESCE_SECONDS afterwards.
+workflow_flights = Group(linger=float(os.environ.get("ASAL_COALESCE_SECONDS", "5")))
+
+# Workflow graph nodes run on this shared pool. A node that exceeds
+# ASAL_STAGE_TIMEOUT_SECONDS fails the run.
+pipeline_executor = ThreadPoolExecutor(max_workers=int(os.environ.get("ASAL_PIPELINE_WORKERS", "16")),
+                                       thread_name_prefix="pipeline")
+STAGE_TIMEOUT = float(os.environ.get("ASAL_STAGE_TIMEOUT_SECONDS", "120"))
+
+# Guardian and Responder outputs are reused while a county's metrics stay within
+# ASAL_METRIC_TOLERANCES ("vci=0.5,goat_price_kes=50,...") of the last run.
+# ASAL_INCREMENTAL=0 always runs every stage.
+INCREMENTAL = os.environ.get("ASAL_INCREMENTAL", "1").lower() not in ("0", "false", "no")
+incremental_state = IncrementalState(parse_tolerances(os.environ.get("ASAL_METRIC_TOLERANCES", "")),
+                                     shared=shared_state)
+
+# --- SMS Dispatch ---
+# New SMS alerts fan out to the county's subscribers through ASAL_SMS_GATEWAY
+# ("local" is the in-process stand-in; unset disables dispatch). Subscribers
+# live in the registry under ASAL_DATA_DIR/subscribers (see subscribers.py for
+# importing them). An alert text is sent once per county, however many runs or
+# workers produce it. A worker that claims an alert and dies before queueing it
+# loses the claim after ASAL_ALERT_CLAIM_SECONDS (default 300).
+SMS_GATEWAY = os.environ.get("ASAL_SMS_GATEWAY", "").lower()
+subscriber_registry = SubscriberRegistry(os.path.join(DATA_DIR, "subscribers"))
+
+if SMS_GATEWAY == "local":
+    sms_dispatcher = SmsDispatcher(
+        [LocalGateway("local", max_concurrent=int(os.environ.get("ASAL_SMS_GATEWAY_CONCURRENCY", "8")))],
+        batch_size=int(os.environ.get("ASAL_SMS_BATCH_SIZE", "500"))
+    )
+else:
+    if SMS_GATEWAY:
+        log.warning(f"⚠️  Warning: Unknown ASAL_SMS_GATEWAY '{SMS_GATEWAY}', SMS dispatch disabled.")
+    sms_dispatcher = None
+ALERT_CLAIM_SECONDS = float(os.environ.get("ASAL_ALERT_CLAIM_SECONDS", "300"))
+_dispatched_alerts = set()
+_dispatched_lock = threading.Lock()
+
+def dispatch_alert(county, sms_alert):
+    """
+    Queues a county's SMS alert for its subscribers, unless this exact text
+    was already dispatched for the county.
+
+    Returns:
+        Campaign or None: None if dispatch is off, there are no subscribers,
+            or the alert was sent before
+    """
+    if sms_dispatcher is None or not sms_alert:
+        return None
+    rows = subscriber_registry.select(county=county)
+    if not len(rows):
+        return None
+    fingerprint = report_fingerprint(sms_alert)
+    if shared_state is not None:
+        if not shared_state.claim_alert(county, fingerprint, ttl=ALERT_CLAIM_SECONDS):
+            return None
+    else:
+        with _dispatched_lock:
+            if (county, fingerprint) in _dispatched_alerts:
+                return None
+            _dispatched_alerts.add((county, fingerprint))
     try:
-        available_models = []
-        for m in genai.list_models():
-            if 'generateContent' in m.supported_generation_methods:
-                available_models.append(m.name)
-        
-        for preferred in preferred_models:
-            if preferred in available_models:
-                return preferred
-        
-        # Fallback to first available model
-        if available_models:
-            print(f"⚠️  Warning: Preferred models not found. Using fallback: {available_models[0]}")
-            return available_models[0]
+        campaign = sms_dispatcher.dispatch(sms_alert, subscriber_registry.msisdns(rows), label=county)
+    except Exception:
+        # Give the claim back, so the next run retries this alert
+        if shared_state is not None:
+            shared_state.release_alert(county, fingerprint)
         else:
-            raise Exception("No available models found")
-    except Exception as e:
-        print(f"⚠️  Warning: Could not list models. Using first preferred: {preferred_models[0]}")
-        return preferred_models[0]
+            with _dispatched_lock:
+                _dispatched_alerts.discard((county, fingerprint))
+        raise
+    if shared_state is not None:
+        shared_state.confirm_alert(county, fingerprint)
+    log.info(f"📤 [Responder] SMS alert queued for {len(campaign.recipients)} {county} recipients "
+             f"({campaign.encoding}, {len(campaign.parts)} segment(s)).")
+    return campaign
 
-def run_agent_workflow():
+# Each county's most recent result, for /api/latest. Kept in the shared state
+# when it is enabled, so every worker serves the same one.
+_latest = {}
+
+def put_latest(county, body):
+    if shared_state is not None:
+        shared_state.put_latest(county, body)
+    else:
+        _latest[county] = dict(body, updated_at=time.time())
+
+def get_latest(county):
+    """A county's most recent workflow result plus 'updated_at', or None."""
+    if shared_state is not None:
+        return shared_state.get_latest(county)
+    return _latest.get(county)
+
+def report_fingerprint(report):
+    """Stable identity of a field report's content."""
+    return hashlib.sha256(report.encode("utf-8")).hexdigest()
+
+# --- Metrics ---
+# Components keep their own counters; /metrics reads them at scrape time.
+def _collect_metrics():
+    families = []
+    if response_cache is not None:
+        by_role = response_cache.stats()["by_role"]
+        families += [
+            ("asal_response_cache_hits_total", "counter", "Response cache hits",
+             [({"agent": role}, s["hits"]) for role, s in by_role.items()]),
+            ("asal_response_cache_misses_total", "counter", "Response cache misses",
+             [({"agent": role}, s["misses"]) for role, s in by_role.items()]),
+            ("asal_response_cache_hit_ratio", "gauge", "Response cache hits / lookups",
+             [({"agent": role}, s["hits"] / (s["hits"] + s["misses"]) if s["hits"] + s["misses"] else 0.0)
+              for role, s in by_role.items()]),
+        ]
+    client = gemini_client.stats()
+    families += [
+        (f"asal_gemini_{name}_total", "counter", f"Gemini client {name}", [({}, client[name])])
+        for name in ("calls", "retries", "failures", "throttled")
+    ]
+    families.append(("asal_quota_saturation", "gauge", "Share of the model's rate limit in use",
+                     [({"model": model}, value)
+                      for model, value in gemini_client.saturation(per_model=True).items()]))
+    incremental = incremental_state.stats()
+    families += [
+        ("asal_stage_executions_total", "counter", "Incremental stages executed",
+         [({"stage": stage}, count) for stage, count in incremental["executed"].items()]),
+        ("asal_stage_skips_total", "counter", "Incremental stages reused from the last run",
+         [({"stage": stage}, count) for stage, count in incremental["skipped"].items()]),
+    ]
+    extraction = sentinel_extractor.stats()
+    families += [
+        ("asal_extraction_reports_total", "counter", "Field reports run through local extraction",
+         [({}, extraction["reports"])]),
+        ("asal_extraction_fallback_reports_total", "counter", "Field reports that needed the model",
+         [({}, extraction["reports_with_fallback"])]),
+    ]
+    if responder_templates is not None:
+        templates = responder_templates.stats()
+        families += [
+            ("asal_template_hits_total", "counter", "Responder artifacts served from templates",
+             [({}, templates["hits"])]),
+            ("asal_template_misses_total", "counter", "Responder artifacts that needed the model",
+             [({}, templates["misses"])]),
+        ]
+    batchers = {role: batcher.stats() for role, batcher in (("sentinel", sentinel_batcher),
+                                                             ("guardian", guardian_batcher))
+                if batcher is not None}
+    if batchers:
+        families += [
+            ("asal_batches_total", "counter", "Batched model calls",
+             [({"agent": role}, s["batches"]) for role, s in batchers.items()]),
+            ("asal_batch_items_total", "counter", "Items sent in batched calls",
+             [({"agent": role}, s["items_sent"]) for role, s in batchers.items()]),
+            ("asal_batch_queued", "gauge", "Items waiting for a batch",
+             [({"agent": role}, s["queued"]) for role, s in batchers.items()]),
+        ]
+    if shared_state is not None:
+        shared = shared_state.stats()
+        families.append(("asal_shared_state_operations_total", "counter", "Shared state database operations",
+                         [({"operation": name}, shared[name]) for name in ("reads", "writes", "errors")]))
+    if sms_dispatcher is not None:
+        sms = sms_dispatcher.stats()
+        families += [
+            ("asal_sms_gateway_requests_total", "counter", "SMS gateway requests",
+             [({"gateway": name}, count) for name, count in sms["gateway_requests"].items()]),
+            ("asal_sms_gateway_errors_total", "counter", "Failed SMS gateway requests",
+             [({"gateway": name}, count) for name, count in sms["gateway_errors"].items()]),
+            ("asal_sms_queued_batches", "gauge", "SMS batches waiting for a gateway",
+             [({}, sms["queued_batches"])]),
+        ]
+    return families
+
+registry.register_collector(_collect_metrics)
+
+def run_agent_workflow(county=DEFAULT_COUNTY, on_stage=None, on_token=None):
     """
     Main orchestration function for the multi-agent workflow.
     
-    This function implements a sequential agent workflow where:
+    This function implements a multi-agent workflow where:
     1. Sentinel Agent ingests and structures raw data
     2. Guardian Agent analyzes structured data against NDMA thresholds
     3. Responder Agent generates actionable communication artifacts
     
-    Architecture Pattern: Sequential Pipeline
-    - Each agent depends on the previous agent's output
+    Architecture Pattern: Dependency Graph
+    - Stages are pipeline nodes that start as soon as their inputs are ready
     - Data flows as: Raw Input → Structured JSON → Analysis → Actionable Output
     - This ensures data quality and prevents errors from cascading
     
     Design Decision: Sequential vs Parallel
-    - We chose sequential because Guardian needs Sentinel's structured data
-    - Responder needs Guardian's analysis to generate appropriate communications
-    - Parallel processing would break these dependencies
-    
-    Returns:
-        dict: Contains outputs from all three agents for further processing
-    """
-    print("\n" + "="*60)
-    print("🚀 INITIATING ASAL-GUARDIAN MULTI-AGENT WORKFLOW...")
-    print("="*60)
-
-    # 1. Initialize Agents with fallback logic
-    # Try newer models first, fall back to 1.5 if needed
-    sentinel_model = get_available_model([
-        "models/gemini-2.5-flash",
-        "models/gemini-1.5-flash",
-        "models/gemini-1.5-pro"
-    ])
+    - Guardian needs Sentinel's structured data, and the Responder needs the
+      Guardian's analysis, so those stay in order
+    - The SMS alert and the Governor's brief do not depend on each other and
+      are written concurrently, so latency follows the critical path
     
-    guardian_model = get_available_model([
-        "models/gemini-2.5-pro",
-        "models/gemini-1.5-pro",
-        "models/gemini-1.5-flash"
-    ])
+    Design Decision: Single-Flight Coalescing
+    - Once the field report is fetched, runs are keyed by (county, report
+      fingerprint). Concurrent callers with the same key attach to the run
+      in flight and receive its stage events and result, so a burst of
+      clicks costs one set of model calls.
     
-    responder_model = get_available_model([
-        "models/gemini-2.5-pro",
-        "models/gemini-1.5-pro",
-        "models/gemini-1.5-flash"
-    ])
+    Design Decision: Incremental Re-evaluation
+    - Each county's last metrics, analysis and artifacts are remembered.
+      Metrics within tolerance skip the Guardian and Responder. Moved metrics
+      re-render the artifacts from the template bank with the current values,
+      since the last artifacts quote the old ones.
     
-    sentinel = SentinelAgent("Sentinel", sentinel_model, sentinel_instructions)
-    guardian = Agent("Guardian", guardian_model, guardian_instructions)
-    responder = Agent("Responder", responder_model, responder_instructions)
+    Args:
+        county (str): County to assess
+        on_stage (callable): Optional progress callback, called as
+            on_stage(stage, "running") before and on_stage(stage, "done", output)
+            after each of WORKFLOW_STAGES, or only on_stage(stage, "reused", output)
+            for a stage whose last output was reused
+        on_token (callable): Optional streaming callback, called as
+            on_token(stage, text) for every chunk a stage's model produces
     
-    print("\n✅ [SYSTEM] All agents initialized.")
-    print("="*60)
+    Returns:
+        dict: Contains outputs from all three agents for further processing,
+            plus the pipeline's timing 'trace'
+    """
+    with span("workflow"):
+        return _run_workflow(county, on_stage, on_token)
+
+def _run_workflow(county, on_stage, on_token):
+    log.info("=" * 60 + f"\n🚀 INITIATING ASAL-GUARDIAN MULTI-AGENT WORKFLOW FOR {county.upper()}...\n" + "=" * 60)
+
+    # 1. Fetch warm agents (models resolved from the cached registry, agents pooled)
+    agents = get_agents()
+    log.debug("✅ [SYSTEM] All agents initialized.")
 
     # 2. Execution Flow
-    # Step A: Sentinel gets and structures the data
-    structured_data_json = sentinel.fetch_live_data()
-    print("\n--- SENTINEL OUTPUT (Structured Data) ---")
-    print(structured_data_json)
-    print("----------------------------------------")
-
-
-    # Step B: Guardian analyzes the data
-    analysis_json = guardian.think_and_act(structured_data_json)
-    print("\n--- GUARDIAN OUTPUT (Analysis) ---")
-    print(analysis_json)
-    print("------------------------------------")
-
-    # Step C: Responder takes action
-    actions_json = responder.think_and_act(analysis_json)
-    print("\n--- RESPONDER OUTPUT (Action Artifacts) ---")
-    # Try to parse and print nicely
-    try:
-        actions = json.loads(actions_json.replace("```json", "").replace("```", ""))
-        print("\n📱 SMS Alert:")
-        print(actions.get('sms_alert', 'Not generated'))
-        print("\n📝 Governor's Brief:")
-        print(actions.get('governor_brief', 'Not generated'))
-    except (json.JSONDecodeError, AttributeError):
-        print(actions_json) # Print raw if not valid JSON
-    print("------------------------------------------")
-    
-    print("\n" + "="*60)
-    print("✅ WORKFLOW COMPLETE. System shutting down.")
-    print("="*60)
+    # Step A: Sentinel gets the field report; identical reports share one run
+    _notify(on_stage, "sentinel", "running")
+    with span("stage", "fetch_report"):
+        report = agents["sentinel"].fetch_field_report(county)
+
+    def listener(kind, *args):
+        if kind == "stage":
+            _notify(on_stage, *args)
+        elif on_token is not None:
+            on_token(*args)
+
+    result, shared = workflow_flights.do(
+        (county, report_fingerprint(report)),
+        lambda publish: _run_stages(agents, county, report, publish, stream=on_token is not None),
+        listener=listener
+    )
+    if shared:
+        log.info(f"♻️  [SYSTEM] Joined an identical {county} run already in flight.")
+    return result
+
+def _run_stages(agents, county, report, publish, stream=False):
+    """
+    Runs the workflow graph after the field report is fetched, publishing
+    stage and token events.
+
+    With `stream`, the Sentinel and Guardian model calls stream their tokens
+    and so skip the cross-run batchers; without it they may be batched. A
+    caller that joins a run started without streaming gets no tokens.
+
+        sentinel -> guardian -> sms_alert ------+-> responder
+                             -> governor_brief -+
+
+    The two Responder artifacts are written by concurrent model calls; their
+    tokens are not streamed, since two interleaved streams would garble the
+    Responder box. The result carries the graph's timing trace.
+    """
+    sentinel = agents["sentinel"]
+    guardian = agents["guardian"]
+    responder = agents["responder"]
+    responder_started = threading.Event()
+
+    def tokens(stage):
+        if not stream:
+            return None
+        return lambda text: publish("token", stage, text)
+
+    # Step A (cont.): Sentinel structures the data and records it
+    def run_sentinel(inputs):
+        month = report_month(county)
+        vci = raster_vci(county, month)
+        if vci is not None:
+            log.info(f"🛰️  [Sentinel] {county} VCI {vci} from the NDVI stack ({VCI_WINDOW}-month).")
+        metrics = sentinel.structure_report(report, on_token=tokens("sentinel"),
+                                            known={"vci": vci} if vci is not None else None)
+        structured_data_json = metrics.to_json()
+        publish("stage", "sentinel", "done", structured_data_json)
+        log.info("--- SENTINEL OUTPUT (Structured Data) ---\n"
+                 f"{structured_data_json}\n"
+                 f"📈 Local extraction fallback rate: {sentinel_extractor.stats()['fallback_rate']:.1%}\n"
+                 "----------------------------------------")
+
+        try:
+            indicator_store.append(county, month, metrics.values())
+        except OSError as e:
+            log.warning(f"⚠️  Warning: Could not record indicator history: {e}")
+        trend = indicator_store.trend("vci", TREND_MONTHS, end=month).get(county)
+        return metrics, structured_data_json, trend
+
+    # Step B: Guardian analyzes the data (local NDMA rules, model for narrative only).
+    # Unchanged metrics reuse the last analysis and artifacts outright; otherwise
+    # artifacts come from the last run or the template bank when they can.
+    def run_guardian_stage(inputs):
+        metrics, _, trend = inputs["sentinel"]
+        reusable = incremental_state.reusable_analysis(county, metrics.values()) if INCREMENTAL else None
+        source = None
+        if reusable is not None:
+            analysis, artifacts = reusable
+            source = "reused"
+            publish("stage", "guardian", "reused", analysis.to_json())
+            incremental_state.record("guardian", executed=False)
+            log.info(f"♻️  [Guardian] {county} metrics within tolerance of the last run, reusing its analysis.")
+        else:
+            publish("stage", "guardian", "running", None)
+            analysis = run_guardian(guardian, metrics, on_token=tokens("guardian"), trend=trend)
+            publish("stage", "guardian", "done", analysis.to_json())
+            incremental_state.record("guardian", executed=True)
+            # Even with the phase and status unchanged, the last artifacts quote the
+            # old metrics, so they are re-rendered with the current ones or rewritten
+            artifacts = None
+            if responder_templates is not None:
+                responder_templates.use_version(template_version(AGENT_SPECS["responder"][2]))
+                artifacts = responder_templates.render(county, analysis, metrics)
+            source = "template" if artifacts is not None else None
+        log.info(f"--- GUARDIAN OUTPUT (Analysis) ---\n{analysis.to_json()}\n"
+                 "------------------------------------")
+        return {"analysis": analysis, "artifacts": artifacts, "source": source,
+                "analysis_reused": reusable is not None}
+
+    # Step C: Responder writes each artifact in parallel (schema-constrained, parsed once).
+    # Reused or templated artifacts need no model call.
+    def artifact_stage(name):
+        def run_artifact(inputs):
+            analysis, artifacts = inputs["guardian"]["analysis"], inputs["guardian"]["artifacts"]
+            if artifacts is not None:
+                return getattr(artifacts, name)
+            if not responder_started.is_set():
+                responder_started.set()
+                publish("stage", "responder", "running", None)
+            return Artifacts.parse_field(responder.think_and_act(
+                f"County: {county}\n{analysis.to_prompt()}\nWrite only '{name}'.",
+                response_schema=ARTIFACT_FIELD_SCHEMAS[name]
+            ), name)
+        return run_artifact
+
+    def run_responder(inputs):
+        metrics = inputs["sentinel"][0]
+        guardian_result = inputs["guardian"]
+        analysis = guardian_result["analysis"]
+        artifacts = Artifacts(sms_alert=inputs["sms_alert"], governor_brief=inputs["governor_brief"])
+        actions_json = artifacts.to_json()
+        if guardian_result["source"] == "reused":
+            publish("stage", "responder", "reused", actions_json)
+            incremental_state.record("responder", executed=False)
+            log.info(f"♻️  [Responder] {county} metrics within tolerance, reusing the last artifacts.")
+        else:
+            publish("stage", "responder", "done", actions_json)
+            incremental_state.record("responder", executed=guardian_result["source"] is None)
+            if guardian_result["source"] == "template":
+                log.info(f"📚 [Responder] Artifacts filled in from the {analysis.drought_phase}/"
+                         f"{analysis.economic_status} template.")
+        if not guardian_result["analysis_reused"]:
+            # Reused runs keep the old baseline, so slow drift still adds up to a change
+            incremental_state.remember(county, metrics.values(), analysis, artifacts)
+        put_latest(county, {"metrics": metrics.to_dict(), "analysis": analysis.to_dict(),
+                            "artifacts": artifacts.to_dict()})
+        return artifacts
+
+    def traced(stage, fn):
+        def run(inputs):
+            with span("stage", stage):
+                return fn(inputs)
+        return run
+
+    workflow = (Pipeline(executor=pipeline_executor)
+                .add("sentinel", traced("sentinel", run_sentinel), timeout=STAGE_TIMEOUT)
+                .add("guardian", traced("guardian", run_guardian_stage), deps=("sentinel",),
+                     timeout=STAGE_TIMEOUT)
+                .add("sms_alert", traced("sms_alert", artifact_stage("sms_alert")), deps=("guardian",),
+                     timeout=STAGE_TIMEOUT)
+                .add("governor_brief", traced("governor_brief", artifact_stage("governor_brief")),
+                     deps=("guardian",), timeout=STAGE_TIMEOUT)
+                .add("responder", traced("responder", run_responder),
+                     deps=("sentinel", "guardian", "sms_alert", "governor_brief")))
+    results, trace = workflow.run()
+    artifacts = results["responder"]
+
+    log.info(f"--- RESPONDER OUTPUT (Action Artifacts) ---\n📱 SMS Alert:\n{artifacts.sms_alert}\n"
+             f"📝 Governor's Brief:\n{artifacts.governor_brief}\n"
+             "------------------------------------------")
+    campaign = dispatch_alert(county, artifacts.sms_alert)
+
+    log.info(f"⏱️  Critical path: {' → '.join(trace['critical_path'])} "
+             f"({trace['total_ms']:.0f}ms of {trace['sum_ms']:.0f}ms stage time)\n"
+             f"♻️  Stage executions avoided so far: {incremental_state.stats()['skipped_total']}\n"
+             + "=" * 60 + "\n✅ WORKFLOW COMPLETE. System shutting down.\n" + "=" * 60)
     
     # For Flask integration as described in the document
     return {
-        "sentinel_output": structured_data_json,
-        "guardian_output": analysis_json,
-        "responder_output": actions_json
+        "county": county,
+        "sentinel_output": results["sentinel"][1],
+        "guardian_output": results["guardian"]["analysis"].to_json(),
+        "responder_output": artifacts.to_json(),
+        "sms_campaign": campaign.id if campaign is not None else None,
+        "trace": trace
     }
 
-
 if __name__ == "__main__":
     run_agent_workflow()
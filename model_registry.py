@@ -0,0 +1,173 @@
+"""
+Process-wide model discovery cache for ASAL-Guardian.
+
+Listing the Gemini models an API key can use is a full network round trip.
+The workflow used to do it once per agent on every run; this registry lists
+the models once, keeps the snapshot for a TTL and refreshes it in the
+background, so every preference list in the process resolves from the same
+snapshot.
+"""
+import threading
+import time
+
+
+class ModelRegistry:
+    """
+    Thread-safe, TTL-cached snapshot of the models usable for generateContent.
+
+    Design Decision: Stale-While-Revalidate
+    - The first caller blocks on a single in-flight listing; concurrent
+      callers wait on that same listing instead of issuing their own.
+    - Once a snapshot exists, an expired snapshot keeps being served while
+      one background thread refreshes it, so requests never pay for a
+      refresh after warm-up.
+    - A failed listing never replaces a good snapshot, and a failed first
+      listing is not retried for `error_ttl` seconds so an outage does not
+      turn into one listing attempt per request.
+
+    Attributes:
+        ttl (float): Seconds a snapshot is considered fresh
+        generation (int): Incremented every time the resolved model list changes
+    """
+    def __init__(self, list_models, ttl=600.0, error_ttl=30.0):
+        """
+        Args:
+            list_models (callable): Returns an iterable of model names that
+                support generateContent. Only ever called by one thread at a time.
+            ttl (float): Freshness window of a snapshot in seconds
+            error_ttl (float): Seconds a failed first listing is remembered
+        """
+        self._list_models = list_models
+        self.ttl = ttl
+        self.error_ttl = error_ttl
+        self.generation = 0
+        self._models = None
+        self._fetched_at = 0.0
+        self._lock = threading.Lock()
+        self._inflight = None
+        self._last_error = None
+        self._failed_at = None
+        self._listeners = []
+
+    def add_listener(self, callback):
+        """Register callback(models) to run whenever the model list changes."""
+        with self._lock:
+            self._listeners.append(callback)
+
+    def snapshot(self):
+        """
+        Returns the current list of available model names.
+
+        Blocks only while no snapshot has ever been loaded. Raises the listing
+        error if the very first load fails.
+        """
+        with self._lock:
+            models = self._models
+            stale = time.monotonic() - self._fetched_at > self.ttl
+            if models is not None:
+                if stale and self._inflight is None:
+                    self._inflight = threading.Event()
+                    threading.Thread(target=self._refresh, daemon=True,
+                                     name="model-registry-refresh").start()
+                return models
+            if (self._failed_at is not None
+                    and time.monotonic() - self._failed_at < self.error_ttl):
+                raise RuntimeError(self._last_error)
+            if self._inflight is None:
+                self._inflight = event = threading.Event()
+                owner = True
+            else:
+                event = self._inflight
+                owner = False
+
+        if owner:
+            self._refresh()
+        else:
+            event.wait()
+
+        with self._lock:
+            if self._models is None:
+                raise RuntimeError(self._last_error or "No available models found")
+            return self._models
+
+    def _refresh(self):
+        """Performs one listing and wakes every caller waiting on it."""
+        listeners = []
+        try:
+            models = list(self._list_models())
+            with self._lock:
+                changed = models != self._models
+                self._models = models
+                self._fetched_at = time.monotonic()
+                self._last_error = None
+                self._failed_at = None
+                if changed:
+                    self.generation += 1
+                    listeners = list(self._listeners)
+        except Exception as e:
+            with self._lock:
+                self._last_error = e
+                if self._models is None:
+                    self._failed_at = time.monotonic()
+                else:
+                    # Keep serving the old snapshot, retry after another TTL
+                    self._fetched_at = time.monotonic()
+        finally:
+            with self._lock:
+                event, self._inflight = self._inflight, None
+            if event is not None:
+                event.set()
+        for callback in listeners:
+            callback(models)
+
+    def resolve(self, preferred_models, available_models=None):
+        """
+        Picks the first preferred model present in the snapshot.
+
+        Args:
+            preferred_models (list): Model names, most preferred first
+            available_models (list): Snapshot to resolve against; taken from
+                snapshot() when omitted
+
+        Returns:
+            tuple: (model_name, reason) where reason is "preferred", "fallback"
+                (first available model) or "unlisted" (listing failed, first
+                preferred model returned unchecked)
+        """
+        if available_models is None:
+            try:
+                available_models = self.snapshot()
+            except Exception:
+                return preferred_models[0], "unlisted"
+
+        available = set(available_models)
+        for preferred in preferred_models:
+            if preferred in available:
+                return preferred, "preferred"
+        if available_models:
+            return available_models[0], "fallback"
+        return preferred_models[0], "unlisted"
+
+    def resolve_all(self, preferences):
+        """
+        Resolves several preference lists against one and the same snapshot.
+
+        Args:
+            preferences (dict): key -> preference list
+
+        Returns:
+            dict: key -> (model_name, reason), see resolve()
+        """
+        try:
+            available_models = self.snapshot()
+        except Exception:
+            return {key: (preferred[0], "unlisted")
+                    for key, preferred in preferences.items()}
+        return {key: self.resolve(preferred, available_models)
+                for key, preferred in preferences.items()}
+
+    def invalidate(self):
+        """Forces the next snapshot() call to start a refresh."""
+        with self._lock:
+            self._fetched_at = 0.0
+            self._failed_at = None
@@ -0,0 +1,376 @@
+"""
+Scheduled monitoring of every ASAL county.
+
+The Monitor runs the workflow for each county once per `interval` seconds:
+
+- Each county has its own due time. After a run is dispatched, the next due
+  time is set one interval plus jitter after the previous due time, so
+  counties drift apart instead of firing together.
+- Runs go to a bounded thread pool. The dispatcher waits for a free slot
+  before dispatching the next due county, so no queue builds up behind a
+  slow model.
+- Backpressure: while the model quota is saturated (the busiest token
+  bucket has less than 1 - max_saturation of its burst left), nothing new
+  is dispatched. The daemon is its own process with its own token buckets,
+  so run_county's saturation (main.quota_saturation) also counts what the
+  web workers published to the shared state in the last few seconds:
+  scheduled runs yield while the web app is busy. Without shared state
+  (ASAL_SHARED_STATE=0) only the daemon's own use is seen.
+- A county still running when its next run falls due counts as an
+  overrun, and that run is skipped rather than stacked.
+- Each county's last finish time is kept in a state file. After downtime,
+  overdue counties run once each, oldest first, spread over
+  `catch_up_window` instead of all at once. The cycles they missed are
+  counted, not replayed.
+- stats() reports schedule lag (dispatch time minus due time), backpressure
+  waits and per-cycle throughput, where the k-th cycle is every county's
+  k-th run.
+
+Run as a daemon with `python monitor.py`; see the __main__ block for the
+ASAL_MONITOR_* settings.
+"""
+import collections
+import concurrent.futures
+import json
+import os
+import random
+import threading
+import time
+
+from telemetry import get_logger
+
+# Completed cycles and lag samples kept for stats()
+CYCLE_HISTORY = 20
+LAG_SAMPLES = 1000
+
+log = get_logger("monitor")
+
+
+class _County:
+    __slots__ = ("name", "due", "running", "runs", "failures", "overruns", "missed",
+                 "last_started", "last_finished", "last_seconds", "last_error")
+
+    def __init__(self, name, due):
+        self.name = name
+        self.due = due
+        self.running = False
+        self.runs = 0
+        self.failures = 0
+        self.overruns = 0
+        self.missed = 0
+        self.last_started = None
+        self.last_finished = None
+        self.last_seconds = None
+        self.last_error = None
+
+
+class Monitor:
+    """
+    Jittered per-county schedule over a bounded worker pool.
+
+    Args:
+        run (callable): run(county) performs one workflow run; exceptions count as failures
+        counties (list): Counties to monitor
+        interval (float): Seconds between a county's runs
+        jitter (float): Each next due time moves by up to +/- this share of the interval
+        max_workers (int): Runs in flight at once
+        saturation (callable): Returns model quota use from 0.0 to 1.0, e.g.
+            main.quota_saturation; None disables backpressure
+        max_saturation (float): No dispatch above this saturation
+        backpressure_wait (float): Seconds between saturation checks while held back
+        catch_up_window (float): Seconds overdue counties are spread over on
+            start; defaults to a quarter of the interval
+        state_path (str): JSON file of each county's last finish time, or None
+
+    Raises:
+        ValueError: If `counties` is empty
+    """
+    def __init__(self, run, counties, interval=21600.0, jitter=0.1, max_workers=4,
+                 saturation=None, max_saturation=0.9, backpressure_wait=5.0,
+                 catch_up_window=None, state_path=None, seed=None):
+        self.run = run
+        self.interval = interval
+        self.jitter = jitter
+        self.max_workers = max(1, max_workers)
+        self.saturation = saturation
+        self.max_saturation = max_saturation
+        self.backpressure_wait = backpressure_wait
+        self.catch_up_window = interval / 4 if catch_up_window is None else catch_up_window
+        self.state_path = state_path
+        self._rng = random.Random(seed)
+        self._cond = threading.Condition()
+        self._slots = threading.Semaphore(self.max_workers)
+        self._executor = None
+        self._dispatcher = None
+        self._stopped = threading.Event()
+        self._counties = {name: _County(name, 0.0) for name in dict.fromkeys(counties)}
+        if not self._counties:
+            raise ValueError("Monitor needs at least one county")
+        self._lags = collections.deque(maxlen=LAG_SAMPLES)
+        self._cycles = {}
+        self._completed_cycles = collections.deque(maxlen=CYCLE_HISTORY)
+        self.started_at = None
+        self.caught_up = 0
+        self.backpressure_waits = 0
+        self.backpressure_seconds = 0.0
+
+    # --- State ---
+
+    def _load_state(self):
+        if self.state_path is None:
+            return {}
+        try:
+            with open(self.state_path, encoding="utf-8") as f:
+                return {county: float(finished) for county, finished in json.load(f).items()}
+        except (OSError, ValueError, TypeError, AttributeError):
+            return {}
+
+    def _save_state(self):
+        if self.state_path is None:
+            return
+        with self._cond:
+            state = {c.name: c.last_finished for c in self._counties.values() if c.last_finished is not None}
+        try:
+            os.makedirs(os.path.dirname(self.state_path) or ".", exist_ok=True)
+            tmp_path = f"{self.state_path}.{os.getpid()}.tmp"
+            with open(tmp_path, "w", encoding="utf-8") as f:
+                json.dump(state, f)
+            os.replace(tmp_path, self.state_path)
+        except OSError as e:
+            log.warning(f"⚠️  Warning: Could not save monitor state: {e}")
+
+    # --- Schedule ---
+
+    def _jitter(self):
+        return self._rng.uniform(-self.jitter, self.jitter) * self.interval
+
+    def _plan(self, now):
+        """Sets every county's first due time from the saved finish times."""
+        finished = self._load_state()
+        overdue = []
+        for county in self._counties.values():
+            last = finished.get(county.name)
+            county.last_finished = last
+            if last is not None and now - last < self.interval:
+                county.due = last + self.interval + self._jitter()
+            else:
+                if last is not None:
+                    # One catch-up run stands in for every cycle missed
+                    county.missed += max(0, int((now - last) // self.interval) - 1)
+                overdue.append((last or 0.0, county))
+        overdue.sort(key=lambda item: item[0])
+        step = self.catch_up_window / len(overdue) if overdue else 0.0
+        for i, (_, county) in enumerate(overdue):
+            county.due = now + i * step + self._rng.uniform(0, step)
+        self.caught_up = len(overdue)
+
+    def start(self):
+        """Plans the schedule and starts dispatching in a daemon thread."""
+        with self._cond:
+            if self._dispatcher is not None:
+                return
+            self.started_at = time.time()
+            self._plan(self.started_at)
+            self._executor = concurrent.futures.ThreadPoolExecutor(max_workers=self.max_workers,
+                                                                   thread_name_prefix="monitor")
+            self._dispatcher = threading.Thread(target=self._dispatch, name="monitor-dispatch", daemon=True)
+            self._dispatcher.start()
+        log.info(f"🗓️  [Monitor] {len(self._counties)} counties every {self.interval:.0f}s, "
+                 f"{self.caught_up} overdue spread over {self.catch_up_window:.0f}s.")
+
+    def stop(self, wait=True):
+        """Stops dispatching; with wait, also waits for runs in flight."""
+        self._stopped.set()
+        with self._cond:
+            self._cond.notify_all()
+        if self._dispatcher is not None:
+            self._dispatcher.join()
+        if self._executor is not None:
+            self._executor.shutdown(wait=wait)
+
+    def _next_due(self):
+        # Caller holds the lock. Waits until the earliest county is due.
+        while not self._stopped.is_set():
+            county = min(self._counties.values(), key=lambda c: c.due)
+            remaining = county.due - time.time()
+            if remaining <= 0:
+                return county
+            self._cond.wait(min(remaining, 60.0))
+        return None
+
+    def _advance(self, county, now):
+        # Caller holds the lock. Next due time follows the schedule, not the
+        # dispatch time; cycles that have already passed are skipped.
+        county.due += self.interval + self._jitter()
+        if county.due <= now:
+            behind = int((now - county.due) // self.interval) + 1
+            county.missed += behind
+            county.due += behind * self.interval
+
+    def _hold_back(self):
+        """Waits while the model quota is saturated. Returns False once stopped."""
+        if self.saturation is None:
+            return not self._stopped.is_set()
+        start = None
+        while not self._stopped.is_set() and self.saturation() > self.max_saturation:
+            if start is None:
+                start = time.monotonic()
+                with self._cond:
+                    self.backpressure_waits += 1
+            self._stopped.wait(self.backpressure_wait)
+        if start is not None:
+            with self._cond:
+                self.backpressure_seconds += time.monotonic() - start
+        return not self._stopped.is_set()
+
+    def _acquire_slot(self):
+        while not self._stopped.is_set():
+            if self._slots.acquire(timeout=1.0):
+                return True
+        return False
+
+    def _dispatch(self):
+        while not self._stopped.is_set():
+            with self._cond:
+                county = self._next_due()
+            if county is None:
+                return
+            # Only this thread moves due times, so the county stays next in line
+            # while waiting for a free slot and for quota
+            if not self._acquire_slot():
+                return
+            if not self._hold_back():
+                self._slots.release()
+                return
+            with self._cond:
+                now = time.time()
+                due = county.due
+                self._advance(county, now)
+                if county.running:
+                    county.overruns += 1
+                    self._slots.release()
+                    log.info(f"⏭️  [Monitor] {county.name} still running at its next due time; skipped.")
+                    continue
+                county.running = True
+                county.last_started = now
+                self._lags.append(now - due)
+                cycle = county.runs
+            self._executor.submit(self._run, county, cycle)
+
+    def _run(self, county, cycle):
+        start = time.time()
+        error = None
+        try:
+            self.run(county.name)
+        except Exception as e:
+            error = e
+            log.warning(f"⚠️  [Monitor] {county.name} run failed: {e}")
+        finished = time.time()
+        with self._cond:
+            county.running = False
+            county.runs += 1
+            county.last_finished = finished
+            county.last_seconds = finished - start
+            county.last_error = None if error is None else str(error)
+            if error is not None:
+                county.failures += 1
+            record = self._cycles.setdefault(cycle, {"cycle": cycle, "started": start, "finished": finished,
+                                                     "runs": 0, "failures": 0})
+            record["started"] = min(record["started"], start)
+            record["finished"] = max(record["finished"], finished)
+            record["runs"] += 1
+            record["failures"] += error is not None
+            if record["runs"] == len(self._counties):
+                del self._cycles[cycle]
+                duration = record["finished"] - record["started"]
+                record["seconds"] = duration
+                record["runs_per_minute"] = record["runs"] * 60.0 / duration if duration > 0 else None
+                self._completed_cycles.append(record)
+            self._cond.notify_all()
+        self._slots.release()
+        self._save_state()
+
+    def stats(self):
+        """
+        Returns:
+            dict: Run, failure, overrun and missed-cycle totals; 'lag' (seconds
+                past due at dispatch: p50, p95, max); backpressure waits;
+                completed 'cycles' with 'seconds' and 'runs_per_minute'; and
+                'counties' with each county's counters and next due time
+        """
+        with self._cond:
+            counties = list(self._counties.values())
+            lags = sorted(self._lags)
+
+            def pick(q):
+                return lags[min(len(lags) - 1, int(q * len(lags)))] if lags else None
+
+            return {
+                "counties": {c.name: {"runs": c.runs, "failures": c.failures, "overruns": c.overruns,
+                                      "missed": c.missed, "running": c.running, "next_due": c.due,
+                                      "last_seconds": c.last_seconds, "last_error": c.last_error}
+                             for c in counties},
+                "runs": sum(c.runs for c in counties),
+                "failures": sum(c.failures for c in counties),
+                "overruns": sum(c.overruns for c in counties),
+                "missed": sum(c.missed for c in counties),
+                "running": sum(c.running for c in counties),
+                "caught_up": self.caught_up,
+                "lag": {"p50_s": pick(0.50), "p95_s": pick(0.95), "max_s": lags[-1] if lags else None},
+                "backpressure_waits": self.backpressure_waits,
+                "backpressure_seconds": self.backpressure_seconds,
+                "cycles": list(self._completed_cycles),
+            }
+
+
+def run_county(county):
+    """One monitored run: the full workflow at batch priority, behind interactive requests."""
+    import main
+    with main.request_priority(main.BATCH):
+        main.run_agent_workflow(county)
+
+
+if __name__ == "__main__":
+    # Long-running daemon:
+    #   ASAL_MONITOR_COUNTIES   comma-separated counties, or "all" for every ASAL county
+    #                           (default: every county with field data or a bulletin section)
+    #   ASAL_MONITOR_INTERVAL   seconds between a county's runs (default 21600)
+    #   ASAL_MONITOR_WORKERS    runs in flight at once (default 4)
+    #   ASAL_MONITOR_REPORT     seconds between stats lines (default 300)
+    import signal
+    import main
+
+    import sys
+    from bulletin_ingest import ASAL_COUNTIES
+
+    setting = os.environ.get("ASAL_MONITOR_COUNTIES", "").strip()
+    if setting.lower() == "all":
+        counties = list(ASAL_COUNTIES)
+    else:
+        counties = [c.strip() for c in setting.split(",") if c.strip()] or main.available_counties()
+    if not counties:
+        log.error("❌ [Monitor] No counties to monitor: set ASAL_MONITOR_COUNTIES or add field data.")
+        sys.exit(1)
+    without_data = sorted(set(counties) - set(main.available_counties()))
+    if without_data:
+        log.warning(f"⚠️  [Monitor] No field data yet for {', '.join(without_data)}; their runs fail until there is.")
+    monitor = Monitor(run_county, counties,
+                      interval=float(os.environ.get("ASAL_MONITOR_INTERVAL", "21600")),
+                      max_workers=int(os.environ.get("ASAL_MONITOR_WORKERS", "4")),
+                      saturation=main.quota_saturation,
+                      state_path=os.path.join(main.DATA_DIR, "monitor.json"))
+    stopping = threading.Event()
+    signal.signal(signal.SIGTERM, lambda *_: stopping.set())
+    monitor.start()
+    try:
+        while not stopping.wait(float(os.environ.get("ASAL_MONITOR_REPORT", "300"))):
+            stats = monitor.stats()
+            lag = stats["lag"]["p95_s"]
+            log.info(f"📈 [Monitor] runs={stats['runs']} failures={stats['failures']} "
+                     f"overruns={stats['overruns']} missed={stats['missed']} running={stats['running']} "
+                     f"lag_p95={'-' if lag is None else f'{lag:.1f}s'} "
+                     f"held_back={stats['backpressure_seconds']:.0f}s")
+    except KeyboardInterrupt:
+        pass
+    log.info("🛑 [Monitor] Stopping; waiting for runs in flight.")
+    monitor.stop()
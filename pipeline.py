@@ -0,0 +1,156 @@
+"""
+Dependency-graph pipeline engine.
+
+Workflow stages are declared as nodes with the names of the nodes they
+depend on. A node starts as soon as all of its dependencies have finished,
+so independent branches run concurrently on a shared thread pool and
+end-to-end latency follows the critical path, not the sum of all stages.
+
+Every run returns a timing trace: start and finish offsets per node, plus
+the critical path, i.e. the chain of dependencies that determined when the
+last node finished.
+"""
+import concurrent.futures
+import contextvars
+import threading
+import time
+
+
+class StageTimeout(TimeoutError):
+    """A node did not finish within its timeout."""
+    def __init__(self, node, timeout):
+        super().__init__(f"Stage '{node}' did not finish within {timeout:g}s")
+        self.node = node
+        self.timeout = timeout
+
+
+class Node:
+    """
+    One stage of a pipeline.
+
+    Attributes:
+        name (str): Unique node name; its result is stored under this key
+        fn (callable): fn(inputs) -> result, inputs being a dict of the
+            run's initial inputs plus every dependency's result
+        deps (tuple): Names of the nodes that must finish first
+        timeout (float): Seconds the node may run, or None for no limit
+    """
+    __slots__ = ("name", "fn", "deps", "timeout")
+
+    def __init__(self, name, fn, deps=(), timeout=None):
+        self.name = name
+        self.fn = fn
+        self.deps = tuple(deps)
+        self.timeout = timeout
+
+
+class Pipeline:
+    """
+    A directed acyclic graph of Nodes.
+
+    Nodes must be added after their dependencies, which rules out cycles by
+    construction.
+    """
+    def __init__(self, executor=None, max_workers=8):
+        self.nodes = {}
+        self._executor = executor
+        self._max_workers = max_workers
+        self._executor_lock = threading.Lock()
+
+    def add(self, name, fn, deps=(), timeout=None):
+        if name in self.nodes:
+            raise ValueError(f"Duplicate pipeline node '{name}'")
+        missing = [dep for dep in deps if dep not in self.nodes]
+        if missing:
+            raise ValueError(f"Node '{name}' depends on unknown nodes: {', '.join(missing)}")
+        self.nodes[name] = Node(name, fn, deps, timeout)
+        return self
+
+    @property
+    def executor(self):
+        with self._executor_lock:
+            if self._executor is None:
+                self._executor = concurrent.futures.ThreadPoolExecutor(
+                    max_workers=self._max_workers, thread_name_prefix="pipeline")
+            return self._executor
+
+    def run(self, inputs=None):
+        """
+        Runs every node once, each as soon as its dependencies are done.
+
+        Args:
+            inputs (dict): Initial values visible to every node
+
+        Returns:
+            tuple: (results, trace); results maps node name -> result, trace
+                is described in critical_path_trace()
+
+        Raises:
+            StageTimeout: If a node exceeds its timeout
+            Exception: The first exception raised by a node. Nodes still
+                running are left to finish in the background, and nothing
+                new is started.
+        """
+        results = dict(inputs or {})
+        started, finished = {}, {}
+        pending = list(self.nodes.values())
+        running = {}
+        origin = time.monotonic()
+
+        def launch(node):
+            node_inputs = {key: value for key, value in results.items()
+                           if key in node.deps or key not in self.nodes}
+            started[node.name] = time.monotonic()
+            # Nodes see the caller's context, e.g. its request_priority()
+            future = self.executor.submit(contextvars.copy_context().run, node.fn, node_inputs)
+            running[future] = node
+
+        while pending or running:
+            for node in [n for n in pending if all(dep in finished for dep in n.deps)]:
+                pending.remove(node)
+                launch(node)
+
+            deadlines = [started[node.name] + node.timeout
+                         for node in running.values() if node.timeout is not None]
+            wait_for = max(0.0, min(deadlines) - time.monotonic()) if deadlines else None
+            done, _ = concurrent.futures.wait(list(running), timeout=wait_for,
+                                              return_when=concurrent.futures.FIRST_COMPLETED)
+            for future in done:
+                node = running.pop(future)
+                finished[node.name] = time.monotonic()
+                results[node.name] = future.result()
+
+            now = time.monotonic()
+            for node in running.values():
+                if node.timeout is not None and now - started[node.name] >= node.timeout:
+                    raise StageTimeout(node.name, node.timeout)
+
+        return results, self.critical_path_trace(origin, started, finished)
+
+    def critical_path_trace(self, origin, started, finished):
+        """
+        Returns:
+            dict: 'nodes' (name -> start_ms, end_ms, duration_ms), 'critical_path'
+                (node names, first to last), 'total_ms' (wall time) and 'sum_ms'
+                (what running every node back to back would have taken)
+        """
+        def ms(t):
+            return round((t - origin) * 1000, 1)
+
+        nodes = {name: {"start_ms": ms(started[name]), "end_ms": ms(finished[name]),
+                        "duration_ms": round((finished[name] - started[name]) * 1000, 1)}
+                 for name in self.nodes if name in finished}
+        path = []
+        if finished:
+            current = max(finished, key=finished.get)
+            while current is not None:
+                path.append(current)
+                deps = [dep for dep in self.nodes[current].deps if dep in finished]
+                current = max(deps, key=finished.get) if deps else None
+            path.reverse()
+        return {
+            "nodes": nodes,
+            "critical_path": path,
+            "total_ms": max((n["end_ms"] for n in nodes.values()), default=0.0),
+            "sum_ms": round(sum(n["duration_ms"] for n in nodes.values()), 1),
+        }
@@ -0,0 +1,318 @@
+"""
+Precomputed Responder artifacts for every drought phase x economic status.
+
+The Guardian only ever outputs three drought phases and three economic
+statuses, so the Responder's SMS alert and Governor's brief follow nine
+patterns. This bank asks the Responder model once per combination for
+templates with slots such as {county} and {vci}. It stores them on disk under
+a version derived from the Responder's instructions, and fills them in
+locally after the Guardian stage.
+
+- Templates are generated in a background thread, at batch priority, when
+  the service starts and whenever a combination is still missing; the
+  workflow never waits for them.
+- A change to `responder_instructions` changes the version, so the old bank
+  is ignored and a new one is warmed right away.
+- Stored templates pass the same check as fresh replies when loaded, so a
+  hand-edited or stale bank cannot put broken slots into an SMS.
+- Unusual cases fall back to the live Responder model. That covers an
+  UNKNOWN phase or status, a slot whose metric is missing, a combination
+  not yet warmed, and an SMS longer than SMS_MAX_CHARS after filling.
+"""
+import hashlib
+import json
+import os
+import string
+import threading
+import time
+
+from schemas import Artifacts
+from telemetry import get_logger
+
+PHASES = ("ALARM", "ALERT", "NORMAL")
+STATUSES = ("CRISIS", "STRESSED", "STABLE")
+
+log = get_logger("responder_templates")
+
+SMS_MAX_CHARS = 160
+
+# Placeholders a template may use
+SLOTS = ("county", "drought_phase", "economic_status", "vci", "water_distance_km",
+         "goat_price_kes", "maize_price_kes", "terms_of_trade")
+
+TEMPLATE_PROMPT = (
+    "Write the two artifacts for a county whose drought phase is {phase} and whose "
+    "economic status is {status}. Do not use real numbers or a county name. Write these "
+    "placeholders, in single curly braces, wherever the values belong: {{county}}, {{vci}}, "
+    "{{water_distance_km}}, {{goat_price_kes}}, {{maize_price_kes}}, {{terms_of_trade}}. "
+    "Use no other curly braces. The SMS must stay under 120 characters before the "
+    "placeholders are filled in."
+)
+
+# Longest plausible slot values, to check filled SMS length when a template is stored
+_WIDEST = {"county": "Tharaka Nithi", "drought_phase": "NORMAL", "economic_status": "STRESSED",
+           "vci": "100.0", "water_distance_km": "100.0", "goat_price_kes": "10,000",
+           "maize_price_kes": "1,000", "terms_of_trade": "100.0"}
+
+
+def template_version(instructions):
+    """Short hash of the Responder instructions and the template prompt."""
+    return hashlib.sha256((instructions + TEMPLATE_PROMPT).encode("utf-8")).hexdigest()[:12]
+
+
+def slot_values(county, analysis, metrics):
+    """Display strings per slot; None where the value is missing."""
+    def number(value, fmt):
+        return None if value is None else format(value, fmt)
+
+    return {
+        "county": county,
+        "drought_phase": analysis.drought_phase,
+        "economic_status": analysis.economic_status,
+        "vci": number(metrics.vci, ".1f"),
+        "water_distance_km": number(metrics.water_distance_km, ".1f"),
+        "goat_price_kes": number(metrics.goat_price_kes, ",.0f"),
+        "maize_price_kes": number(metrics.maize_price_kes, ",.0f"),
+        "terms_of_trade": number(analysis.terms_of_trade, ".1f"),
+    }
+
+
+def _fields(template):
+    """
+    The slot names a template uses, or None if any field is more than a bare
+    slot name: a format spec ({vci:.1f}), a conversion ({vci!r}), an index
+    or attribute ({0}, {vci.x}) or unbalanced braces. Slot values are
+    display strings, so none of those can be filled safely.
+    """
+    try:
+        parsed = list(string.Formatter().parse(template))
+    except ValueError:
+        return None
+    fields = set()
+    for _, name, spec, conversion in parsed:
+        if name is None:
+            continue
+        if spec or conversion or name not in SLOTS:
+            return None
+        fields.add(name)
+    return fields
+
+
+def fill(template, values):
+    """
+    Fills a template's slots.
+
+    Returns:
+        str or None: None if the template is malformed, uses an unknown slot
+            or one whose value is missing
+    """
+    fields = _fields(template)
+    if fields is None or any(values.get(name) is None for name in fields):
+        return None
+    try:
+        return template.format_map(values)
+    except (ValueError, IndexError, KeyError, AttributeError):
+        return None
+
+
+def valid_template(sms_alert, governor_brief):
+    """True if both templates fill cleanly and the SMS fits even with the widest values."""
+    if not isinstance(sms_alert, str) or not isinstance(governor_brief, str):
+        return False
+    sms = fill(sms_alert, _WIDEST)
+    return sms is not None and len(sms) <= SMS_MAX_CHARS and fill(governor_brief, _WIDEST) is not None
+
+
+def valid_reply(text):
+    """True if a model reply parses into artifacts that pass valid_template(); see Agent.think_and_act(accept=)."""
+    try:
+        artifacts = Artifacts.parse(text)
+    except Exception:
+        return False
+    return valid_template(artifacts.sms_alert, artifacts.governor_brief)
+
+
+class TemplateBank:
+    """
+    Versioned Responder templates with background warming.
+
+    Args:
+        generate (callable): generate(phase, status) -> model reply text with
+            'sms_alert' and 'governor_brief' templates (ARTIFACTS_SCHEMA). It
+            should keep replies failing valid_reply() out of any response cache,
+            or a rejected template comes back on every re-warm.
+        version (str): See template_version()
+        cache_dir (str): Directory holding <version>.json, or None to keep templates in memory
+        retry_seconds (float): Wait before re-warming combinations that failed or were rejected
+
+    Attributes:
+        hits (int): Artifacts rendered from a template
+        misses (int): Renders that fell back to the model
+    """
+    def __init__(self, generate, version, cache_dir=None, retry_seconds=600):
+        self.generate = generate
+        self.retry_seconds = retry_seconds
+        self.cache_dir = cache_dir
+        self._last_warm = None
+        self.version = version
+        self._lock = threading.Lock()
+        self._warming = None
+        self.hits = 0
+        self.misses = 0
+        self._templates = self._load(version)
+
+    def _path(self, version):
+        return os.path.join(self.cache_dir, f"{version}.json") if self.cache_dir else None
+
+    @property
+    def path(self):
+        return self._path(self.version)
+
+    def _load(self, version):
+        """The stored templates for a version that pass valid_template(); bad entries are dropped."""
+        path = self._path(version)
+        if path is None:
+            return {}
+        try:
+            with open(path, encoding="utf-8") as f:
+                stored = json.load(f)
+        except (OSError, ValueError):
+            return {}
+        loaded = {}
+        for key, templates in stored.get("templates", {}).items():
+            phase, _, status = key.partition("/")
+            if (phase in PHASES and status in STATUSES and isinstance(templates, dict)
+                    and valid_template(templates.get("sms_alert"), templates.get("governor_brief"))):
+                loaded[(phase, status)] = {"sms_alert": templates["sms_alert"],
+                                           "governor_brief": templates["governor_brief"]}
+            else:
+                log.warning(f"⚠️  Warning: Dropped stored Responder template {key} (bad slots or SMS too long)")
+        return loaded
+
+    def _save(self):
+        with self._lock:
+            version, path = self.version, self.path
+            stored = {"version": version,
+                      "templates": {f"{phase}/{status}": t for (phase, status), t in self._templates.items()}}
+        if path is None:
+            return
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp_path = f"{path}.{os.getpid()}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(stored, f, indent=2)
+        os.replace(tmp_path, path)
+
+    def use_version(self, version):
+        """
+        Switches to the templates of another version, e.g. after the Responder
+        instructions changed, and starts warming them.
+
+        Returns:
+            bool: False if version is already in use
+        """
+        with self._lock:
+            if version == self.version:
+                return False
+        templates = self._load(version)
+        with self._lock:
+            self.version = version
+            self._templates = templates
+            self._last_warm = None
+        log.info(f"📚 [Responder] Template bank switched to version {version}.")
+        self.warm_async()
+        return True
+
+    @property
+    def complete(self):
+        with self._lock:
+            return all((p, s) in self._templates for p in PHASES for s in STATUSES)
+
+    def warm(self):
+        """Generates every missing combination. Returns the number added."""
+        added = 0
+        with self._lock:
+            version = self.version
+        for phase in PHASES:
+            for status in STATUSES:
+                with self._lock:
+                    if self.version != version:
+                        # use_version() switched banks; the new one warms itself
+                        return added
+                    if (phase, status) in self._templates:
+                        continue
+                try:
+                    artifacts = Artifacts.parse(self.generate(phase, status))
+                    valid = valid_template(artifacts.sms_alert, artifacts.governor_brief)
+                except Exception as e:
+                    log.warning(f"⚠️  Warning: Could not build Responder template {phase}/{status}: {e}")
+                    continue
+                if not valid:
+                    log.warning(f"⚠️  Warning: Rejected Responder template {phase}/{status} (bad slots or SMS too long)")
+                    continue
+                with self._lock:
+                    if self.version != version:
+                        return added
+                    self._templates[(phase, status)] = artifacts.to_dict()
+                added += 1
+        if added:
+            try:
+                self._save()
+            except OSError as e:
+                log.warning(f"⚠️  Warning: Could not save Responder templates: {e}")
+        return added
+
+    def warm_async(self):
+        """Starts warming in a daemon thread unless complete or already warming."""
+        if self.complete:
+            return None
+        with self._lock:
+            if self._warming is not None and self._warming.is_alive():
+                return self._warming
+            if self._last_warm is not None and time.monotonic() - self._last_warm < self.retry_seconds:
+                return None
+            self._last_warm = time.monotonic()
+            self._warming = threading.Thread(target=self._warm_logged, name="template-warm", daemon=True)
+            self._warming.start()
+            return self._warming
+
+    def _warm_logged(self):
+        while True:
+            with self._lock:
+                version = self.version
+            added = self.warm()
+            log.info(f"📚 [Responder] Template bank {version}: {added} combinations warmed.")
+            with self._lock:
+                if self.version == version:
+                    return
+
+    def render(self, county, analysis, metrics):
+        """
+        Artifacts from the template for the analysis' phase and status.
+
+        Returns:
+            Artifacts or None: None for unusual cases, which go to the model.
+                A miss on an unwarmed combination starts warming.
+        """
+        key = (analysis.drought_phase, analysis.economic_status)
+        with self._lock:
+            templates = self._templates.get(key)
+        artifacts = None
+        if templates is not None:
+            values = slot_values(county, analysis, metrics)
+            sms = fill(templates["sms_alert"], values)
+            brief = fill(templates["governor_brief"], values)
+            if sms is not None and brief is not None and len(sms) <= SMS_MAX_CHARS:
+                artifacts = Artifacts(sms_alert=sms, governor_brief=brief)
+        elif key[0] in PHASES and key[1] in STATUSES:
+            self.warm_async()
+        with self._lock:
+            if artifacts is None:
+                self.misses += 1
+            else:
+                self.hits += 1
+        return artifacts
+
+    def stats(self):
+        with self._lock:
+            return {"version": self.version, "templates": len(self._templates),
+                    "hits": self.hits, "misses": self.misses}
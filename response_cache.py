@@ -0,0 +1,175 @@
+"""
+Content-addressed, persistent response cache for agent model calls.
+
+The same model, system instruction and input give the same answer for as long
+as a county's field report is unchanged. Responses are stored in a local SQLite
+database keyed by a hash of all three. Entries expire after a per-role TTL, and
+the least recently used ones are evicted once the cache exceeds its size budget.
+
+Design Decision: SQLite in WAL mode
+- One file, shared safely by every thread (one connection per thread) and by
+  every gunicorn worker process (SQLite file locking).
+- WAL lets readers proceed while another process writes, and busy_timeout
+  makes writers wait briefly instead of failing.
+"""
+import hashlib
+import os
+import sqlite3
+import threading
+import time
+from collections import defaultdict
+
+from telemetry import get_logger
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS responses (
+    key TEXT PRIMARY KEY,
+    role TEXT NOT NULL,
+    response TEXT NOT NULL,
+    size INTEGER NOT NULL,
+    created_at REAL NOT NULL,
+    last_access REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS responses_last_access ON responses (last_access);
+"""
+
+log = get_logger("response_cache")
+
+# Seconds a response stays valid, per agent role
+DEFAULT_TTLS = {
+    "sentinel": 6 * 3600,
+    "guardian": 6 * 3600,
+    "responder": 24 * 3600,
+}
+DEFAULT_TTL = 3600
+
+
+def cache_key(model_name, instructions, input_data):
+    """sha256 over (model_name, instructions, input), NUL-separated."""
+    digest = hashlib.sha256()
+    for part in (model_name, instructions, input_data):
+        digest.update(str(part).encode("utf-8"))
+        digest.update(b"\0")
+    return digest.hexdigest()
+
+
+class ResponseCache:
+    """
+    Size-bounded LRU cache of model responses on a local SQLite file.
+
+    Attributes:
+        path (str): SQLite database file
+        max_bytes (int): Total response size kept before LRU eviction
+        ttls (dict): Role -> seconds; roles not listed use DEFAULT_TTL
+    """
+    def __init__(self, path, max_bytes=64 * 1024 * 1024, ttls=None):
+        self.path = path
+        self.max_bytes = max_bytes
+        self.ttls = dict(DEFAULT_TTLS if ttls is None else ttls)
+        self._local = threading.local()
+        self._counter_lock = threading.Lock()
+        self._hits = defaultdict(int)
+        self._misses = defaultdict(int)
+        self._writes_since_evict = 0
+
+    def _connection(self):
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            directory = os.path.dirname(self.path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            conn = sqlite3.connect(self.path, timeout=5.0, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            conn.executescript(_SCHEMA)
+            self._local.conn = conn
+        return conn
+
+    def get(self, key, role):
+        """
+        Returns the cached response, or None on a miss or an expired entry.
+
+        A database error counts as a miss; the cache never fails a model call.
+        """
+        now = time.time()
+        ttl = self.ttls.get(role, DEFAULT_TTL)
+        try:
+            conn = self._connection()
+            row = conn.execute(
+                "SELECT response, created_at FROM responses WHERE key = ?", (key,)
+            ).fetchone()
+            if row is not None and now - row[1] <= ttl:
+                conn.execute("UPDATE responses SET last_access = ? WHERE key = ?", (now, key))
+                self._count(self._hits, role)
+                return row[0]
+            if row is not None:
+                conn.execute("DELETE FROM responses WHERE key = ?", (key,))
+        except sqlite3.Error as e:
+            log.warning(f"⚠️  Warning: Response cache read failed: {e}")
+        self._count(self._misses, role)
+        return None
+
+    def put(self, key, role, response):
+        """Stores a response, evicting least recently used entries if over budget."""
+        now = time.time()
+        size = len(response.encode("utf-8"))
+        try:
+            conn = self._connection()
+            conn.execute(
+                "INSERT OR REPLACE INTO responses (key, role, response, size, created_at, last_access) "
+                "VALUES (?, ?, ?, ?, ?, ?)",
+                (key, role, response, size, now, now)
+            )
+            with self._counter_lock:
+                self._writes_since_evict += 1
+                due = self._writes_since_evict >= 16
+                if due:
+                    self._writes_since_evict = 0
+            # Summing sizes is a table scan, so only check the budget every few writes
+            if due:
+                self.evict()
+        except sqlite3.Error as e:
+            log.warning(f"⚠️  Warning: Response cache write failed: {e}")
+
+    def evict(self):
+        """Deletes least recently used entries until the cache fits in max_bytes."""
+        conn = self._connection()
+        total = conn.execute("SELECT COALESCE(SUM(size), 0) FROM responses").fetchone()[0]
+        if total <= self.max_bytes:
+            return 0
+        removed = 0
+        for key, size in conn.execute(
+                "SELECT key, size FROM responses ORDER BY last_access").fetchall():
+            if total <= self.max_bytes:
+                break
+            conn.execute("DELETE FROM responses WHERE key = ?", (key,))
+            total -= size
+            removed += 1
+        return removed
+
+    def clear(self):
+        self._connection().execute("DELETE FROM responses")
+
+    def _count(self, counter, role):
+        with self._counter_lock:
+            counter[role] += 1
+
+    def stats(self):
+        """
+        Hit/miss counters of this process, per role and in total.
+
+        Returns:
+            dict: {"hits", "misses", "hit_rate", "by_role": {role: {...}}}
+        """
+        with self._counter_lock:
+            roles = set(self._hits) | set(self._misses)
+            by_role = {role: {"hits": self._hits[role], "misses": self._misses[role]}
+                       for role in sorted(roles)}
+        hits = sum(r["hits"] for r in by_role.values())
+        misses = sum(r["misses"] for r in by_role.values())
+        return {
+            "hits": hits,
+            "misses": misses,
+            "hit_rate": hits / (hits + misses) if hits + misses else 0.0,
+            "by_role": by_role,
+        }
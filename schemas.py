@@ -0,0 +1,174 @@
+"""
+Typed payloads passed between the ASAL-Guardian agents.
+
+Each stage hands the next one a compact, slotted record instead of
+free-form model text. The Gemini response schemas below constrain
+generation to JSON in exactly these shapes, so one parse pass is enough:
+no fence stripping and no re-asking the model. Downstream prompts are
+built from the records' compact JSON, which keeps input tokens small.
+"""
+import json
+from dataclasses import dataclass, fields
+from typing import Optional
+
+from telemetry import span
+
+# OpenAPI-subset schemas accepted by GenerationConfig.response_schema
+METRICS_SCHEMA = {
+    "type": "object",
+    "properties": {
+        "vci": {"type": "number", "nullable": True},
+        "water_distance_km": {"type": "number", "nullable": True},
+        "goat_price_kes": {"type": "number", "nullable": True},
+        "maize_price_kes": {"type": "number", "nullable": True},
+    },
+}
+
+ANALYSIS_SCHEMA = {
+    "type": "object",
+    "properties": {
+        "drought_phase": {"type": "string", "enum": ["ALARM", "ALERT", "NORMAL", "UNKNOWN"]},
+        "economic_status": {"type": "string", "enum": ["CRISIS", "STRESSED", "STABLE", "UNKNOWN"]},
+        "reasoning": {"type": "string"},
+        "terms_of_trade": {"type": "number", "nullable": True},
+    },
+    "required": ["drought_phase", "economic_status", "reasoning"],
+}
+
+ARTIFACTS_SCHEMA = {
+    "type": "object",
+    "properties": {
+        "sms_alert": {"type": "string"},
+        "governor_brief": {"type": "string"},
+    },
+    "required": ["sms_alert", "governor_brief"],
+}
+
+# One schema per artifact, so the Responder can write both in parallel
+ARTIFACT_FIELD_SCHEMAS = {
+    name: {"type": "object", "properties": {name: spec}, "required": [name]}
+    for name, spec in ARTIFACTS_SCHEMA["properties"].items()
+}
+
+
+class PayloadError(ValueError):
+    """A model reply that does not match the expected record."""
+
+
+def parse_json(text):
+    """
+    Parses a model reply as a JSON object.
+
+    JSON-mode replies parse directly; a reply wrapped in prose or a ```json
+    fence is retried once on its outermost braces.
+
+    Raises:
+        PayloadError: If no JSON object can be read
+    """
+    if not isinstance(text, str):
+        raise PayloadError("Reply is not text")
+    try:
+        payload = json.loads(text)
+    except json.JSONDecodeError:
+        start, end = text.find("{"), text.rfind("}")
+        if start == -1 or end <= start:
+            raise PayloadError("Reply contains no JSON object")
+        try:
+            payload = json.loads(text[start:end + 1])
+        except json.JSONDecodeError as e:
+            raise PayloadError(f"Reply is not valid JSON: {e}")
+    if not isinstance(payload, dict):
+        raise PayloadError("Reply is not a JSON object")
+    return payload
+
+
+class _Record:
+    """Shared JSON conversion for the slotted payload records."""
+    __slots__ = ()
+
+    def to_dict(self):
+        return {f.name: getattr(self, f.name) for f in fields(self)}
+
+    def to_json(self):
+        return json.dumps(self.to_dict())
+
+    def to_prompt(self):
+        """Compact JSON of the populated fields, for downstream prompts."""
+        return json.dumps({k: v for k, v in self.to_dict().items() if v is not None},
+                          separators=(",", ":"))
+
+    @classmethod
+    def from_dict(cls, payload):
+        """Builds the record from known keys; unknown keys are ignored, missing ones are None."""
+        return cls(**{f.name: payload.get(f.name) for f in fields(cls)})
+
+    @classmethod
+    def parse(cls, text):
+        """Parses a model reply into the record in one pass. Raises PayloadError."""
+        with span("parse", cls.__name__):
+            record = cls.from_dict(parse_json(text))
+            record.validate()
+        return record
+
+    def validate(self):
+        pass
+
+
+@dataclass
+class Metrics(_Record):
+    """Sentinel output: one county's indicators and per-field extraction confidence."""
+    __slots__ = ("vci", "water_distance_km", "goat_price_kes", "maize_price_kes", "confidence")
+    vci: Optional[float]
+    water_distance_km: Optional[float]
+    goat_price_kes: Optional[float]
+    maize_price_kes: Optional[float]
+    confidence: Optional[dict]
+
+    def values(self):
+        """The four indicators as a dict, without confidence."""
+        return {"vci": self.vci, "water_distance_km": self.water_distance_km,
+                "goat_price_kes": self.goat_price_kes, "maize_price_kes": self.maize_price_kes}
+
+    def to_prompt(self):
+        return json.dumps({k: v for k, v in self.values().items() if v is not None},
+                          separators=(",", ":"))
+
+    def validate(self):
+        for name, value in self.values().items():
+            if value is not None and not isinstance(value, (int, float)):
+                raise PayloadError(f"'{name}' is not a number")
+
+
+@dataclass
+class Analysis(_Record):
+    """Guardian output: NDMA drought phase and economic status with reasoning."""
+    __slots__ = ("drought_phase", "economic_status", "reasoning", "terms_of_trade")
+    drought_phase: Optional[str]
+    economic_status: Optional[str]
+    reasoning: Optional[str]
+    terms_of_trade: Optional[float]
+
+    def validate(self):
+        if not self.drought_phase or not self.economic_status:
+            raise PayloadError("Analysis lacks 'drought_phase' or 'economic_status'")
+
+
+@dataclass
+class Artifacts(_Record):
+    """Responder output: the pastoralist SMS and the Governor's brief."""
+    __slots__ = ("sms_alert", "governor_brief")
+    sms_alert: Optional[str]
+    governor_brief: Optional[str]
+
+    @staticmethod
+    def parse_field(text, name):
+        """Parses a reply written against ARTIFACT_FIELD_SCHEMAS[name]. Raises PayloadError."""
+        with span("parse", name):
+            value = parse_json(text).get(name)
+        if not isinstance(value, str) or not value.strip():
+            raise PayloadError(f"Reply lacks '{name}'")
+        return value
+
+    def validate(self):
+        if not self.sms_alert or not self.governor_brief:
+            raise PayloadError("Artifacts lack 'sms_alert' or 'governor_brief'")
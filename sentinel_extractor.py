@@ -0,0 +1,156 @@
+"""
+Fast-path local extractor for Sentinel field reports.
+
+Routine NDMA-style field reports state VCI, water distance and market
+prices in a handful of regular phrasings. Compiled patterns recover those
+numbers in well under a millisecond. The Sentinel model is only asked for
+fields the patterns could not resolve with enough confidence.
+"""
+import re
+import threading
+from dataclasses import dataclass, field
+
+# Fields below this confidence are handed to the Sentinel model
+MIN_CONFIDENCE = 0.8
+
+# Confidence assigned to a field the Sentinel model filled in
+MODEL_CONFIDENCE = 0.7
+
+_NUM = r"(\d[\d,]*(?:\.\d+)?)"
+_KES = r"(?:KES|KSh|Kshs?)\.?\s*"
+# A VCI averaging window ("3-month", "(3 months)", "3Month"), never the value itself
+_WINDOW = r"(?:\(?\s*\d+\s*-?\s*months?\s*\)?[^.\n\d]{0,30}?)?"
+_NOT_WINDOW = r"(?!\s*-?\s*months?\b)"
+
+# (pattern, confidence) per canonical metric, strongest phrasing first.
+# Every pattern captures the value in its first group. Bare numbers without a
+# currency come last: in bulletins they are often chart axes or percentages.
+_PATTERNS = {
+    "vci": [
+        (r"\b(?:VCI|vegetation\s+condition\s+index)\b[^.\n\d]{0,40}?" + _WINDOW + _NUM + _NOT_WINDOW, 0.95),
+        (r"\bvegetation\s+index\b[^.\n\d]{0,40}?" + _WINDOW + _NUM + _NOT_WINDOW, 0.9),
+        (r"\bvegetation\b[^.\n]{0,60}?" + _NUM, 0.6),
+    ],
+    "water_distance_km": [
+        (r"\b(?:trek\w*|walk\w*|travel\w*)\s+(?:about\s+|over\s+|up\s+to\s+)?" + _NUM
+         + r"\s*(?:km|kilomet\w+)\b[^.\n]{0,30}?\bwater", 0.95),
+        (r"\bwater\b[^.\n\d]{0,40}?" + _NUM + r"\s*(?:km|kilomet\w+)\b", 0.85),
+        (_NUM + r"\s*(?:km|kilomet\w+)\b", 0.5),
+    ],
+    "goat_price_kes": [
+        (r"\bgoat\s+(?:market\s+)?prices?\b[^.\n\d]{0,40}?" + _KES + _NUM, 0.95),
+        (r"\bgoats?\b[^.\n\d]{0,40}?" + _KES + _NUM, 0.9),
+        (r"\bgoats?\b[^.\n\d]{0,40}?" + _NUM + r"\s*(?:KES|KSh|Ksh|shillings)\b", 0.9),
+        (r"\bgoat\s+(?:market\s+)?prices?\b[^.\n\d]{0,40}?" + _NUM, 0.85),
+    ],
+    "maize_price_kes": [
+        (r"\bmaize\s+prices?\b[^.\n\d]{0,40}?" + _KES + _NUM, 0.95),
+        (r"\bmaize\b[^.\n\d]{0,40}?" + _KES + _NUM, 0.9),
+        (r"\bmaize\b[^.\n\d]{0,40}?" + _NUM + r"\s*(?:KES|KSh|Ksh|shillings)\b", 0.9),
+        (r"\bmaize\s+prices?\b[^.\n\d]{0,40}?" + _NUM, 0.85),
+    ],
+}
+
+_COMPILED = {
+    key: [(re.compile(pattern, re.IGNORECASE), confidence) for pattern, confidence in patterns]
+    for key, patterns in _PATTERNS.items()
+}
+
+# Values outside these ranges are implausible and get their confidence halved
+_PLAUSIBLE = {
+    "vci": (0.0, 100.0),
+    "water_distance_km": (0.0, 100.0),
+    "goat_price_kes": (100.0, 100000.0),
+    "maize_price_kes": (5.0, 1000.0),
+}
+
+
+@dataclass
+class Extraction:
+    """
+    Result of a local extraction pass.
+
+    Attributes:
+        metrics (dict): Canonical metric -> value for every field that matched
+        confidence (dict): Canonical metric -> confidence in [0, 1] (0.0 if unmatched)
+        unresolved (list): Metrics below MIN_CONFIDENCE, to be asked of the model
+    """
+    metrics: dict = field(default_factory=dict)
+    confidence: dict = field(default_factory=dict)
+    unresolved: list = field(default_factory=list)
+
+
+def extract(report, min_confidence=MIN_CONFIDENCE):
+    """
+    Extracts the Sentinel metrics from a field report using compiled patterns.
+
+    Args:
+        report (str): Raw field report text
+        min_confidence (float): Fields scoring below this are listed as unresolved
+
+    Returns:
+        Extraction
+    """
+    result = Extraction()
+    for key, patterns in _COMPILED.items():
+        best = 0.0
+        for pattern, confidence in patterns:
+            match = pattern.search(report)
+            if not match:
+                continue
+            value = float(match.group(1).replace(",", ""))
+            low, high = _PLAUSIBLE[key]
+            if not low <= value <= high:
+                confidence /= 2
+            if confidence > best:
+                best = confidence
+                result.metrics[key] = value
+            if best >= min_confidence:
+                break
+        result.confidence[key] = best
+        if best < min_confidence:
+            result.unresolved.append(key)
+    _stats.record(result)
+    return result
+
+
+class ExtractionStats:
+    """Thread-safe counters for how often the Sentinel model is still needed."""
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.reports = 0
+        self.reports_with_fallback = 0
+        self.fields = 0
+        self.fields_fallback = 0
+
+    def record(self, result):
+        with self._lock:
+            self.reports += 1
+            self.fields += len(result.confidence)
+            self.fields_fallback += len(result.unresolved)
+            if result.unresolved:
+                self.reports_with_fallback += 1
+
+    def snapshot(self):
+        """
+        Returns:
+            dict: Counters plus 'fallback_rate' (share of reports that needed
+                the model) and 'field_fallback_rate' (share of fields)
+        """
+        with self._lock:
+            return {
+                "reports": self.reports,
+                "reports_with_fallback": self.reports_with_fallback,
+                "fields": self.fields,
+                "fields_fallback": self.fields_fallback,
+                "fallback_rate": self.reports_with_fallback / self.reports if self.reports else 0.0,
+                "field_fallback_rate": self.fields_fallback / self.fields if self.fields else 0.0,
+            }
+
+
+_stats = ExtractionStats()
+
+
+def stats():
+    """Process-wide extractor counters, see ExtractionStats.snapshot()."""
+    return _stats.snapshot()
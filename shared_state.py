@@ -0,0 +1,265 @@
+"""
+Cross-process state for multi-worker deployments.
+
+gunicorn can run one worker process per core, but every in-process registry
+is then duplicated: each worker lists models on its own, a job submitted to
+one worker is unknown to the others, and each worker's incremental baselines
+only see the runs it served itself. This module keeps that state in one
+local SQLite database shared by every worker:
+
+- models: the resolved model listing, so one worker lists per TTL instead of all
+- jobs: job snapshots, so a job can be polled through any worker
+- baselines: each county's incremental baseline (metrics, analysis, artifacts)
+- latest: each county's most recent workflow result
+- alerts: SMS alerts claimed or dispatched, so one alert is sent by one worker
+  once. A claim not confirmed within its TTL (the claimant crashed) can be
+  taken over by the next caller.
+- quota: each process's recent model quota use, so the monitor daemon can
+  hold back while web workers are busy
+
+Model responses are already shared through response_cache.py, and indicator
+history through indicator_store.py's append-only file.
+
+Design Decision: SQLite in WAL mode, as in response_cache.py
+- One connection per thread; SQLite file locking serializes writers across
+  processes and WAL lets readers proceed while one writes.
+- A database error never fails a request: reads count as misses and
+  writes are dropped with a warning.
+"""
+import json
+import os
+import sqlite3
+import threading
+import time
+
+from telemetry import get_logger
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS models (
+    key TEXT PRIMARY KEY,
+    names TEXT NOT NULL,
+    fetched_at REAL NOT NULL
+);
+CREATE TABLE IF NOT EXISTS jobs (
+    job_id TEXT PRIMARY KEY,
+    body TEXT NOT NULL,
+    finished_at REAL,
+    updated_at REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS jobs_finished_at ON jobs (finished_at);
+CREATE TABLE IF NOT EXISTS baselines (
+    county TEXT PRIMARY KEY,
+    body TEXT NOT NULL,
+    updated_at REAL NOT NULL
+);
+CREATE TABLE IF NOT EXISTS alerts (
+    county TEXT NOT NULL,
+    fingerprint TEXT NOT NULL,
+    claimed_at REAL NOT NULL,
+    dispatched_at REAL,
+    PRIMARY KEY (county, fingerprint)
+);
+CREATE TABLE IF NOT EXISTS quota (
+    pid INTEGER PRIMARY KEY,
+    saturation REAL NOT NULL,
+    updated_at REAL NOT NULL
+);
+CREATE TABLE IF NOT EXISTS latest (
+    county TEXT PRIMARY KEY,
+    body TEXT NOT NULL,
+    updated_at REAL NOT NULL
+);
+"""
+
+log = get_logger("shared_state")
+
+
+class SharedState:
+    """
+    SQLite-backed state shared by every worker process.
+
+    Attributes:
+        path (str): SQLite database file
+        reads (int): Successful reads by this process
+        writes (int): Successful writes by this process
+        errors (int): Database errors in this process
+    """
+    def __init__(self, path):
+        self.path = path
+        self._local = threading.local()
+        self._counter_lock = threading.Lock()
+        # SQLite's busy handler sleeps and polls, so this process's own
+        # writers queue on a lock instead; only other processes contend in SQLite
+        self._write_lock = threading.Lock()
+        self.reads = 0
+        self.writes = 0
+        self.errors = 0
+
+    def _connection(self):
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            directory = os.path.dirname(self.path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            conn = sqlite3.connect(self.path, timeout=5.0, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            conn.executescript(_SCHEMA)
+            # Databases created before alerts had dispatched_at
+            columns = {row[1] for row in conn.execute("PRAGMA table_info(alerts)")}
+            if "dispatched_at" not in columns:
+                try:
+                    conn.execute("ALTER TABLE alerts ADD COLUMN dispatched_at REAL")
+                except sqlite3.OperationalError:
+                    pass  # Another process added it first
+            self._local.conn = conn
+        return conn
+
+    def _count(self, name):
+        with self._counter_lock:
+            setattr(self, name, getattr(self, name) + 1)
+
+    def _read(self, sql, params):
+        try:
+            row = self._connection().execute(sql, params).fetchone()
+        except sqlite3.Error as e:
+            self._count("errors")
+            log.warning(f"⚠️  Warning: Shared state read failed: {e}")
+            return None
+        self._count("reads")
+        return row
+
+    def _write(self, sql, params):
+        try:
+            conn = self._connection()
+            with self._write_lock:
+                conn.execute(sql, params)
+        except sqlite3.Error as e:
+            self._count("errors")
+            log.warning(f"⚠️  Warning: Shared state write failed: {e}")
+            return False
+        self._count("writes")
+        return True
+
+    # --- Models ---
+
+    def get_models(self, max_age, key="default"):
+        """The stored model listing if younger than max_age seconds, else None."""
+        row = self._read("SELECT names, fetched_at FROM models WHERE key = ?", (key,))
+        if row is None or time.time() - row[1] > max_age:
+            return None
+        return json.loads(row[0])
+
+    def put_models(self, names, key="default"):
+        self._write("INSERT OR REPLACE INTO models (key, names, fetched_at) VALUES (?, ?, ?)",
+                    (key, json.dumps(list(names)), time.time()))
+
+    # --- Jobs ---
+
+    def put_job(self, body):
+        """
+        Stores a job snapshot.
+
+        Args:
+            body (dict): Job.to_dict(); 'job_id' and 'finished_at' are indexed
+        """
+        self._write("INSERT OR REPLACE INTO jobs (job_id, body, finished_at, updated_at) VALUES (?, ?, ?, ?)",
+                    (body["job_id"], json.dumps(body, default=str), body.get("finished_at"), time.time()))
+
+    def get_job(self, job_id):
+        """The last stored snapshot of a job, or None."""
+        row = self._read("SELECT body FROM jobs WHERE job_id = ?", (job_id,))
+        return None if row is None else json.loads(row[0])
+
+    def prune_jobs(self, finished_before):
+        """Deletes jobs that finished before the given time. Unfinished jobs are kept."""
+        self._write("DELETE FROM jobs WHERE finished_at IS NOT NULL AND finished_at < ?", (finished_before,))
+
+    # --- Per-county results ---
+
+    def get_baseline(self, county):
+        """A county's incremental baseline dict, or None."""
+        row = self._read("SELECT body FROM baselines WHERE county = ?", (county,))
+        return None if row is None else json.loads(row[0])
+
+    def put_baseline(self, county, body):
+        self._write("INSERT OR REPLACE INTO baselines (county, body, updated_at) VALUES (?, ?, ?)",
+                    (county, json.dumps(body), time.time()))
+
+    def clear_baselines(self, county=None):
+        if county is None:
+            self._write("DELETE FROM baselines", ())
+        else:
+            self._write("DELETE FROM baselines WHERE county = ?", (county,))
+
+    def get_latest(self, county):
+        """
+        A county's most recent workflow result.
+
+        Returns:
+            dict or None: The stored result plus 'updated_at'
+        """
+        row = self._read("SELECT body, updated_at FROM latest WHERE county = ?", (county,))
+        if row is None:
+            return None
+        latest = json.loads(row[0])
+        latest["updated_at"] = row[1]
+        return latest
+
+    def put_latest(self, county, body):
+        self._write("INSERT OR REPLACE INTO latest (county, body, updated_at) VALUES (?, ?, ?)",
+                    (county, json.dumps(body), time.time()))
+
+    def claim_alert(self, county, fingerprint, ttl=300.0):
+        """
+        True for the first caller, in any process, to claim this alert for
+        this county, or for a caller taking over a claim that was not
+        confirmed within `ttl` seconds. False if it is claimed or dispatched
+        already, or the database failed.
+        """
+        now = time.time()
+        try:
+            conn = self._connection()
+            with self._write_lock:
+                cursor = conn.execute("INSERT OR IGNORE INTO alerts (county, fingerprint, claimed_at) "
+                                      "VALUES (?, ?, ?)", (county, fingerprint, now))
+                if cursor.rowcount != 1:
+                    # One statement, so only one caller can take over an expired claim
+                    cursor = conn.execute("UPDATE alerts SET claimed_at = ? WHERE county = ? AND fingerprint = ? "
+                                          "AND dispatched_at IS NULL AND claimed_at < ?",
+                                          (now, county, fingerprint, now - ttl))
+                    if cursor.rowcount == 1:
+                        log.warning(f"⚠️  Warning: Taking over an unconfirmed {county} alert claim.")
+        except sqlite3.Error as e:
+            self._count("errors")
+            log.warning(f"⚠️  Warning: Shared state write failed: {e}")
+            return False
+        self._count("writes")
+        return cursor.rowcount == 1
+
+    def confirm_alert(self, county, fingerprint):
+        """Marks a claimed alert as dispatched, so it is never claimed again."""
+        self._write("UPDATE alerts SET dispatched_at = ? WHERE county = ? AND fingerprint = ?",
+                    (time.time(), county, fingerprint))
+
+    def release_alert(self, county, fingerprint):
+        """Drops an unconfirmed claim, e.g. after the dispatch failed, so the next caller can claim it."""
+        self._write("DELETE FROM alerts WHERE county = ? AND fingerprint = ? AND dispatched_at IS NULL",
+                    (county, fingerprint))
+
+    # --- Quota ---
+
+    def put_quota(self, saturation, pid=None):
+        """Publishes this process's model quota use (0.0 to 1.0)."""
+        self._write("INSERT OR REPLACE INTO quota (pid, saturation, updated_at) VALUES (?, ?, ?)",
+                    (os.getpid() if pid is None else pid, float(saturation), time.time()))
+
+    def max_quota(self, max_age, exclude_pid=None):
+        """Highest quota use any other process published within max_age seconds, or 0.0."""
+        row = self._read("SELECT MAX(saturation) FROM quota WHERE updated_at >= ? AND pid != ?",
+                         (time.time() - max_age, -1 if exclude_pid is None else exclude_pid))
+        return 0.0 if row is None or row[0] is None else row[0]
+
+    def stats(self):
+        with self._counter_lock:
+            return {"reads": self.reads, "writes": self.writes, "errors": self.errors}
@@ -0,0 +1,119 @@
+"""
+Single-flight coalescing of concurrent identical work.
+
+When several operators start the same workflow at once, only the first call
+runs. Every other caller with the same key attaches to that execution and
+receives its result. A finished result is also reused for a short linger
+window, so a burst of dashboard clicks costs one set of model calls per
+unique input.
+
+Progress events published by the running call are replayed to callers that
+attach late. Streaming clients therefore see the same stage and token events
+whether they started the run or joined it.
+"""
+import threading
+import time
+
+
+class _Flight:
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+        self.finished_at = None
+        self.events = []
+        self.listeners = []
+        self.lock = threading.Lock()
+
+    def publish(self, *event):
+        with self.lock:
+            self.events.append(event)
+            listeners = list(self.listeners)
+        for listener in listeners:
+            listener(*event)
+
+    def attach(self, listener):
+        # Replay under the lock so no event is missed or delivered twice
+        with self.lock:
+            for event in self.events:
+                listener(*event)
+            self.listeners.append(listener)
+
+
+class Group:
+    """
+    Coalesces calls by key.
+
+    Attributes:
+        linger (float): Seconds a successful result keeps being handed to new callers
+        executions (int): Calls that actually ran fn
+        coalesced (int): Calls served by another call's execution
+    """
+    def __init__(self, linger=5.0):
+        self.linger = linger
+        self._flights = {}
+        self._lock = threading.Lock()
+        self.executions = 0
+        self.coalesced = 0
+
+    def do(self, key, fn, listener=None):
+        """
+        Runs fn(publish) once per key at a time and shares its outcome.
+
+        Args:
+            key: Hashable identity of the work
+            fn (callable): fn(publish) -> result; publish(*event) forwards
+                progress events to every attached caller
+            listener (callable): Receives listener(*event) for every event,
+                including ones published before this caller attached
+
+        Returns:
+            tuple: (result, shared), shared being True if another call ran fn
+
+        Raises:
+            Whatever fn raised, in every caller attached to that execution
+        """
+        with self._lock:
+            self._prune()
+            flight = self._flights.get(key)
+            leader = flight is None
+            if leader:
+                flight = self._flights[key] = _Flight()
+                self.executions += 1
+            else:
+                self.coalesced += 1
+
+        if listener is not None:
+            flight.attach(listener)
+
+        if leader:
+            try:
+                flight.result = fn(flight.publish)
+            except BaseException as e:
+                flight.error = e
+            finally:
+                flight.finished_at = time.monotonic()
+                flight.done.set()
+                with self._lock:
+                    # Failed runs are not reused; drop them right away
+                    if flight.error is not None and self._flights.get(key) is flight:
+                        del self._flights[key]
+        else:
+            flight.done.wait()
+
+        if flight.error is not None:
+            raise flight.error
+        return flight.result, not leader
+
+    def _prune(self):
+        # Caller holds the lock
+        now = time.monotonic()
+        expired = [key for key, flight in self._flights.items()
+                   if flight.done.is_set() and now - flight.finished_at > self.linger]
+        for key in expired:
+            del self._flights[key]
+
+    def stats(self):
+        with self._lock:
+            return {"executions": self.executions, "coalesced": self.coalesced,
+                    "in_flight": sum(1 for f in self._flights.values() if not f.done.is_set())}
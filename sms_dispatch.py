@@ -0,0 +1,507 @@
+"""
+Outbound SMS fan-out for Responder alerts.
+
+One county alert can go to hundreds of thousands of pastoralists. This
+module turns the Responder's `sms_alert` into SMS segments and delivers them
+through one or more gateways:
+
+- Text is packed into GSM-7 where possible. Typographic characters that
+  would force the 70-character UCS-2 alphabet (curly quotes, dashes, accents
+  outside GSM-7) are transliterated, as long as that makes the whole message
+  GSM-7. The text is then split into 160/153-septet (GSM-7) or 70/67-unit
+  (UCS-2) segments without breaking an escape sequence or a surrogate pair.
+- Recipients are sent in batches from a shared queue. Each gateway runs
+  `max_concurrent` sender threads and may be rate limited, so a faster
+  gateway simply drains more batches.
+- Per-recipient results drive retries: transient failures are re-queued
+  with jittered exponential backoff, rejected numbers fail at once.
+- A campaign keeps its recipients as E.164 digits in a uint64 array and
+  their delivery state and attempt count as one uint8 each, so tracking
+  500,000 recipients costs about 5 MB. Gateways report delivery receipts by
+  message reference, "<campaign id>:<recipient index>".
+- Finished campaigns are kept for `retention_seconds` (late receipts still
+  find them), capped at `max_retained`, oldest dropped first.
+"""
+import itertools
+import queue
+import random
+import threading
+import time
+import unicodedata
+from collections import OrderedDict
+
+import numpy as np
+
+from gemini_client import TokenBucket
+from telemetry import get_logger
+
+log = get_logger("sms_dispatch")
+
+# --- Encoding and segmentation ---
+
+GSM7_BASIC = ("@£$¥èéùìòÇ\nØø\rÅåΔ_ΦΓΛΩΠΨΣΘΞ\x1bÆæßÉ !\"#¤%&'()*+,-./0123456789:;<=>?"
+              "¡ABCDEFGHIJKLMNOPQRSTUVWXYZÄÖÑÜ§¿abcdefghijklmnopqrstuvwxyzäöñüà")
+# Extension table characters, sent as ESC + character (two septets)
+GSM7_EXTENSION = "\f^{}\\[~]|€"
+
+_GSM7_COST = {ch: 1 for ch in GSM7_BASIC if ch != "\x1b"}
+_GSM7_COST.update({ch: 2 for ch in GSM7_EXTENSION})
+
+GSM7 = "GSM-7"
+UCS2 = "UCS-2"
+
+# (single-message limit, per-segment limit once concatenated), in septets or UTF-16 units
+SEGMENT_LIMITS = {GSM7: (160, 153), UCS2: (70, 67)}
+
+# Common characters outside GSM-7 and their closest GSM-7 spelling
+_TRANSLITERATIONS = {
+    "‘": "'", "’": "'", "‚": "'", "′": "'", "`": "'", "´": "'",
+    "“": '"', "”": '"', "„": '"', "″": '"', "«": '"', "»": '"',
+    "–": "-", "—": "-", "−": "-", "•": "-",
+    "…": "...", " ": " ", " ": " ", " ": " ", "\t": " ",
+    "ç": "Ç", "°": "o",
+}
+
+
+def is_gsm7(text):
+    return all(ch in _GSM7_COST for ch in text)
+
+
+def encoding_for(text):
+    """GSM7 if every character is in the GSM-7 alphabet, else UCS2."""
+    return GSM7 if is_gsm7(text) else UCS2
+
+
+def _transliterate(ch):
+    if ch in _GSM7_COST:
+        return ch
+    if ch in _TRANSLITERATIONS:
+        return _TRANSLITERATIONS[ch]
+    # Accented letters GSM-7 lacks (á, ê, ō, ...) keep their base letter
+    base = "".join(c for c in unicodedata.normalize("NFKD", ch) if not unicodedata.combining(c))
+    return base if base and is_gsm7(base) else ch
+
+
+def pack(text):
+    """
+    The cheapest faithful form of an SMS text: whitespace runs collapsed and,
+    if that makes the whole text GSM-7, non-GSM characters transliterated.
+    Text that needs UCS-2 anyway (emoji, non-Latin scripts) keeps its characters.
+    """
+    text = " ".join(text.split())
+    if is_gsm7(text):
+        return text
+    packed = "".join(_transliterate(ch) for ch in text)
+    return packed if is_gsm7(packed) else text
+
+
+def _units(ch, encoding):
+    if encoding == GSM7:
+        return _GSM7_COST[ch]
+    return 2 if ord(ch) > 0xFFFF else 1
+
+
+def segments(text):
+    """
+    Splits text into SMS segments.
+
+    Returns:
+        tuple: (encoding, list of segment strings). A text within the
+            single-message limit is one segment; longer text is split at the
+            concatenated limit, never inside a two-septet or two-unit character.
+    """
+    encoding = encoding_for(text)
+    single, part = SEGMENT_LIMITS[encoding]
+    if sum(_units(ch, encoding) for ch in text) <= single:
+        return encoding, [text] if text else []
+    parts, current, used = [], [], 0
+    for ch in text:
+        cost = _units(ch, encoding)
+        if used + cost > part:
+            parts.append("".join(current))
+            current, used = [], 0
+        current.append(ch)
+        used += cost
+    if current:
+        parts.append("".join(current))
+    return encoding, parts
+
+
+def normalize_msisdn(number, country_code="254"):
+    """
+    '0712 345 678', '712345678' or '+254712345678' -> '+254712345678'.
+
+    Returns:
+        str or None: None if the number is not a plausible mobile number
+    """
+    digits = "".join(ch for ch in str(number) if ch.isdigit())
+    if digits.startswith("00"):
+        digits = digits[2:]
+    elif digits.startswith("0"):
+        digits = country_code + digits[1:]
+    elif len(digits) == 9:
+        digits = country_code + digits
+    return f"+{digits}" if 10 <= len(digits) <= 15 else None
+
+
+def msisdn_array(recipients):
+    """
+    Recipients as a de-duplicated uint64 array of E.164 digits, in first-seen
+    order. Strings are normalized and unparseable ones dropped; a uint64
+    array (e.g. from SubscriberRegistry.msisdns) is taken as already normalized.
+    """
+    if isinstance(recipients, np.ndarray) and recipients.dtype == np.uint64:
+        numbers = recipients
+    else:
+        numbers = np.fromiter((int(n[1:]) for n in map(normalize_msisdn, recipients) if n),
+                              np.uint64)
+    _, first = np.unique(numbers, return_index=True)
+    return numbers[np.sort(first)]
+
+
+# --- Delivery state ---
+
+QUEUED, SENT, DELIVERED, FAILED = 0, 1, 2, 3
+STATE_NAMES = ("queued", "sent", "delivered", "failed")
+
+# Per-recipient gateway results
+ACCEPTED, RETRY, REJECTED = 0, 1, 2
+
+
+class GatewayError(Exception):
+    """A whole gateway request failed; every recipient in it is retried."""
+
+
+class Campaign:
+    """
+    One alert text going out to a list of recipients.
+
+    Attributes:
+        id (str): Campaign id, the prefix of every message reference
+        text (str): Packed message text
+        encoding (str): GSM7 or UCS2
+        parts (list): Segment strings
+        recipients (numpy.ndarray): uint64 E.164 digits per recipient (no '+')
+        state (numpy.ndarray): uint8 delivery state per recipient (QUEUED, SENT, DELIVERED, FAILED)
+        attempts (numpy.ndarray): uint8 send attempts per recipient
+    """
+    def __init__(self, campaign_id, text, recipients, label=None):
+        self.id = campaign_id
+        self.label = label
+        self.text = pack(text)
+        self.encoding, self.parts = segments(self.text)
+        self.recipients = msisdn_array(recipients)
+        self.state = np.zeros(len(self.recipients), np.uint8)
+        self.attempts = np.zeros(len(self.recipients), np.uint8)
+        self.created_at = time.time()
+        self.finished_at = None
+        self.requests = 0
+        self.retried = 0
+        self._lock = threading.Lock()
+        self._outstanding = len(self.recipients)
+        self.done = threading.Event()
+        if not self._outstanding:
+            self._finish()
+
+    def reference(self, index):
+        return f"{self.id}:{index}"
+
+    def _finish(self):
+        self.finished_at = time.time()
+        self.done.set()
+
+    def _settle(self, indexes, state):
+        # Caller holds the lock; moves recipients out of QUEUED
+        self.state[indexes] = state
+        self._outstanding -= len(indexes)
+        if self._outstanding <= 0 and not self.done.is_set():
+            self._finish()
+
+    def wait(self, timeout=None):
+        """Blocks until every recipient is sent or failed. Returns True if so."""
+        return self.done.wait(timeout)
+
+    def counts(self):
+        with self._lock:
+            tally = np.bincount(self.state, minlength=len(STATE_NAMES))
+        return {name: int(tally[i]) for i, name in enumerate(STATE_NAMES)}
+
+    def stats(self):
+        """
+        Returns:
+            dict: Recipient counts per state, segments per message and in
+                total, gateway requests, retried recipients and elapsed seconds
+        """
+        counts = self.counts()
+        end = self.finished_at or time.time()
+        settled = counts["sent"] + counts["delivered"]
+        return {
+            "campaign_id": self.id,
+            "label": self.label,
+            "recipients": len(self.recipients),
+            **counts,
+            "encoding": self.encoding,
+            "characters": len(self.text),
+            "segments_per_message": len(self.parts),
+            "segments_sent": settled * len(self.parts),
+            "requests": self.requests,
+            "retried": self.retried,
+            "elapsed_s": end - self.created_at,
+            "messages_per_s": settled / (end - self.created_at) if end > self.created_at else 0.0,
+            "complete": self.done.is_set(),
+        }
+
+
+class _Batch:
+    __slots__ = ("campaign", "indexes")
+
+    def __init__(self, campaign, indexes):
+        self.campaign = campaign
+        self.indexes = indexes
+
+
+class SmsDispatcher:
+    """
+    Queue-fed fan-out of campaigns over one or more gateways.
+
+    Args:
+        gateways (list): Objects with `name`, `max_concurrent`, `max_batch`,
+            optional `requests_per_minute`, and send(parts, numbers, references)
+            returning one ACCEPTED / RETRY / REJECTED code per number; any
+            other code is treated as RETRY
+        batch_size (int): Recipients per gateway request (capped by each gateway's max_batch)
+        max_attempts (int): Sends per recipient before it is marked FAILED
+        base_delay (float): First retry delay in seconds, doubled per attempt with full jitter
+        max_delay (float): Longest retry delay
+        retention_seconds (float): How long a finished campaign stays
+            available to campaign() and delivery_report()
+        max_retained (int): Finished campaigns kept at most
+    """
+    def __init__(self, gateways, batch_size=500, max_attempts=4, base_delay=1.0, max_delay=30.0,
+                 retention_seconds=3600, max_retained=100):
+        if not gateways:
+            raise ValueError("SmsDispatcher needs at least one gateway")
+        self.gateways = list(gateways)
+        self.batch_size = max(1, batch_size)
+        self.max_attempts = max_attempts
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.retention_seconds = retention_seconds
+        self.max_retained = max_retained
+        self._queue = queue.Queue()
+        self._campaigns = OrderedDict()
+        self._ids = itertools.count(1)
+        self._lock = threading.Lock()
+        self._threads = []
+        self._started = False
+        self._buckets = {
+            gateway.name: TokenBucket(gateway.requests_per_minute)
+            for gateway in self.gateways if getattr(gateway, "requests_per_minute", None)
+        }
+        self.gateway_requests = {gateway.name: 0 for gateway in self.gateways}
+        self.gateway_errors = {gateway.name: 0 for gateway in self.gateways}
+
+    def _start(self):
+        # Caller holds the lock
+        if self._started:
+            return
+        for gateway in self.gateways:
+            for slot in range(max(1, gateway.max_concurrent)):
+                thread = threading.Thread(target=self._sender, args=(gateway,),
+                                          name=f"sms-{gateway.name}-{slot}", daemon=True)
+                thread.start()
+                self._threads.append(thread)
+        self._started = True
+
+    def dispatch(self, text, recipients, label=None):
+        """
+        Queues one alert for every recipient and returns at once.
+
+        Args:
+            text (str): The alert; packed and segmented once for all recipients
+            recipients (sequence): Phone numbers, normalized and de-duplicated
+                with unparseable ones dropped, or a uint64 array of E.164 digits
+            label (str): Free-form tag, e.g. the county
+
+        Returns:
+            Campaign: Poll stats() or wait() for progress
+        """
+        numbers = msisdn_array(recipients)
+        with self._lock:
+            self._prune()
+            campaign = Campaign(f"c{next(self._ids)}", text, numbers, label)
+            self._campaigns[campaign.id] = campaign
+            self._start()
+        size = min([self.batch_size] + [g.max_batch for g in self.gateways])
+        for start in range(0, len(numbers), size):
+            self._queue.put(_Batch(campaign, np.arange(start, min(start + size, len(numbers)))))
+        return campaign
+
+    def _prune(self):
+        # Caller holds the lock. Unfinished campaigns are never dropped.
+        cutoff = time.time() - self.retention_seconds
+        finished = [cid for cid, campaign in self._campaigns.items() if campaign.finished_at is not None]
+        excess = len(finished) - self.max_retained
+        for cid in finished:
+            if excess > 0 or self._campaigns[cid].finished_at < cutoff:
+                del self._campaigns[cid]
+                excess -= 1
+
+    def campaign(self, campaign_id):
+        with self._lock:
+            return self._campaigns.get(campaign_id)
+
+    def delivery_report(self, reference, delivered):
+        """
+        Records a gateway delivery receipt.
+
+        Args:
+            reference (str): The message reference passed to the gateway
+            delivered (bool): False marks the recipient FAILED
+        """
+        campaign_id, _, index = reference.partition(":")
+        campaign = self.campaign(campaign_id)
+        if campaign is None or not index.isdigit():
+            return
+        index = int(index)
+        with campaign._lock:
+            if index < len(campaign.state) and campaign.state[index] == SENT:
+                campaign.state[index] = DELIVERED if delivered else FAILED
+
+    def _backoff(self, attempt):
+        return random.uniform(0, min(self.max_delay, self.base_delay * (2 ** (attempt - 1))))
+
+    def _retry_later(self, campaign, indexes, attempt):
+        timer = threading.Timer(self._backoff(attempt), self._queue.put, args=(_Batch(campaign, indexes),))
+        timer.daemon = True
+        timer.start()
+
+    def _sender(self, gateway):
+        bucket = self._buckets.get(gateway.name)
+        while True:
+            batch = self._queue.get()
+            campaign, indexes = batch.campaign, batch.indexes
+            if bucket is not None:
+                bucket.acquire()
+            with campaign._lock:
+                campaign.attempts[indexes] += 1
+                campaign.requests += 1
+            with self._lock:
+                self.gateway_requests[gateway.name] += 1
+            numbers = [f"+{n}" for n in campaign.recipients[indexes].tolist()]
+            references = [campaign.reference(i) for i in indexes.tolist()]
+            try:
+                codes = np.asarray(gateway.send(campaign.parts, numbers, references), np.int64)
+                if codes.shape != indexes.shape:
+                    raise GatewayError(f"{gateway.name} answered {codes.size} of {len(indexes)} recipients")
+            except Exception as e:
+                with self._lock:
+                    self.gateway_errors[gateway.name] += 1
+                codes = np.full(len(indexes), RETRY, np.int64)
+                if not isinstance(e, GatewayError):
+                    log.warning(f"⚠️  Warning: SMS gateway {gateway.name} failed: {e}")
+
+            # An unknown code must not leave its recipient QUEUED forever
+            unknown = ~np.isin(codes, (ACCEPTED, RETRY, REJECTED))
+            if unknown.any():
+                log.warning(f"⚠️  Warning: SMS gateway {gateway.name} answered unknown codes "
+                            f"{sorted(set(codes[unknown].tolist()))}; retrying those recipients")
+                codes[unknown] = RETRY
+
+            with campaign._lock:
+                retry = indexes[codes == RETRY]
+                spent = campaign.attempts[retry] >= self.max_attempts
+                exhausted, retry = retry[spent], retry[~spent]
+                attempt = int(campaign.attempts[retry].max()) if len(retry) else 0
+                campaign._settle(indexes[codes == ACCEPTED], SENT)
+                campaign._settle(np.concatenate([indexes[codes == REJECTED], exhausted]), FAILED)
+                campaign.retried += len(retry)
+            if len(retry):
+                self._retry_later(campaign, retry, attempt)
+
+    def stats(self):
+        with self._lock:
+            self._prune()
+            campaigns = list(self._campaigns.values())
+            return {"queued_batches": self._queue.qsize(), "campaigns": len(campaigns),
+                    "gateway_requests": dict(self.gateway_requests),
+                    "gateway_errors": dict(self.gateway_errors)}
+
+
+class LocalGateway:
+    """
+    In-process stand-in for an SMS gateway, for tests and benchmarks.
+
+    Args:
+        name (str): Gateway name
+        max_concurrent (int): Requests it accepts at once
+        max_batch (int): Recipients per request
+        latency (callable): latency(rng) -> seconds per request (see
+            fake_gemini.latency_distribution); None for no delay
+        per_recipient_seconds (float): Extra time per recipient in a request
+        retry_rate (float): Share of recipients answered RETRY (throttled, network)
+        reject_rate (float): Share answered REJECTED (invalid or barred number)
+        error_rate (float): Share of whole requests failing with GatewayError
+        delivery_rate (float): Share of accepted messages with a positive receipt
+        on_receipt (callable): on_receipt(reference, delivered), usually
+            SmsDispatcher.delivery_report
+        receipt_delay (float): Seconds after a request before its receipts arrive
+        requests_per_minute (float): Rate limit the dispatcher applies, or None
+    """
+    def __init__(self, name="local", max_concurrent=8, max_batch=1000, latency=None,
+                 per_recipient_seconds=0.0, retry_rate=0.0, reject_rate=0.0, error_rate=0.0,
+                 delivery_rate=1.0, on_receipt=None, receipt_delay=0.05, requests_per_minute=None,
+                 seed=None):
+        self.name = name
+        self.max_concurrent = max_concurrent
+        self.max_batch = max_batch
+        self.latency = latency
+        self.per_recipient_seconds = per_recipient_seconds
+        self.retry_rate = retry_rate
+        self.reject_rate = reject_rate
+        self.error_rate = error_rate
+        self.delivery_rate = delivery_rate
+        self.on_receipt = on_receipt
+        self.receipt_delay = receipt_delay
+        self.requests_per_minute = requests_per_minute
+        self._random = random.Random(seed)
+        self._rng = np.random.default_rng(seed)
+        self._lock = threading.Lock()
+        self.requests = 0
+        self.messages = 0
+        self.segments = 0
+
+    def send(self, parts, numbers, references):
+        with self._lock:
+            delay = self.latency(self._random) if self.latency is not None else 0.0
+            failed = self._random.random() < self.error_rate
+            roll = self._rng.random(len(numbers))
+            receipts = self._rng.random(len(numbers)) < self.delivery_rate
+        delay += self.per_recipient_seconds * len(numbers)
+        if delay > 0:
+            time.sleep(delay)
+        if failed:
+            raise GatewayError(f"{self.name}: request failed")
+        codes = np.full(len(numbers), ACCEPTED, np.uint8)
+        codes[roll < self.retry_rate + self.reject_rate] = REJECTED
+        codes[roll < self.retry_rate] = RETRY
+        accepted = int((codes == ACCEPTED).sum())
+        with self._lock:
+            self.requests += 1
+            self.messages += accepted
+            self.segments += accepted * len(parts)
+        if self.on_receipt is not None:
+            # Receipts arrive after the request returns, as from a real gateway
+            accepted_refs = [(references[i], bool(receipts[i])) for i in np.flatnonzero(codes == ACCEPTED).tolist()]
+            timer = threading.Timer(self.receipt_delay, self._send_receipts, args=(accepted_refs,))
+            timer.daemon = True
+            timer.start()
+        return codes
+
+    def _send_receipts(self, receipts):
+        for reference, delivered in receipts:
+            self.on_receipt(reference, delivered)
+
+    def stats(self):
+        with self._lock:
+            return {"requests": self.requests, "messages": self.messages, "segments": self.segments}
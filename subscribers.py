@@ -0,0 +1,386 @@
+"""
+Array-backed registry of alert subscribers, indexed by geography and language.
+
+Alerts go to everyone registered in the affected area. At national scale
+that is millions of rows, so the registry stores no Python object per
+subscriber:
+
+- Columns are NumPy arrays: the phone number as a uint64 (E.164 digits
+  without the '+'), county and language as uint8 codes, sub-county and ward
+  as uint16 codes. Names live once each in small dictionaries.
+- Each categorical column has a secondary index: row ids sorted by code plus
+  one offset per code, so the rows of any county, sub-county, ward or
+  language are one contiguous slice. The ward index is ordered by language
+  within each ward, so "these wards, this language" is a list of slices
+  too. Other combined queries take the most selective index and filter the
+  remaining columns over that slice only.
+- On disk every column and index is a .npy file, memory-mapped when loaded,
+  so opening a 10-million-row registry reads almost nothing. Imports write a
+  new version directory and switch the CURRENT pointer atomically; other
+  worker processes pick the new version up on their next query.
+- Bulk import parses CSV in chunks and converts each column with vectorized
+  NumPy operations.
+
+CSV layout: msisdn,county,sub_county,ward,language (header optional).
+"""
+import csv
+import io
+import json
+import os
+import shutil
+import threading
+import time
+
+import numpy as np
+
+COLUMNS = ("msisdn", "county", "sub_county", "ward", "language")
+CATEGORIES = ("county", "sub_county", "ward", "language")
+_DTYPES = {"msisdn": np.uint64, "county": np.uint8, "sub_county": np.uint16,
+           "ward": np.uint16, "language": np.uint8}
+
+DEFAULT_COUNTRY_CODE = 254
+_CHUNK_BYTES = 32 * 1024 * 1024
+
+
+def parse_msisdns(values, country_code=DEFAULT_COUNTRY_CODE):
+    """
+    Phone number strings -> uint64 E.164 digits, vectorized.
+
+    '0712 345 678', '712345678', '+254712345678' and '254712345678' all give
+    254712345678. Unparseable or implausible numbers give 0.
+    """
+    text = np.asarray(values, dtype="U20")
+    for junk in ("+", " ", "-", "(", ")"):
+        text = np.char.replace(text, junk, "")
+    numbers = np.zeros(len(text), np.uint64)
+    digits = np.char.isdigit(text) & (np.char.str_len(text) > 0)
+    numbers[digits] = text[digits].astype(np.uint64)
+    # A leading 0 is lost in the integer, leaving a 9-digit national number
+    national = (numbers >= 10 ** 8) & (numbers < 10 ** 9)
+    numbers[national] += np.uint64(country_code * 10 ** 9)
+    numbers[(numbers < 10 ** 9) | (numbers >= 10 ** 15)] = 0
+    return numbers
+
+
+class SubscriberRegistry:
+    """
+    Subscribers as packed columns with per-category indexes.
+
+    Attributes:
+        path (str): Registry directory, or None for in-memory only
+        names (dict): Category -> list of names; a row's code indexes this list
+    """
+    def __init__(self, path=None):
+        self.path = path
+        self._lock = threading.RLock()
+        self._version = None
+        self._empty()
+
+    def _empty(self):
+        self.columns = {name: np.empty(0, _DTYPES[name]) for name in COLUMNS}
+        self.names = {category: [] for category in CATEGORIES}
+        self._codes = {category: {} for category in CATEGORIES}
+        # Empty but complete indexes, so queries on a never-imported registry find nothing
+        self._index = {category: (np.empty(0, np.int32), np.zeros(1, np.int64)) for category in CATEGORIES}
+        self._ward_language = np.zeros(1, np.int64)
+
+    def __len__(self):
+        self.refresh()
+        return len(self.columns["msisdn"])
+
+    # --- Persistence ---
+
+    def _current_version(self):
+        try:
+            with open(os.path.join(self.path, "CURRENT"), encoding="utf-8") as f:
+                return f.read().strip() or None
+        except OSError:
+            return None
+
+    def refresh(self):
+        """Maps the newest version on disk if another process (or import) wrote one."""
+        if self.path is None:
+            return
+        version = self._current_version()
+        with self._lock:
+            if version is None or version == self._version:
+                return
+            directory = os.path.join(self.path, version)
+            with open(os.path.join(directory, "meta.json"), encoding="utf-8") as f:
+                meta = json.load(f)
+            self.columns = {name: np.load(os.path.join(directory, f"{name}.npy"), mmap_mode="r")
+                            for name in COLUMNS}
+            self._index = {category: (np.load(os.path.join(directory, f"{category}.order.npy"), mmap_mode="r"),
+                                      np.load(os.path.join(directory, f"{category}.offsets.npy")))
+                           for category in CATEGORIES}
+            self._ward_language = np.load(os.path.join(directory, "ward.language_offsets.npy"))
+            self.names = meta["names"]
+            self._codes = {category: {name: code for code, name in enumerate(names)}
+                           for category, names in self.names.items()}
+            self._version = version
+
+    def _save(self):
+        # Caller holds the lock
+        version = f"v{time.time_ns()}"
+        directory = os.path.join(self.path, version)
+        os.makedirs(directory)
+        for name in COLUMNS:
+            np.save(os.path.join(directory, f"{name}.npy"), self.columns[name])
+        for category, (order, offsets) in self._index.items():
+            np.save(os.path.join(directory, f"{category}.order.npy"), order)
+            np.save(os.path.join(directory, f"{category}.offsets.npy"), offsets)
+        np.save(os.path.join(directory, "ward.language_offsets.npy"), self._ward_language)
+        with open(os.path.join(directory, "meta.json"), "w", encoding="utf-8") as f:
+            json.dump({"rows": len(self.columns["msisdn"]), "names": self.names}, f)
+        tmp_path = os.path.join(self.path, f"CURRENT.{os.getpid()}.tmp")
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            f.write(version)
+        os.replace(tmp_path, os.path.join(self.path, "CURRENT"))
+        previous, self._version = self._version, version
+        # Readers that still map the previous version keep their open files on POSIX
+        for entry in os.listdir(self.path):
+            if entry.startswith("v") and entry not in (version, previous):
+                shutil.rmtree(os.path.join(self.path, entry), ignore_errors=True)
+
+    # --- Import ---
+
+    def _encode(self, category, keys):
+        lookup, names = self._codes[category], self.names[category]
+        limit = np.iinfo(_DTYPES[category]).max
+        for key in sorted(set(keys) - lookup.keys()):
+            if len(names) > limit:
+                raise ValueError(f"Too many distinct {category} values (max {limit + 1})")
+            lookup[key] = len(names)
+            names.append(key)
+        return np.fromiter(map(lookup.__getitem__, keys), _DTYPES[category], count=len(keys))
+
+    def _chunk_columns(self, msisdn, county, sub_county, ward, language):
+        sub_county = [f"{c}/{s}" for c, s in zip(county, sub_county)]
+        ward = [f"{s}/{w}" for s, w in zip(sub_county, ward)]
+        return {
+            "msisdn": parse_msisdns(msisdn),
+            "county": self._encode("county", county),
+            "sub_county": self._encode("sub_county", sub_county),
+            "ward": self._encode("ward", ward),
+            "language": self._encode("language", [l.lower() or "en" for l in language]),
+        }
+
+    @staticmethod
+    def _split_chunk(text):
+        """
+        CSV text -> five column lists.
+
+        Plain rows (no quotes, exactly five fields) are split with two C-level
+        str operations; anything else goes through the csv module.
+        """
+        text = text.replace("\r", "")
+        lines = text.count("\n") + (not text.endswith("\n"))
+        fields = text.replace("\n", ",").split(",")
+        if text.endswith("\n"):
+            fields.pop()
+        if '"' in text or len(fields) != 5 * lines:
+            rows = [row[:5] for row in csv.reader(io.StringIO(text)) if len(row) >= 5]
+            fields = [field for row in rows for field in row]
+        if ", " in text or " ," in text:
+            fields = [field.strip() for field in fields]
+        return [fields[i::5] for i in range(5)]
+
+    def import_csv(self, source):
+        """
+        Adds or updates subscribers from CSV rows of msisdn,county,sub_county,ward,language.
+
+        A number already registered takes the new row's location and language.
+        Rows with an unparseable number are skipped.
+
+        Args:
+            source (str or file): Path or text file object
+
+        Returns:
+            dict: 'rows' read, 'skipped' rows, 'subscribers' now registered, 'seconds'
+        """
+        start = time.perf_counter()
+        close = isinstance(source, str)
+        f = open(source, encoding="utf-8", newline="") if close else source
+        read = skipped = 0
+        with self._lock:
+            self.refresh()
+            # Loaded into memory (not mapped), since the columns are about to be rebuilt
+            chunks = [{name: np.array(column) for name, column in self.columns.items()}]
+            try:
+                first = True
+                while True:
+                    # Whole lines only: a block, then the rest of its last line
+                    text = f.read(_CHUNK_BYTES)
+                    if not text:
+                        break
+                    if not text.endswith("\n"):
+                        text += f.readline()
+                    if first:
+                        text = text.lstrip("\ufeff")
+                    if first and text[:6].lower() == "msisdn":
+                        text = text[text.find("\n") + 1:]
+                    first = False
+                    columns = self._split_chunk(text)
+                    if not columns[0]:
+                        continue
+                    read += len(columns[0])
+                    columns = self._chunk_columns(*columns)
+                    valid = columns["msisdn"] > 0
+                    skipped += int((~valid).sum())
+                    chunks.append({name: column[valid] for name, column in columns.items()})
+            finally:
+                if close:
+                    f.close()
+            self._replace({name: np.concatenate([chunk[name] for chunk in chunks]) for name in COLUMNS})
+            if self.path is not None:
+                self._save()
+            total = len(self.columns["msisdn"])
+        return {"rows": read, "skipped": skipped, "subscribers": total,
+                "seconds": time.perf_counter() - start}
+
+    def add(self, rows):
+        """Adds (msisdn, county, sub_county, ward, language) tuples; see import_csv()."""
+        buffer = io.StringIO()
+        csv.writer(buffer).writerows(rows)
+        buffer.seek(0)
+        return self.import_csv(buffer)
+
+    def _replace(self, columns):
+        # Caller holds the lock. Later rows for a number win.
+        numbers = columns["msisdn"]
+        _, last = np.unique(numbers[::-1], return_index=True)
+        keep = np.sort(len(numbers) - 1 - last)
+        self.columns = {name: np.ascontiguousarray(column[keep]) for name, column in columns.items()}
+        self._index = {category: self._build_index(self.columns[category], len(self.names[category]))
+                       for category in ("county", "sub_county", "language")}
+        # Wards ordered by (ward, language): the per-ward offsets are every
+        # n-th (ward, language) offset
+        languages = max(1, len(self.names["language"]))
+        keys = self.columns["ward"].astype(np.int64) * languages + self.columns["language"]
+        order, self._ward_language = self._build_index(keys, len(self.names["ward"]) * languages)
+        self._index["ward"] = (order, self._ward_language[::languages].copy())
+
+    @staticmethod
+    def _build_index(codes, size):
+        order = np.argsort(codes, kind="stable").astype(np.int32)
+        offsets = np.zeros(size + 1, np.int64)
+        np.cumsum(np.bincount(codes, minlength=size), out=offsets[1:])
+        return order, offsets
+
+    # --- Queries ---
+
+    def _code(self, category, key):
+        return self._codes[category].get(key)
+
+    def _rows_for(self, category, codes):
+        if category == "ward+language":
+            order, offsets = self._index["ward"][0], self._ward_language
+        else:
+            order, offsets = self._index[category]
+        slices = [order[offsets[c]:offsets[c + 1]] for c in codes]
+        if not slices:
+            return np.empty(0, np.int32)
+        return slices[0] if len(slices) == 1 else np.concatenate(slices)
+
+    def select(self, county=None, sub_county=None, wards=None, languages=None):
+        """
+        Row ids of subscribers matching every given filter.
+
+        Args:
+            county (str): County name
+            sub_county (str): Sub-county name (within `county`)
+            wards (list): (county, sub_county, ward) tuples; any of them matches
+            languages (list): Language codes, e.g. ["sw"]; any of them matches
+
+        Returns:
+            numpy.ndarray: int32 row ids, for numbers() or count()
+        """
+        self.refresh()
+        with self._lock:
+            filters = []
+            if county is not None:
+                filters.append(("county", [self._code("county", county)]))
+            if sub_county is not None:
+                filters.append(("sub_county", [self._code("sub_county", f"{county}/{sub_county}")]))
+            if wards is not None:
+                filters.append(("ward", [self._code("ward", "/".join(w)) for w in wards]))
+            if languages is not None:
+                filters.append(("language", [self._code("language", l) for l in languages]))
+            if not filters:
+                return np.arange(len(self.columns["msisdn"]), dtype=np.int32)
+            filters = [(category, [c for c in codes if c is not None]) for category, codes in filters]
+            if wards is not None and languages is not None:
+                # One slice per (ward, language) pair instead of filtering each ward's rows
+                ward_codes, language_codes = filters.pop(-2)[1], filters.pop(-1)[1]
+                width = max(1, len(self.names["language"]))
+                filters.append(("ward+language", [w * width + l for w in ward_codes for l in language_codes]))
+
+            # Start from the smallest candidate set, then filter the others over it
+            def size(item):
+                category, codes = item
+                offsets = self._ward_language if category == "ward+language" else self._index[category][1]
+                return sum(int(offsets[c + 1] - offsets[c]) for c in codes)
+
+            filters.sort(key=size)
+            category, codes = filters[0]
+            rows = self._rows_for(category, codes)
+            for category, codes in filters[1:]:
+                if not len(rows):
+                    break
+                values = self.columns[category][rows]
+                if len(codes) == 1:
+                    rows = rows[values == codes[0]]
+                else:
+                    rows = rows[np.isin(values, np.asarray(codes, _DTYPES[category]))]
+            return rows
+
+    def count(self, **filters):
+        return len(self.select(**filters))
+
+    def numbers(self, rows):
+        """E.164 strings ('+254...') for row ids."""
+        with self._lock:
+            return [f"+{n}" for n in self.columns["msisdn"][rows].tolist()]
+
+    def msisdns(self, rows):
+        """E.164 digits for row ids, as a uint64 array (see sms_dispatch.msisdn_array)."""
+        with self._lock:
+            return self.columns["msisdn"][rows].astype(np.uint64)
+
+    def wards(self, county=None):
+        """(county, sub_county, ward) tuples registered, optionally within one county."""
+        self.refresh()
+        with self._lock:
+            triples = [tuple(name.split("/", 2)) for name in self.names["ward"]]
+        return [t for t in triples if county is None or t[0] == county]
+
+    def stats(self):
+        """
+        Returns:
+            dict: 'subscribers', bytes of columns and indexes, and bytes per subscriber
+        """
+        self.refresh()
+        with self._lock:
+            rows = len(self.columns["msisdn"])
+            column_bytes = sum(column.nbytes for column in self.columns.values())
+            index_bytes = (sum(order.nbytes + offsets.nbytes for order, offsets in self._index.values())
+                           + self._ward_language.nbytes)
+            return {
+                "subscribers": rows,
+                "column_bytes": column_bytes,
+                "index_bytes": index_bytes,
+                "bytes_per_subscriber": (column_bytes + index_bytes) / rows if rows else 0.0,
+                **{f"{category}_values": len(names) for category, names in self.names.items()},
+            }
+
+
+
+if __name__ == "__main__":
+    # python subscribers.py subscribers.csv [registry_dir]
+    import sys
+    _default = os.path.join(os.environ.get("ASAL_DATA_DIR", os.path.join(os.path.dirname(os.path.abspath(__file__)),
+                                                                          ".asal_data")), "subscribers")
+    registry = SubscriberRegistry(sys.argv[2] if len(sys.argv) > 2 else _default)
+    result = registry.import_csv(sys.argv[1])
+    print(f"📇 Imported {result['rows']:,} rows ({result['skipped']:,} skipped) in {result['seconds']:.1f}s; "
+          f"{result['subscribers']:,} subscribers registered in {registry.path}.")
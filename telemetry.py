@@ -0,0 +1,344 @@
+"""
+Spans, metrics and logging for ASAL-Guardian.
+
+- Spans: `with span("model_call", "guardian"):` times a block into the
+  asal_span_seconds histogram, labelled by span and target, and counts
+  exceptions leaving it in asal_span_errors_total. Model resolution, every
+  agent call, JSON parsing and every workflow stage are spans, so
+  /metrics shows where a slow run spent its time.
+- Metrics: counters and histograms live in one process-wide registry.
+  Components that already keep their own counters (response cache, Gemini
+  client, job manager...) are read at scrape time through collectors.
+  render() writes the Prometheus text exposition format.
+- Logging: get_logger() returns a stdlib logger under "asal". Records go
+  onto a queue and one background thread writes them to stdout in
+  batches. Request threads never block on stdout, and a multi-line
+  message is never interleaved with another thread's. Each record is
+  formatted with a timestamp, level and logger name before it is queued.
+  ASAL_LOG_LEVEL sets the level (default INFO) and ASAL_LOG_FORMAT the
+  logging.Formatter format string.
+
+Design Decision: No prometheus_client dependency
+- The exposition format is a few lines of text, and the registry here
+  needs neither multiprocess mode nor a push gateway. Values are per
+  process: with several gunicorn workers, each scrape reports the worker
+  that answered it (see asal_process_start_time_seconds).
+"""
+import atexit
+import bisect
+import contextlib
+import contextvars
+import logging
+import logging.handlers
+import os
+import queue
+import sys
+import threading
+import time
+
+# Upper bounds in seconds; covers a cached lookup up to a slow model call
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+
+# Log records written per stdout write
+_LOG_BATCH = 256
+LOG_FORMAT = "%(asctime)s %(levelname)s %(name)s %(message)s"
+
+_PROCESS_START = time.time()
+
+
+def _escape(value):
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_labels(labels):
+    if not labels:
+        return ""
+    return "{" + ",".join(f'{name}="{_escape(value)}"' for name, value in labels) + "}"
+
+
+def _format_value(value):
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class Counter:
+    """A monotonically increasing count per label combination."""
+    kind = "counter"
+
+    def __init__(self, name, help_text, labels=()):
+        self.name = name
+        self.help = help_text
+        self.labels = tuple(labels)
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def inc(self, amount=1, **labels):
+        key = tuple(str(labels.get(name, "")) for name in self.labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def value(self, **labels):
+        key = tuple(str(labels.get(name, "")) for name in self.labels)
+        with self._lock:
+            return self._values.get(key, 0)
+
+    def samples(self):
+        with self._lock:
+            values = dict(self._values)
+        return [(self.name, list(zip(self.labels, key)), value) for key, value in sorted(values.items())]
+
+
+class Histogram:
+    """Observations bucketed by upper bound, with their count and sum, per label combination."""
+    kind = "histogram"
+
+    def __init__(self, name, help_text, labels=(), buckets=DEFAULT_BUCKETS):
+        self.name = name
+        self.help = help_text
+        self.labels = tuple(labels)
+        self.buckets = tuple(sorted(buckets))
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def observe(self, value, **labels):
+        key = tuple(str(labels.get(name, "")) for name in self.labels)
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            counts = self._values.get(key)
+            if counts is None:
+                # One count per bucket plus +Inf, then the sum
+                counts = self._values[key] = [0] * (len(self.buckets) + 1) + [0.0]
+            counts[index] += 1
+            counts[-1] += value
+
+    def snapshot(self, **labels):
+        """{'count', 'sum', 'buckets': [(upper bound, cumulative count), ...]} for one label set."""
+        key = tuple(str(labels.get(name, "")) for name in self.labels)
+        with self._lock:
+            counts = list(self._values.get(key, [0] * (len(self.buckets) + 1) + [0.0]))
+        cumulative, total = [], 0
+        for bound, count in zip(self.buckets + (float("inf"),), counts[:-1]):
+            total += count
+            cumulative.append((bound, total))
+        return {"count": total, "sum": counts[-1], "buckets": cumulative}
+
+    def samples(self):
+        with self._lock:
+            values = {key: list(counts) for key, counts in self._values.items()}
+        samples = []
+        for key, counts in sorted(values.items()):
+            labels = list(zip(self.labels, key))
+            total = 0
+            for bound, count in zip(self.buckets + (float("inf"),), counts[:-1]):
+                total += count
+                samples.append((f"{self.name}_bucket", labels + [("le", _format_value(float(bound)))], total))
+            samples.append((f"{self.name}_count", labels, total))
+            samples.append((f"{self.name}_sum", labels, counts[-1]))
+        return samples
+
+
+class Registry:
+    """Metrics and scrape-time collectors of one process."""
+    def __init__(self):
+        self._metrics = {}
+        self._collectors = []
+        self._lock = threading.Lock()
+
+    def _add(self, metric):
+        with self._lock:
+            existing = self._metrics.get(metric.name)
+            if existing is not None:
+                return existing
+            self._metrics[metric.name] = metric
+            return metric
+
+    def counter(self, name, help_text, labels=()):
+        """Returns the counter `name`, creating it on first use."""
+        return self._add(Counter(name, help_text, labels))
+
+    def histogram(self, name, help_text, labels=(), buckets=DEFAULT_BUCKETS):
+        """Returns the histogram `name`, creating it on first use."""
+        return self._add(Histogram(name, help_text, labels, buckets))
+
+    def register_collector(self, collect):
+        """
+        Adds a scrape-time source of metrics.
+
+        Args:
+            collect (callable): collect() -> [(name, kind, help, [(labels dict, value), ...]), ...],
+                kind being "counter" or "gauge"; an exception skips this collector
+        """
+        with self._lock:
+            self._collectors.append(collect)
+
+    def render(self):
+        """All metrics in the Prometheus text exposition format (version 0.0.4)."""
+        lines = []
+        with self._lock:
+            metrics = list(self._metrics.values())
+            collectors = list(self._collectors)
+        for metric in metrics:
+            lines.append(f"# HELP {metric.name} {metric.help}")
+            lines.append(f"# TYPE {metric.name} {metric.kind}")
+            for name, labels, value in metric.samples():
+                lines.append(f"{name}{_format_labels(labels)} {_format_value(value)}")
+        families = [("asal_process_start_time_seconds", "gauge", "Start time of this process",
+                     [({"pid": os.getpid()}, _PROCESS_START)])]
+        for collect in collectors:
+            try:
+                families.extend(collect())
+            except Exception as e:
+                get_logger("telemetry").warning(f"⚠️  Warning: Metrics collector failed: {e}")
+        for name, kind, help_text, samples in families:
+            lines.append(f"# HELP {name} {help_text}")
+            lines.append(f"# TYPE {name} {kind}")
+            for labels, value in samples:
+                if value is None:
+                    continue
+                lines.append(f"{name}{_format_labels(sorted(labels.items()))} {_format_value(value)}")
+        return "\n".join(lines) + "\n"
+
+
+registry = Registry()
+
+SPAN_SECONDS = registry.histogram("asal_span_seconds", "Duration of instrumented operations",
+                                  labels=("span", "target"))
+SPAN_ERRORS = registry.counter("asal_span_errors_total", "Instrumented operations that raised",
+                               labels=("span", "target", "error"))
+
+_current_span = contextvars.ContextVar("asal_span", default=None)
+
+
+@contextlib.contextmanager
+def span(name, target=""):
+    """
+    Times the enclosed block as one `name` span on `target` (an agent,
+    stage or schema). Spans nest: the debug log shows the path from the
+    outermost span.
+    """
+    parent = _current_span.get()
+    path = f"{parent}/{name}" if parent else name
+    token = _current_span.set(path)
+    start = time.perf_counter()
+    try:
+        yield
+    except BaseException as e:
+        SPAN_ERRORS.inc(span=name, target=target, error=type(e).__name__)
+        raise
+    finally:
+        elapsed = time.perf_counter() - start
+        _current_span.reset(token)
+        SPAN_SECONDS.observe(elapsed, span=name, target=target)
+        log = get_logger("telemetry")
+        if log.isEnabledFor(logging.DEBUG):
+            log.debug(f"⏱️  {path}{f' [{target}]' if target else ''} {elapsed * 1000:.1f}ms")
+
+
+def render():
+    return registry.render()
+
+
+# --- Logging ---
+
+class _BatchWriter:
+    """Drains queued log records to the current sys.stdout in batches."""
+    def __init__(self):
+        self.queue = queue.SimpleQueue()
+        self.dropped = 0
+        self._pid = None
+        self._thread = None
+        self._lock = threading.Lock()
+
+    def ensure_running(self):
+        # A forked worker inherits the parent's writer state but not its thread
+        if self._pid == os.getpid():
+            return
+        with self._lock:
+            if self._pid != os.getpid():
+                self._thread = threading.Thread(target=self._run, name="log-writer", daemon=True)
+                self._thread.start()
+                self._pid = os.getpid()
+
+    def _run(self):
+        while True:
+            batch = [self.queue.get()]
+            while len(batch) < _LOG_BATCH:
+                try:
+                    batch.append(self.queue.get_nowait())
+                except queue.Empty:
+                    break
+            # QueueHandler.prepare() already replaced each message with its formatted line
+            lines = [item.getMessage() for item in batch if isinstance(item, logging.LogRecord)]
+            if lines:
+                try:
+                    stream = sys.stdout
+                    stream.write("\n".join(lines) + "\n")
+                    stream.flush()
+                except Exception:
+                    self.dropped += len(lines)
+            # Markers: an Event is set once everything before it is written; None stops
+            for item in batch:
+                if isinstance(item, threading.Event):
+                    item.set()
+            if None in batch:
+                return
+
+    def flush(self, timeout=2.0):
+        if self._pid != os.getpid():
+            return
+        marker = threading.Event()
+        self.queue.put(marker)
+        marker.wait(timeout)
+
+    def close(self, timeout=2.0):
+        """Writes what is queued and stops the thread."""
+        if self._pid != os.getpid() or self._thread is None:
+            return
+        self.queue.put(None)
+        self._thread.join(timeout)
+        self._pid = None
+
+
+class _QueueHandler(logging.handlers.QueueHandler):
+    def __init__(self, writer):
+        super().__init__(writer.queue)
+        self.writer = writer
+
+    def enqueue(self, record):
+        self.writer.ensure_running()
+        super().enqueue(record)
+
+
+_writer = _BatchWriter()
+_configure_lock = threading.Lock()
+_configured = False
+
+
+def _configure():
+    global _configured
+    with _configure_lock:
+        if _configured:
+            return
+        root = logging.getLogger("asal")
+        level = os.environ.get("ASAL_LOG_LEVEL", "INFO").upper()
+        root.setLevel(getattr(logging, level, logging.INFO))
+        # Formatted in the calling thread, so timestamps and tracebacks are those of the call
+        handler = _QueueHandler(_writer)
+        handler.setFormatter(logging.Formatter(os.environ.get("ASAL_LOG_FORMAT", LOG_FORMAT)))
+        root.addHandler(handler)
+        root.propagate = False
+        atexit.register(_writer.close)
+        _configured = True
+
+
+def get_logger(name):
+    """The 'asal.<name>' logger, writing through the buffered stdout queue."""
+    if not _configured:
+        _configure()
+    return logging.getLogger(f"asal.{name}")
+
+
+def flush_logs(timeout=2.0):
+    """Waits until the records logged so far have been written, e.g. before a CLI prints results."""
+    _writer.flush(timeout)
@@ -0,0 +1,18 @@
+import os
+import sys
+import tempfile
+
+# The modules under test live at the repository root
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+# Tests that import main (and app) get scratch caches, no presentation pauses
+# and no background bulletin ingest or template warming
+_scratch = tempfile.mkdtemp(prefix="asal-tests-")
+os.environ.setdefault("ASAL_CACHE_DIR", os.path.join(_scratch, "cache"))
+os.environ.setdefault("ASAL_DATA_DIR", os.path.join(_scratch, "data"))
+os.environ.setdefault("GOOGLE_API_KEY", "test")
+os.environ.setdefault("ASAL_LOG_LEVEL", "WARNING")
+os.environ.setdefault("ASAL_THINKING_PAUSE_SECONDS", "0")
+os.environ.setdefault("ASAL_FIELD_REPORT_DELAY_SECONDS", "0")
+os.environ.setdefault("ASAL_WARM_BULLETINS", "0")
+os.environ.setdefault("ASAL_WARM_TEMPLATES", "0")
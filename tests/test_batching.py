@@ -0,0 +1,66 @@
+import concurrent.futures
+import json
+import threading
+
+import pytest
+
+from batching import BatchError, Batcher, batch_prompt, batch_schema, split_reply
+
+
+def _submit_all(batcher, payloads):
+    with concurrent.futures.ThreadPoolExecutor(max_workers=len(payloads)) as pool:
+        futures = [pool.submit(batcher.submit, payload, 5) for payload in payloads]
+        return [future.result() for future in futures]
+
+
+def test_split_reply_and_schema():
+    schema = batch_schema({"type": "object", "properties": {"vci": {"type": "number"}}, "required": ["vci"]})
+    assert schema["properties"]["items"]["items"]["required"] == ["id", "vci"]
+    reply = json.dumps({"items": [{"id": "0", "vci": 1.0}, {"id": 1, "vci": 2.0}, "junk"]})
+    assert split_reply(reply) == {"0": {"vci": 1.0}, "1": {"vci": 2.0}}
+    assert "### id=0\na" in batch_prompt("Task.", [("0", "a")])
+
+
+def test_remainder_is_requeued_after_a_partial_reply():
+    calls = []
+    lock = threading.Lock()
+
+    def send(items):
+        with lock:
+            calls.append([payload for _, payload in items])
+            first = len(calls) == 1
+        # The first call answers only its first half
+        answered = items[:len(items) // 2] if first else items
+        return {item_id: {"echo": payload} for item_id, payload in answered}
+
+    batcher = Batcher(send, max_items=4, max_wait=1.0)
+    payloads = ["a", "b", "c", "d"]
+    results = _submit_all(batcher, payloads)
+
+    assert results == [{"echo": p} for p in payloads]
+    assert sorted(calls[0]) == payloads
+    # Only the unanswered items went out again, renumbered from 0
+    assert sorted(calls[1]) == sorted(set(payloads) - set(calls[0][:2]))
+    stats = batcher.stats()
+    assert stats["requeued"] == 2
+    assert stats["items_done"] == 4
+    assert stats["batches"] == 2
+    assert stats["failed"] == 0
+
+
+def test_item_fails_after_max_attempts():
+    batcher = Batcher(lambda items: {}, max_items=1, max_wait=0, max_attempts=2)
+    with pytest.raises(BatchError, match="missing from 2"):
+        batcher.submit("lost", timeout=5)
+    assert batcher.stats()["requeued"] == 1
+    assert batcher.stats()["failed"] == 1
+
+
+def test_failed_call_fails_every_item():
+    def send(items):
+        raise RuntimeError("quota")
+
+    batcher = Batcher(send, max_items=2, max_wait=0.2)
+    with pytest.raises(BatchError, match="quota"):
+        _submit_all(batcher, ["a", "b"])
+    assert batcher.stats()["failed"] == 2
@@ -0,0 +1,60 @@
+import os
+
+import pytest
+
+import bulletin_ingest
+from bulletin_ingest import BulletinLibrary
+
+PAGES = [
+    (0, "DROUGHT EARLY WARNING BULLETIN FOR OCTOBER 2025\nGARISSA COUNTY\n"
+        "• The VCI-3Month was 18.5, in the extreme vegetation deficit band.\n"
+        "• Households trek 12km to water.\n• Schools reopened.\n"),
+    (1, "Livestock prices remained low.\n• Goats sold at KES 2,500.\n"),
+]
+
+
+@pytest.fixture
+def parses(monkeypatch):
+    calls = []
+
+    def fake_iter_pages(path, workers=None):
+        calls.append(path)
+        with open(path, "rb") as f:
+            if f.read(4) != b"%PDF":
+                raise ValueError("not a PDF")
+        return iter(PAGES)
+
+    monkeypatch.setattr(bulletin_ingest, "HAS_PYPDF", True)
+    monkeypatch.setattr(bulletin_ingest, "iter_pages", fake_iter_pages)
+    return calls
+
+
+def test_bulletin_keeps_condensed_sections_not_pages(tmp_path, parses):
+    path = tmp_path / "bulletin.pdf"
+    path.write_bytes(b"%PDF good")
+    library = BulletinLibrary([str(path)], str(tmp_path / "cache"))
+    bulletin = library.ingest(str(path))
+    assert "pages" not in bulletin and bulletin["page_count"] == 2
+    assert bulletin["period"] == "2025-10"
+    text, _ = library.latest_section("Garissa")
+    assert "18.5" in text and "Goats sold at KES 2,500." in text
+    assert "Schools reopened." not in text
+    # A second library reads the disk cache instead of parsing
+    assert BulletinLibrary([str(path)], str(tmp_path / "cache")).counties() == ["Garissa"]
+    assert len(parses) == 1
+
+
+def test_failed_parse_is_not_retried_until_the_file_changes(tmp_path, parses):
+    path = tmp_path / "broken.pdf"
+    path.write_bytes(b"garbage")
+    library = BulletinLibrary([str(path)], str(tmp_path / "cache"))
+    for _ in range(3):
+        assert library.counties() == []
+    assert len(parses) == 1
+    with pytest.raises(ValueError):
+        library.ingest(str(path))
+
+    path.write_bytes(b"%PDF fixed")
+    os.utime(path, ns=(0, os.stat(path).st_mtime_ns + 1_000_000))
+    assert library.counties() == ["Garissa"]
+    assert len(parses) == 2
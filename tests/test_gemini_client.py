@@ -0,0 +1,84 @@
+import threading
+import time
+
+import pytest
+
+from fake_gemini import FakeQuotaError, FakeServerError
+from gemini_client import BATCH, INTERACTIVE, GeminiClient, GeminiError, TokenBucket
+
+
+def test_zero_rate_is_unlimited():
+    bucket = TokenBucket(0)
+    assert all(bucket.acquire(timeout=1) < 0.1 for _ in range(100))
+    assert bucket.saturation() == 0.0
+
+
+def test_negative_rate_is_rejected():
+    with pytest.raises(ValueError):
+        TokenBucket(-1)
+
+
+def test_retry_hint_is_honoured_and_pauses_the_bucket():
+    sleeps = []
+    client = GeminiClient(sleep=sleeps.append)
+    attempts = []
+
+    def call():
+        attempts.append(time.monotonic())
+        if len(attempts) == 1:
+            raise FakeQuotaError(retry_after=0.2)
+        return "ok"
+
+    assert client.call("models/a", call) == "ok"
+    assert sleeps and sleeps[0] >= 0.2
+    # The second attempt waited for the paused bucket, not only the (skipped) sleep
+    assert attempts[1] - attempts[0] >= 0.19
+    assert client.stats() == {"calls": 2, "retries": 1, "failures": 0, "throttled": 1}
+
+
+def test_gemini_error_after_max_attempts():
+    client = GeminiClient(max_attempts=3, sleep=lambda seconds: None)
+    attempts = []
+
+    def call():
+        attempts.append(1)
+        raise FakeServerError()
+
+    with pytest.raises(GeminiError) as raised:
+        client.call("models/a", call)
+    assert raised.value.attempts == 3 and len(attempts) == 3
+    assert isinstance(raised.value.cause, FakeServerError)
+
+
+def test_permanent_errors_are_not_retried():
+    client = GeminiClient(sleep=lambda seconds: None)
+    attempts = []
+
+    def call():
+        attempts.append(1)
+        raise ValueError("invalid argument")
+
+    with pytest.raises(GeminiError) as raised:
+        client.call("models/a", call)
+    assert raised.value.attempts == 1 and len(attempts) == 1
+    assert client.stats()["retries"] == 0
+
+
+def test_interactive_callers_get_tokens_before_batch_callers():
+    client = GeminiClient(default_rpm=600)
+    bucket = client.bucket("models/a")
+    while bucket.saturation() < 0.99:
+        bucket.acquire()
+    order = []
+
+    def caller(priority, label):
+        client.call("models/a", lambda: order.append(label), priority=priority)
+
+    batch = threading.Thread(target=caller, args=(BATCH, "batch"))
+    batch.start()
+    time.sleep(0.02)
+    interactive = threading.Thread(target=caller, args=(INTERACTIVE, "interactive"))
+    interactive.start()
+    batch.join(5)
+    interactive.join(5)
+    assert order == ["interactive", "batch"]
@@ -0,0 +1,45 @@
+import numpy as np
+import pytest
+
+from guardian_rules import classify, classify_arrays, label_arrays
+
+
+def metrics(vci=40.0, water=5.0, goat=6000.0, maize=100.0):
+    return {"vci": vci, "water_distance_km": water, "goat_price_kes": goat, "maize_price_kes": maize}
+
+
+@pytest.mark.parametrize("vci, water, phase", [
+    (19.9, 5.0, "ALARM"),
+    (20.0, 5.0, "ALERT"),
+    (35.0, 5.0, "ALERT"),
+    (35.1, 5.0, "NORMAL"),
+    (50.0, 10.0, "NORMAL"),
+    (50.0, 10.1, "ALARM"),
+    (None, 12.0, "ALARM"),
+    (None, 5.0, "UNKNOWN"),
+])
+def test_drought_phase_boundaries(vci, water, phase):
+    assert classify(metrics(vci=vci, water=water))["drought_phase"] == phase
+
+
+@pytest.mark.parametrize("goat, maize, status", [
+    (2999.0, 100.0, "CRISIS"),
+    (3000.0, 100.0, "STRESSED"),
+    (5000.0, 100.0, "STRESSED"),
+    (5001.0, 100.0, "STABLE"),
+    (5000.0, 0.0, "UNKNOWN"),
+    (None, 100.0, "UNKNOWN"),
+])
+def test_economic_status_boundaries(goat, maize, status):
+    assert classify(metrics(goat=goat, maize=maize))["economic_status"] == status
+
+
+def test_vectorized_pass_matches_single_records():
+    vci = np.array([10.0, 25.0, 60.0, np.nan])
+    water = np.array([2.0, 2.0, 15.0, 2.0])
+    goat = np.array([2000.0, 4000.0, 6000.0, 4000.0])
+    maize = np.array([100.0, 100.0, 100.0, np.nan])
+    labels = label_arrays(classify_arrays(vci, water, goat, maize))
+    assert labels["drought_phase"].tolist() == ["ALARM", "ALERT", "ALARM", "UNKNOWN"]
+    assert labels["economic_status"].tolist() == ["CRISIS", "STRESSED", "STABLE", "UNKNOWN"]
+    assert classify(metrics(goat=4550.0, maize=100.0))["terms_of_trade"] == 45.5
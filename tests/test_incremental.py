@@ -0,0 +1,53 @@
+import fake_gemini
+from incremental import IncrementalState, parse_tolerances, within_tolerance
+from schemas import Analysis, Artifacts
+
+
+def _report(vci):
+    return (f"Field Report - Testland County\nVegetation Index (3-month) is currently at {vci}.\n"
+            "Pastoralists reporting trekking 12km to water sources.\n"
+            "Goat prices have dropped to 2500 KES at the local market.\n"
+            "Maize prices are stable at 100 KES per kg.\n")
+
+
+def test_within_tolerance():
+    tolerances = parse_tolerances("vci=1")
+    assert tolerances["vci"] == 1.0
+    assert within_tolerance({"vci": 20.0}, {"vci": 20.8}, {"vci": 1.0})
+    assert not within_tolerance({"vci": 20.0}, {"vci": 21.5}, {"vci": 1.0})
+    assert not within_tolerance({"vci": 20.0}, {"vci": None}, {"vci": 1.0})
+
+
+def test_moved_metrics_are_not_reusable():
+    state = IncrementalState({"vci": 0.5})
+    analysis = Analysis.from_dict({"drought_phase": "ALARM", "economic_status": "CRISIS",
+                                   "terms_of_trade": 25.0, "reasoning": "r"})
+    state.remember("Testland", {"vci": 20.0}, analysis, Artifacts(sms_alert="VCI 20.0", governor_brief="b"))
+    assert state.reusable_analysis("Testland", {"vci": 20.3}) is not None
+    assert state.reusable_analysis("Testland", {"vci": 12.0}) is None
+
+
+def test_moved_metrics_rewrite_artifacts_with_same_phase(monkeypatch):
+    import main
+
+    fake_gemini.install(main)
+    monkeypatch.setattr(main, "responder_templates", None)
+    main.incremental_state.forget("Testland")
+    stages = []
+
+    def on_stage(stage, status, output=None):
+        stages.append((stage, status))
+
+    monkeypatch.setitem(main.FIELD_REPORTS, "Testland", _report(18.5))
+    main.run_agent_workflow("Testland", on_stage=on_stage)
+    first = main.incremental_state._baseline("Testland")
+
+    stages.clear()
+    monkeypatch.setitem(main.FIELD_REPORTS, "Testland", _report(9.5))
+    main.run_agent_workflow("Testland", on_stage=on_stage)
+    second = main.incremental_state._baseline("Testland")
+
+    assert first.analysis.drought_phase == second.analysis.drought_phase
+    assert ("responder", "reused") not in stages
+    assert ("responder", "done") in stages
+    assert second.metrics["vci"] == 9.5
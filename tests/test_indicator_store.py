@@ -0,0 +1,15 @@
+from indicator_store import IndicatorStore
+
+
+def test_repeated_new_key_before_a_query_keeps_the_latest(tmp_path):
+    store = IndicatorStore(str(tmp_path / "indicators.bin"))
+    store.append("Garissa", "2024-01", {"vci": 10.0})
+    store.append("Wajir", "2024-01", {"vci": 20.0})
+    store.append("Garissa", "2024-01", {"vci": 11.0})
+    store.append("Garissa", "2023-12", {"vci": 9.0})
+    assert store.history("Garissa")["months"] == ["2023-12", "2024-01"]
+    assert store.get("Garissa", "2024-01")["vci"] == 11.0
+    store.append("Garissa", "2024-01", {"vci": 12.0})
+    assert store.get("Garissa", "2024-01")["vci"] == 12.0
+    assert store.stats()["keys"] == 3
+    assert IndicatorStore(store.path).get("Wajir", "2024-01")["vci"] == 20.0
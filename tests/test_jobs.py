@@ -0,0 +1,67 @@
+import threading
+import time
+
+import pytest
+
+from jobs import FAILED, SUCCEEDED, JobManager, QueueFullError
+
+
+def test_submit_refuses_beyond_max_pending():
+    release = threading.Event()
+    manager = JobManager(max_workers=1, max_pending=2)
+    jobs = [manager.submit(lambda on_stage: release.wait(5)) for _ in range(2)]
+    with pytest.raises(QueueFullError):
+        manager.submit(lambda on_stage: None)
+    release.set()
+    for job in jobs:
+        assert job.done.wait(5)
+    # Finished jobs free their slots
+    assert manager.submit(lambda on_stage: None).done.wait(5)
+
+
+def test_stage_progress_and_result():
+    def run(on_stage, county):
+        on_stage("sentinel", "running")
+        on_stage("sentinel", "done", county)
+        return {"county": county}
+
+    manager = JobManager()
+    job = manager.submit(run, stages=("sentinel", "guardian"), county="Garissa")
+    assert job.done.wait(5)
+    body = manager.get(job.id).to_dict()
+    assert body["status"] == SUCCEEDED
+    assert body["result"] == {"county": "Garissa"}
+    assert body["stages"]["sentinel"]["output"] == "Garissa"
+    assert body["stages"]["guardian"]["status"] == "pending"
+
+
+def test_failed_job_keeps_its_error():
+    def run(on_stage):
+        raise ValueError("no field report")
+
+    manager = JobManager()
+    job = manager.submit(run)
+    assert job.done.wait(5)
+    assert job.status == FAILED and job.error == "no field report"
+
+
+def test_finished_jobs_are_pruned_by_count_and_age():
+    manager = JobManager(max_retained=2, retention_seconds=0.1)
+    jobs = [manager.submit(lambda on_stage: None) for _ in range(4)]
+    for job in jobs:
+        assert job.done.wait(5)
+    assert manager.get(jobs[0].id) is None
+    assert manager.get(jobs[3].id) is not None
+    assert manager.stats()["retained"] == 2
+    time.sleep(0.15)
+    assert manager.get(jobs[3].id) is None
+    assert manager.stats()["retained"] == 0
+
+
+def test_unfinished_jobs_are_never_pruned():
+    release = threading.Event()
+    manager = JobManager(max_retained=0, retention_seconds=0)
+    job = manager.submit(lambda on_stage: release.wait(5))
+    assert manager.get(job.id) is job
+    release.set()
+    assert job.done.wait(5)
@@ -0,0 +1,83 @@
+import threading
+import time
+
+from model_registry import ModelRegistry
+
+
+class CountingLister:
+    def __init__(self, *listings, delay=0.0):
+        self.listings = list(listings)
+        self.delay = delay
+        self.calls = 0
+        self.started = threading.Event()
+        self.release = threading.Event()
+        self.release.set()
+
+    def __call__(self):
+        self.calls += 1
+        self.started.set()
+        self.release.wait(5)
+        time.sleep(self.delay)
+        return self.listings[min(self.calls, len(self.listings)) - 1]
+
+
+def test_snapshot_is_cached_within_ttl():
+    lister = CountingLister(["models/a"])
+    registry = ModelRegistry(lister, ttl=60)
+    assert registry.snapshot() == ["models/a"]
+    assert registry.snapshot() == ["models/a"]
+    assert lister.calls == 1
+
+
+def test_concurrent_first_callers_share_one_listing():
+    lister = CountingLister(["models/a"], delay=0.05)
+    registry = ModelRegistry(lister, ttl=60)
+    results = []
+    threads = [threading.Thread(target=lambda: results.append(registry.snapshot())) for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert results == [["models/a"]] * 8
+    assert lister.calls == 1
+
+
+def test_expired_snapshot_is_served_while_one_refresh_runs():
+    lister = CountingLister(["models/a"], ["models/b"])
+    registry = ModelRegistry(lister, ttl=0.05)
+    assert registry.snapshot() == ["models/a"]
+    time.sleep(0.1)
+    lister.started.clear()
+    lister.release.clear()
+    # Stale reads return the old snapshot at once and start only one refresh
+    assert [registry.snapshot() for _ in range(5)] == [["models/a"]] * 5
+    assert lister.started.wait(5)
+    lister.release.set()
+    deadline = time.monotonic() + 5
+    while registry.snapshot() != ["models/b"] and time.monotonic() < deadline:
+        time.sleep(0.01)
+    assert registry.snapshot() == ["models/b"]
+    assert lister.calls == 2
+    assert registry.generation == 2
+
+
+def test_failed_refresh_keeps_the_old_snapshot():
+    calls = []
+
+    def lister():
+        calls.append(1)
+        if len(calls) > 1:
+            raise ConnectionError("listing failed")
+        return ["models/a"]
+
+    registry = ModelRegistry(lister, ttl=0.0)
+    assert registry.snapshot() == ["models/a"]
+    registry.snapshot()
+    time.sleep(0.05)
+    assert registry.snapshot() == ["models/a"]
+
+
+def test_resolve_prefers_listed_models():
+    registry = ModelRegistry(lambda: ["models/b", "models/c"])
+    assert registry.resolve(["models/a", "models/c"]) == ("models/c", "preferred")
+    assert registry.resolve(["models/a"]) == ("models/b", "fallback")
@@ -0,0 +1,79 @@
+import contextvars
+import threading
+import time
+
+import pytest
+
+from pipeline import Pipeline, StageTimeout
+
+
+def _sleep(seconds, value=None):
+    def run(inputs):
+        time.sleep(seconds)
+        return value
+    return run
+
+
+def test_nodes_see_initial_inputs_and_their_dependencies():
+    pipeline = (Pipeline(max_workers=4)
+                .add("a", lambda inputs: inputs["x"] + 1)
+                .add("b", lambda inputs: inputs["a"] * 2, deps=["a"])
+                .add("c", lambda inputs: sorted(inputs), deps=["a"]))
+    results, _ = pipeline.run({"x": 1})
+    assert results["a"] == 2
+    assert results["b"] == 4
+    # c sees the initial inputs and its own dependency, not its sibling b
+    assert results["c"] == ["a", "x"]
+
+
+def test_unknown_or_duplicate_nodes_are_rejected():
+    pipeline = Pipeline().add("a", _sleep(0))
+    with pytest.raises(ValueError):
+        pipeline.add("a", _sleep(0))
+    with pytest.raises(ValueError):
+        pipeline.add("b", _sleep(0), deps=["missing"])
+
+
+def test_independent_branches_run_concurrently_and_trace_the_critical_path():
+    pipeline = (Pipeline(max_workers=4)
+                .add("sentinel", _sleep(0.02))
+                .add("fast", _sleep(0.01), deps=["sentinel"])
+                .add("slow", _sleep(0.15), deps=["sentinel"])
+                .add("responder", _sleep(0.01), deps=["fast", "slow"]))
+    _, trace = pipeline.run()
+    assert trace["critical_path"] == ["sentinel", "slow", "responder"]
+    assert set(trace["nodes"]) == {"sentinel", "fast", "slow", "responder"}
+    # fast and slow overlap, so wall time is well under running them back to back
+    assert trace["total_ms"] < trace["sum_ms"]
+    assert trace["nodes"]["fast"]["start_ms"] < trace["nodes"]["slow"]["end_ms"]
+
+
+def test_stage_timeout_fails_the_run():
+    release = threading.Event()
+    pipeline = (Pipeline(max_workers=2)
+                .add("quick", _sleep(0))
+                .add("stuck", lambda inputs: release.wait(5), deps=["quick"], timeout=0.05)
+                .add("after", _sleep(0, "never"), deps=["stuck"]))
+    started = time.monotonic()
+    with pytest.raises(StageTimeout) as excinfo:
+        pipeline.run()
+    release.set()
+    assert excinfo.value.node == "stuck"
+    assert excinfo.value.timeout == 0.05
+    assert time.monotonic() - started < 1.0
+
+
+def test_node_errors_propagate():
+    def fail(inputs):
+        raise RuntimeError("boom")
+
+    pipeline = Pipeline().add("a", fail).add("b", _sleep(0), deps=["a"])
+    with pytest.raises(RuntimeError, match="boom"):
+        pipeline.run()
+
+
+def test_nodes_run_in_the_callers_context():
+    var = contextvars.ContextVar("var", default="unset")
+    var.set("caller")
+    results, _ = Pipeline().add("a", lambda inputs: var.get()).run()
+    assert results["a"] == "caller"
@@ -0,0 +1,72 @@
+import json
+import os
+
+from responder_templates import PHASES, STATUSES, TemplateBank, valid_reply, valid_template
+from schemas import Analysis, Metrics
+
+GOOD = {"sms_alert": "{county}: VCI {vci}, water {water_distance_km}km.",
+        "governor_brief": "{county} goats {goat_price_kes} KES, maize {maize_price_kes}, ToT {terms_of_trade}."}
+
+
+def _generate(phase, status):
+    return json.dumps(GOOD)
+
+
+def _analysis(phase="ALARM", status="CRISIS"):
+    return Analysis.from_dict({"drought_phase": phase, "economic_status": status,
+                               "terms_of_trade": 25.0, "reasoning": "r"})
+
+
+def _metrics(vci=18.5):
+    return Metrics.from_dict({"vci": vci, "water_distance_km": 12.0,
+                              "goat_price_kes": 2500.0, "maize_price_kes": 100.0})
+
+
+def test_malformed_templates_are_rejected():
+    assert valid_template(GOOD["sms_alert"], GOOD["governor_brief"])
+    assert valid_reply(json.dumps(GOOD))
+    assert not valid_template("{county:>40} {vci}", GOOD["governor_brief"])
+    assert not valid_template("{unknown}", GOOD["governor_brief"])
+    assert not valid_template("{county", GOOD["governor_brief"])
+    assert not valid_template("x" * 200, GOOD["governor_brief"])
+    assert not valid_reply("not json")
+
+
+def test_warm_skips_rejected_replies():
+    bank = TemplateBank(lambda phase, status: json.dumps({"sms_alert": "{vci!r}", "governor_brief": "b"}), "v1")
+    assert bank.warm() == 0
+    assert not bank.complete
+
+
+def test_load_drops_bad_stored_templates(tmp_path):
+    stored = {f"{phase}/{status}": GOOD for phase in PHASES for status in STATUSES}
+    stored["ALARM/CRISIS"] = {"sms_alert": "{county.upper} {vci:.1f}", "governor_brief": "b"}
+    stored["ALERT/STABLE"] = {"sms_alert": "y" * 200, "governor_brief": "b"}
+    stored["BOGUS/CRISIS"] = GOOD
+    (tmp_path / "v1.json").write_text(json.dumps({"version": "v1", "templates": stored}))
+
+    bank = TemplateBank(_generate, "v1", str(tmp_path))
+    assert bank.stats()["templates"] == 7
+    assert bank.render("Testland", _analysis("ALARM", "CRISIS"), _metrics()) is None
+
+    # Warming regenerates only the dropped combinations and stores them
+    assert bank.warm() == 2
+    artifacts = bank.render("Testland", _analysis("ALARM", "CRISIS"), _metrics(9.5))
+    assert artifacts.sms_alert == "Testland: VCI 9.5, water 12.0km."
+    saved = json.loads((tmp_path / "v1.json").read_text())["templates"]
+    assert saved["ALARM/CRISIS"] == GOOD
+    assert "BOGUS/CRISIS" not in saved
+
+
+def test_version_change_warms_the_new_bank(tmp_path):
+    bank = TemplateBank(_generate, "v1", str(tmp_path))
+    bank.warm()
+    assert bank.complete
+    assert not bank.use_version("v1")
+
+    assert bank.use_version("v2")
+    assert bank.version == "v2"
+    bank._warming.join(5)
+    assert bank.complete
+    assert os.path.exists(tmp_path / "v2.json")
+    assert bank.path == str(tmp_path / "v2.json")
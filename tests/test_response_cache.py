@@ -0,0 +1,35 @@
+import time
+
+from response_cache import ResponseCache, cache_key
+
+
+def test_key_covers_model_instructions_and_input():
+    key = cache_key("models/a", "instructions", "input")
+    assert key == cache_key("models/a", "instructions", "input")
+    assert key != cache_key("models/b", "instructions", "input")
+    assert key != cache_key("models/a", "instructions!", "input")
+    assert key != cache_key("models/a", "instructions", "input!")
+
+
+def test_entries_expire_after_their_role_ttl(tmp_path):
+    cache = ResponseCache(str(tmp_path / "responses.sqlite3"), ttls={"sentinel": 0.05, "responder": 60})
+    cache.put("k1", "sentinel", "metrics")
+    cache.put("k2", "responder", "artifacts")
+    assert cache.get("k1", "sentinel") == "metrics"
+    time.sleep(0.1)
+    assert cache.get("k1", "sentinel") is None
+    assert cache.get("k2", "responder") == "artifacts"
+    assert cache.stats()["by_role"]["sentinel"] == {"hits": 1, "misses": 1}
+
+
+def test_least_recently_used_entries_are_evicted_first(tmp_path):
+    cache = ResponseCache(str(tmp_path / "responses.sqlite3"), max_bytes=30)
+    for key in ("a", "b", "c"):
+        cache.put(key, "guardian", "x" * 10)
+        time.sleep(0.01)
+    cache.get("a", "guardian")
+    time.sleep(0.01)
+    cache.put("d", "guardian", "x" * 10)
+    assert cache.evict() == 1
+    assert cache.get("b", "guardian") is None
+    assert [cache.get(key, "guardian") for key in ("a", "c", "d")] == ["x" * 10] * 3
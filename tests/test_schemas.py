@@ -0,0 +1,41 @@
+import pytest
+
+from schemas import Analysis, Artifacts, Metrics, PayloadError, parse_json
+
+
+def test_metrics_parse_ignores_unknown_keys():
+    metrics = Metrics.parse('{"vci": 18.5, "water_distance_km": 12, "goat_price_kes": 2500, "note": "x"}')
+    assert metrics.values() == {"vci": 18.5, "water_distance_km": 12,
+                                "goat_price_kes": 2500, "maize_price_kes": None}
+    assert metrics.to_prompt() == '{"vci":18.5,"water_distance_km":12,"goat_price_kes":2500}'
+
+
+def test_fenced_reply_is_parsed():
+    reply = 'Here you go:\n```json\n{"drought_phase": "ALARM", "economic_status": "CRISIS"}\n```'
+    assert Analysis.parse(reply).drought_phase == "ALARM"
+
+
+@pytest.mark.parametrize("reply", [
+    "no json here",
+    '{"vci": 18.5',
+    "[1, 2]",
+    None,
+])
+def test_unreadable_replies_are_rejected(reply):
+    with pytest.raises(PayloadError):
+        parse_json(reply)
+
+
+def test_invalid_records_are_rejected():
+    with pytest.raises(PayloadError):
+        Metrics.parse('{"vci": "eighteen"}')
+    with pytest.raises(PayloadError):
+        Analysis.parse('{"drought_phase": "ALARM"}')
+    with pytest.raises(PayloadError):
+        Artifacts.parse('{"sms_alert": "NDMA ALERT: ...", "governor_brief": ""}')
+
+
+def test_artifact_field():
+    assert Artifacts.parse_field('{"sms_alert": "NDMA ALERT: ukame"}', "sms_alert") == "NDMA ALERT: ukame"
+    with pytest.raises(PayloadError):
+        Artifacts.parse_field('{"sms_alert": "  "}', "sms_alert")
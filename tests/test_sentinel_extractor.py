@@ -0,0 +1,32 @@
+import pytest
+
+from sentinel_extractor import MIN_CONFIDENCE, extract
+
+
+@pytest.mark.parametrize("text, vci", [
+    ("VCI 3-month is 25.4", 25.4),
+    ("VCI-3Month 22.5", 22.5),
+    ("VCI (3 months) stands at 18.2", 18.2),
+    ("Vegetation Index (3-month) is currently at 21.4.", 21.4),
+    ("3-month VCI 12", 12.0),
+])
+def test_vci_window_qualifier_is_not_the_value(text, vci):
+    result = extract(text)
+    assert result.metrics["vci"] == vci
+    assert result.confidence["vci"] >= MIN_CONFIDENCE
+
+
+def test_vci_window_without_a_value_is_left_to_the_model():
+    result = extract("VCI 3-month figures are pending.")
+    assert "vci" in result.unresolved
+
+
+def test_routine_field_report():
+    result = extract("Field Report - Garissa County\n"
+                     "Vegetation Index (3-month) is currently at 18.5.\n"
+                     "Pastoralists reporting trekking 12km to water sources.\n"
+                     "Goat prices are at 2500 KES at the local market.\n"
+                     "Maize prices are at 100 KES per kg.\n")
+    assert result.metrics == {"vci": 18.5, "water_distance_km": 12.0,
+                              "goat_price_kes": 2500.0, "maize_price_kes": 100.0}
+    assert result.unresolved == []
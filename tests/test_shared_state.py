@@ -0,0 +1,40 @@
+import sqlite3
+import time
+
+from shared_state import SharedState
+
+
+def test_unconfirmed_alert_claim_expires(tmp_path):
+    state = SharedState(str(tmp_path / "shared.sqlite3"))
+    assert state.claim_alert("Garissa", "abc", ttl=0.05)
+    assert not state.claim_alert("Garissa", "abc", ttl=0.05)
+    time.sleep(0.1)
+    assert state.claim_alert("Garissa", "abc", ttl=0.05)
+
+
+def test_confirmed_alert_is_never_claimed_again(tmp_path):
+    state = SharedState(str(tmp_path / "shared.sqlite3"))
+    assert state.claim_alert("Garissa", "abc", ttl=0.0)
+    state.confirm_alert("Garissa", "abc")
+    time.sleep(0.01)
+    assert not state.claim_alert("Garissa", "abc", ttl=0.0)
+
+
+def test_released_alert_can_be_claimed(tmp_path):
+    state = SharedState(str(tmp_path / "shared.sqlite3"))
+    assert state.claim_alert("Garissa", "abc")
+    state.release_alert("Garissa", "abc")
+    assert state.claim_alert("Garissa", "abc")
+
+
+def test_alerts_table_without_dispatched_at_is_upgraded(tmp_path):
+    path = str(tmp_path / "shared.sqlite3")
+    conn = sqlite3.connect(path)
+    conn.execute("CREATE TABLE alerts (county TEXT NOT NULL, fingerprint TEXT NOT NULL, "
+                 "claimed_at REAL NOT NULL, PRIMARY KEY (county, fingerprint))")
+    conn.commit()
+    conn.close()
+    state = SharedState(path)
+    assert state.claim_alert("Garissa", "abc")
+    state.confirm_alert("Garissa", "abc")
+    assert state.stats()["errors"] == 0
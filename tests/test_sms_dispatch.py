@@ -0,0 +1,59 @@
+import time
+
+import numpy as np
+
+from sms_dispatch import LocalGateway, SmsDispatcher
+
+
+def test_recipients_are_uint64_and_deduplicated():
+    gateway = LocalGateway()
+    dispatcher = SmsDispatcher([gateway])
+    campaign = dispatcher.dispatch("hi", ["0712 345 678", "+254712345678", "bad", "712000001"])
+    assert campaign.wait(5)
+    assert campaign.recipients.dtype == np.uint64
+    assert campaign.recipients.tolist() == [254712345678, 254712000001]
+    assert campaign.counts()["sent"] == 2
+
+
+def test_finished_campaigns_are_evicted():
+    dispatcher = SmsDispatcher([LocalGateway()], retention_seconds=60, max_retained=2)
+    campaigns = [dispatcher.dispatch("hi", ["0711111111"]) for _ in range(4)]
+    for campaign in campaigns:
+        assert campaign.wait(5)
+    # Only the two newest finished campaigns are kept
+    assert dispatcher.stats()["campaigns"] == 2
+    assert dispatcher.campaign(campaigns[0].id) is None
+    assert dispatcher.campaign(campaigns[3].id) is campaigns[3]
+
+
+def test_finished_campaigns_expire():
+    dispatcher = SmsDispatcher([LocalGateway()], retention_seconds=0.05, max_retained=10)
+    campaign = dispatcher.dispatch("hi", ["0711111111"])
+    assert campaign.wait(5)
+    time.sleep(0.1)
+    assert dispatcher.stats()["campaigns"] == 0
+    assert dispatcher.campaign(campaign.id) is None
+
+
+class _OddGateway:
+    """Answers an unknown code for every number."""
+    name = "odd"
+    max_concurrent = 1
+    max_batch = 100
+
+    def __init__(self):
+        self.calls = 0
+
+    def send(self, parts, numbers, references):
+        self.calls += 1
+        return [7] * len(numbers)
+
+
+def test_unknown_codes_retry_then_fail():
+    gateway = _OddGateway()
+    dispatcher = SmsDispatcher([gateway], max_attempts=3, base_delay=0.001, max_delay=0.001)
+    campaign = dispatcher.dispatch("hi", ["0711111111", "0722222222"])
+    assert campaign.wait(5)
+    assert campaign.counts()["failed"] == 2
+    assert campaign.retried == 4
+    assert gateway.calls == 3
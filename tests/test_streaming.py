@@ -0,0 +1,19 @@
+import fake_gemini
+
+
+def test_stream_sends_model_tokens(monkeypatch):
+    import main
+    import app
+
+    fake_gemini.install(main, chunk_size=4)
+    # Nothing the local extractor can read, so the Sentinel asks the model
+    monkeypatch.setitem(main.FIELD_REPORTS, "Testland",
+                        "Field Report - Testland County\nPasture is poor and markets are quiet.\n")
+    assert main.sentinel_batcher is not None
+
+    response = app.app.test_client().get("/api/stream?county=Testland")
+    body = response.get_data(as_text=True)
+    assert response.status_code == 200
+    assert "event: token" in body
+    assert '"stage": "sentinel"' in body
+    assert "event: complete" in body
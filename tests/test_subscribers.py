@@ -0,0 +1,13 @@
+from subscribers import SubscriberRegistry
+
+
+def test_select_on_empty_registry():
+    registry = SubscriberRegistry()
+    assert len(registry.select(county="Garissa")) == 0
+    assert len(registry.select(wards=[("Garissa", "Dadaab", "Liboi")], languages=["sw"])) == 0
+    assert registry.numbers(registry.select(county="Garissa")) == []
+
+
+def test_select_on_never_imported_directory(tmp_path):
+    registry = SubscriberRegistry(str(tmp_path / "subscribers"))
+    assert registry.count(county="Garissa", languages=["sw"]) == 0
@@ -0,0 +1,24 @@
+import re
+
+import telemetry
+
+
+def test_log_lines_carry_time_level_and_logger(capsys):
+    log = telemetry.get_logger("test_telemetry")
+    log.warning("⚠️  Warning: disk low")
+    try:
+        raise ValueError("bad value")
+    except ValueError:
+        log.exception("❌ failed")
+    telemetry.flush_logs()
+    out = capsys.readouterr().out
+    assert re.search(r"^\d{4}-\d\d-\d\d \d\d:\d\d:\d\d,\d{3} WARNING asal\.test_telemetry ⚠️  Warning: disk low$",
+                     out, re.M)
+    assert "ERROR asal.test_telemetry ❌ failed\nTraceback" in out
+    assert "ValueError: bad value" in out
+
+
+def test_span_counts_into_histogram():
+    with telemetry.span("test_span", "x"):
+        pass
+    assert 'asal_span_seconds_count{span="test_span",target="x"} 1' in telemetry.render()
@@ -0,0 +1,254 @@
+"""
+Vegetation Condition Index (VCI) computed locally from NDVI rasters.
+
+The VCI rescales a pixel's NDVI against the range that pixel has shown in
+the same calendar month over the whole record:
+
+    VCI = 100 * (NDVI - NDVI_min) / (NDVI_max - NDVI_min)
+
+The NDMA reports a 3-month VCI, which is the mean of the last three monthly
+values. This module computes it from a stack of monthly NDVI composites and
+summarises it per ward and per county, so the Sentinel can take VCI from the
+imagery instead of the text of a report.
+
+- The stack lives in one directory: ndvi.npy holds int16 NDVI x 10000 of
+  shape (months, rows, cols), with NODATA for clouds and water. zones.npy is
+  a uint16 raster of ward codes, with 0 outside every ward. meta.json holds
+  the first month and the ward names ("county/sub_county/ward", as in
+  subscribers.py).
+- Both arrays are memory-mapped. Work is split into row strips of about
+  CHUNK_PIXELS pixels, and each strip reads only the bands it needs. A
+  national stack is never loaded whole.
+- Each strip becomes per-ward sums (pixel counts, VCI sum and sum of
+  squares, pixels below 20 and 35) using np.bincount. Strips run in a
+  spawn-based process pool, as in bulletin_ingest.py. Ward sums are added
+  up into county sums, so county figures are pixel-weighted.
+- Results are kept per (month, window) until ndvi.npy changes.
+"""
+import concurrent.futures
+import json
+import multiprocessing
+import os
+import threading
+import time
+
+import numpy as np
+
+NODATA = -32768
+NDVI_SCALE = 10000
+
+# Pixels per row strip; a strip reads (years x window) bands of this size
+CHUNK_PIXELS = 1 << 20
+
+# Per-zone sums a strip returns, in this order
+_SUMS = ("pixels", "valid", "vci_sum", "vci_sq_sum", "below_20", "below_35")
+
+
+def month_offset(start, month):
+    """Months from 'YYYY-MM' start to 'YYYY-MM' month."""
+    start_year, start_month = map(int, start.split("-"))
+    year, number = map(int, month.split("-"))
+    return (year - start_year) * 12 + number - start_month
+
+
+def _band_vci(ndvi, band, rows):
+    """
+    Per-pixel VCI of one band over a row strip.
+
+    Returns:
+        tuple: (float32 VCI, bool valid) flattened over the strip
+    """
+    history = ndvi[band % 12::12, rows[0]:rows[1]]
+    high = history.max(axis=0)  # NODATA is the int16 minimum, so it never wins
+    low = np.where(history == NODATA, np.int16(np.iinfo(np.int16).max), history).min(axis=0)
+    current = ndvi[band, rows[0]:rows[1]]
+    spread = high.astype(np.float32) - low
+    valid = (current != NODATA) & (spread > 0)
+    vci = (current - low.astype(np.float32)) * 100.0 / np.where(valid, spread, 1.0)
+    return vci.ravel(), valid.ravel()
+
+
+def zonal_sums(path, bands, rows, zone_count):
+    """
+    Per-zone VCI sums for one row strip; runs in a pool worker.
+
+    Args:
+        path (str): Stack directory
+        bands (list): Band indexes whose monthly VCI values are averaged
+        rows (tuple): (first row, row after the last)
+        zone_count (int): Ward codes run 1..zone_count
+
+    Returns:
+        numpy.ndarray: float64 of shape (len(_SUMS), zone_count + 1)
+    """
+    ndvi = np.load(os.path.join(path, "ndvi.npy"), mmap_mode="r")
+    zones = np.load(os.path.join(path, "zones.npy"), mmap_mode="r")
+    total = counted = None
+    for band in bands:
+        vci, valid = _band_vci(ndvi, band, rows)
+        if total is None:
+            total, counted = np.where(valid, vci, 0.0), valid.astype(np.uint8)
+        else:
+            total += np.where(valid, vci, 0.0)
+            counted += valid
+    zone = np.asarray(zones[rows[0]:rows[1]]).ravel()
+    valid = counted > 0
+    vci = total[valid] / counted[valid]
+    valid_zone = zone[valid]
+    length = zone_count + 1
+    return np.stack([
+        np.bincount(zone, minlength=length),
+        np.bincount(valid_zone, minlength=length),
+        np.bincount(valid_zone, weights=vci, minlength=length),
+        np.bincount(valid_zone, weights=vci * vci, minlength=length),
+        np.bincount(valid_zone[vci < 20], minlength=length),
+        np.bincount(valid_zone[vci < 35], minlength=length),
+    ]).astype(np.float64)
+
+
+def _summaries(sums, names):
+    """Sums of shape (len(_SUMS), len(names)) -> {name: stats dict}."""
+    pixels, valid, vci_sum, vci_sq_sum, below_20, below_35 = sums
+    summaries = {}
+    for i, name in enumerate(names):
+        if not pixels[i]:
+            continue
+        n = valid[i]
+        mean = vci_sum[i] / n if n else None
+        summaries[name] = {
+            "vci": round(float(mean), 2) if n else None,
+            "vci_std": round(float(np.sqrt(max(vci_sq_sum[i] / n - mean * mean, 0.0))), 2) if n else None,
+            "pixels": int(pixels[i]),
+            "valid_fraction": round(float(n / pixels[i]), 4),
+            "below_20": round(float(below_20[i] / n), 4) if n else None,
+            "below_35": round(float(below_35[i] / n), 4) if n else None,
+        }
+    return summaries
+
+
+class NdviStack:
+    """
+    A memory-mapped NDVI time series with a ward raster.
+
+    Attributes:
+        path (str): Stack directory
+        workers (int): Default process count for zonal_stats()
+    """
+    def __init__(self, path, workers=None):
+        self.path = path
+        self.workers = workers
+        self._lock = threading.Lock()
+        self._meta = None
+        self._results = {}
+        self._version = None
+
+    @classmethod
+    def create(cls, path, start, bands, zones, wards):
+        """
+        Starts a new stack on disk.
+
+        Args:
+            start (str): 'YYYY-MM' of band 0; bands are consecutive months
+            bands (int): Number of monthly bands
+            zones (numpy.ndarray): (rows, cols) ward codes, 0 outside every ward
+            wards (list): Ward names; code k is wards[k - 1]
+
+        Returns:
+            tuple: (NdviStack, writable int16 memmap of shape (bands, rows, cols)
+                for the caller to fill and flush)
+        """
+        os.makedirs(path, exist_ok=True)
+        np.save(os.path.join(path, "zones.npy"), np.asarray(zones, np.uint16))
+        with open(os.path.join(path, "meta.json"), "w", encoding="utf-8") as f:
+            json.dump({"start": start, "wards": list(wards)}, f)
+        ndvi = np.lib.format.open_memmap(os.path.join(path, "ndvi.npy"), mode="w+", dtype=np.int16,
+                                         shape=(bands,) + tuple(np.shape(zones)))
+        return cls(path), ndvi
+
+    def _load_meta(self):
+        # Caller holds the lock. Results are dropped when ndvi.npy changes.
+        version = os.stat(os.path.join(self.path, "ndvi.npy")).st_mtime_ns
+        if version != self._version:
+            with open(os.path.join(self.path, "meta.json"), encoding="utf-8") as f:
+                meta = json.load(f)
+            ndvi = np.load(os.path.join(self.path, "ndvi.npy"), mmap_mode="r")
+            meta["shape"] = ndvi.shape
+            self._meta, self._results, self._version = meta, {}, version
+        return self._meta
+
+    def months(self):
+        """('YYYY-MM' of the first band, 'YYYY-MM' of the last band)."""
+        with self._lock:
+            meta = self._load_meta()
+        start_year, start_month = map(int, meta["start"].split("-"))
+        last = start_year * 12 + start_month - 1 + meta["shape"][0] - 1
+        return meta["start"], f"{last // 12}-{last % 12 + 1:02d}"
+
+    def zonal_stats(self, month, window=3, workers=None, chunk_pixels=CHUNK_PIXELS):
+        """
+        Per-ward and per-county VCI for a month.
+
+        Args:
+            month (str): 'YYYY-MM'
+            window (int): Months averaged, ending at `month` (NDMA uses 3)
+            workers (int): Processes; 1 runs in this process
+
+        Returns:
+            dict: 'month', 'window', 'wards' and 'counties' ({name: {'vci',
+                'vci_std', 'pixels', 'valid_fraction', 'below_20', 'below_35'}}),
+                'chunks' and 'seconds'
+
+        Raises:
+            ValueError: If the stack does not cover the window
+        """
+        with self._lock:
+            meta = self._load_meta()
+            cached = self._results.get((month, window))
+            if cached is not None:
+                return cached
+            last = month_offset(meta["start"], month)
+            bands = list(range(last - window + 1, last + 1))
+            if bands[0] < 0 or last >= meta["shape"][0]:
+                raise ValueError(f"NDVI stack does not cover {window} month(s) to {month}")
+
+            start = time.perf_counter()
+            _, rows, cols = meta["shape"]
+            step = max(1, chunk_pixels // max(1, cols))
+            strips = [(r, min(r + step, rows)) for r in range(0, rows, step)]
+            wards = meta["wards"]
+            workers = workers or self.workers or os.cpu_count() or 1
+            sums = np.zeros((len(_SUMS), len(wards) + 1))
+            if workers <= 1 or len(strips) == 1:
+                for strip in strips:
+                    sums += zonal_sums(self.path, bands, strip, len(wards))
+            else:
+                # spawn, not fork: this may run in a multi-threaded web worker
+                context = multiprocessing.get_context("spawn")
+                with concurrent.futures.ProcessPoolExecutor(max_workers=min(workers, len(strips)),
+                                                            mp_context=context) as pool:
+                    futures = [pool.submit(zonal_sums, self.path, bands, strip, len(wards))
+                               for strip in strips]
+                    for future in concurrent.futures.as_completed(futures):
+                        sums += future.result()
+
+            # Code 0 is outside every ward; counties add up their wards' sums
+            sums = sums[:, 1:]
+            counties = sorted({name.split("/", 1)[0] for name in wards})
+            county_of = np.array([counties.index(name.split("/", 1)[0]) for name in wards], np.int64)
+            county_sums = np.stack([np.bincount(county_of, weights=row, minlength=len(counties))
+                                    for row in sums])
+            result = {
+                "month": month,
+                "window": window,
+                "wards": _summaries(sums, wards),
+                "counties": _summaries(county_sums, counties),
+                "chunks": len(strips),
+                "seconds": time.perf_counter() - start,
+            }
+            self._results[(month, window)] = result
+            return result
+
+    def county_vci(self, county, month, window=3):
+        """A county's mean VCI for the month, or None if it has no valid pixels."""
+        stats = self.zonal_stats(month, window)["counties"].get(county)
+        return None if stats is None else stats["vci"]